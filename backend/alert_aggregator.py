@@ -0,0 +1,211 @@
+"""
+Alert Aggregation for SafeWander
+Coalesces repeated alerts so a patient flapping across a geofence edge
+produces one alert with an occurrence counter instead of hundreds of rows.
+
+The first alert of a (patient, type, level) opens an aggregate and is
+written immediately. Repeats while the aggregate is open only bump an
+in-memory counter; a background flush writes the counters back with one
+UPDATE per changed alert. An aggregate stays open until no repeat has been
+seen for ALERT_DEDUP_WINDOW seconds (hysteresis: opening is immediate,
+closing needs a quiet period), or at most ALERT_DEDUP_MAX_SPAN seconds, so
+a long-running problem still re-alerts periodically.
+
+Aggregates opened in a transaction are kept on the session and registered
+only after it commits (same pattern as change_tracker), so a rolled-back
+alert row never swallows later alerts.
+
+CRITICAL alerts (EMERGENCY, critical vitals) are never coalesced: every
+one is written and notified, since a patient re-entering EMERGENCY must
+reach caregivers again.
+"""
+
+import asyncio
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from config import ALERT_DEDUP_WINDOW, ALERT_DEDUP_MAX_SPAN, ALERT_FLUSH_INTERVAL
+
+
+@dataclass
+class AlertAggregate:
+    alert_id: str
+    first_seen: datetime
+    last_seen: datetime
+    occurrences: int = 1
+    flushed_occurrences: int = 1
+
+    def is_open(self, now: datetime) -> bool:
+        return (
+            (now - self.last_seen).total_seconds() < ALERT_DEDUP_WINDOW
+            and (now - self.first_seen).total_seconds() < ALERT_DEDUP_MAX_SPAN
+        )
+
+    @property
+    def dirty(self) -> bool:
+        return self.occurrences != self.flushed_occurrences
+
+
+# Levels raised as a new alert every time
+UNCOALESCED_LEVELS = ("critical",)
+
+_aggregates: Dict[Tuple[str, str, str], AlertAggregate] = {}
+
+PENDING_KEY = "alert_aggregator.pending"
+_flush_lock = asyncio.Lock()
+
+aggregator_stats = {
+    "alerts_created": 0,
+    "occurrences_coalesced": 0,
+    "flushes": 0,
+    "rows_updated": 0,
+}
+
+
+def _pending(db) -> Dict[Tuple[str, str, str], AlertAggregate]:
+    session = getattr(db, "sync_session", db)
+    return session.info.setdefault(PENDING_KEY, {})
+
+
+async def raise_alert(db, patient_id: str, type: str, level: str, message: str,
+                      description: Optional[str] = None, location: Optional[Dict] = None,
+                      timestamp: Optional[datetime] = None, extra_data: Optional[Dict] = None):
+    """
+    Raise an alert through the aggregation layer.
+
+    Returns:
+        The new Alert (added to the session, counters and rollups updated; the
+        caller commits), or None when it was coalesced into an open alert
+        (never for UNCOALESCED_LEVELS).
+    """
+    from database import Alert
+    from alert_counters import increment_active_alerts
+    from rollups import record_alert
+    from notifications import notify_alert
+
+    now = timestamp or datetime.utcnow()
+    key = (patient_id, type, level)
+    pending = _pending(db)
+
+    aggregate = pending.get(key) or _aggregates.get(key)
+    if aggregate is not None and aggregate.is_open(now):
+        aggregate.occurrences += 1
+        aggregate.last_seen = now
+        aggregator_stats["occurrences_coalesced"] += 1
+        return None
+
+    alert = Alert(
+        id=str(uuid.uuid4()),
+        patient_id=patient_id,
+        type=type,
+        level=level,
+        message=message,
+        description=description,
+        location=location,
+        timestamp=now,
+        extra_data=extra_data,
+        occurrences=1,
+        last_seen_at=now,
+    )
+    db.add(alert)
+    if level not in UNCOALESCED_LEVELS:
+        # Registered once the row is committed (see _committed)
+        pending[key] = AlertAggregate(alert_id=alert.id, first_seen=now, last_seen=now)
+    aggregator_stats["alerts_created"] += 1
+
+    await increment_active_alerts(db, patient_id)
+    await record_alert(db, patient_id, level, now)
+    await notify_alert(db, alert)
+    return alert
+
+
+def close_alert(alert_id: str) -> None:
+    """Stop coalescing into an alert (e.g. once it is resolved)."""
+    for key, aggregate in list(_aggregates.items()):
+        if aggregate.alert_id == alert_id:
+            del _aggregates[key]
+
+
+def drop_aggregates(patient_id: Optional[str] = None) -> None:
+    """Forget open aggregates of one patient (or all) whose alerts were deleted."""
+    for key in list(_aggregates):
+        if patient_id is None or key[0] == patient_id:
+            del _aggregates[key]
+
+
+async def flush_aggregates() -> int:
+    """Write pending occurrence counts and drop closed aggregates. Returns rows updated."""
+    from database import async_session_maker, Alert
+    from sqlalchemy import update
+    from change_tracker import mark_changed
+
+    async with _flush_lock:
+        now = datetime.utcnow()
+        pending = {key: (agg, agg.occurrences, agg.last_seen)
+                   for key, agg in _aggregates.items() if agg.dirty}
+
+        updated = 0
+        if pending:
+            async with async_session_maker() as db:
+                for key, (aggregate, occurrences, last_seen) in pending.items():
+                    result = await db.execute(
+                        update(Alert)
+                        .where(Alert.id == aggregate.alert_id)
+                        .where(Alert.resolved == False)
+                        .values(occurrences=occurrences, last_seen_at=last_seen)
+                    )
+                    if result.rowcount:
+                        aggregate.flushed_occurrences = occurrences
+                        mark_changed(db, "alerts", [aggregate.alert_id])
+                        updated += 1
+                    elif _aggregates.get(key) is aggregate:
+                        # Alert was resolved or deleted - the next repeat opens a new one
+                        del _aggregates[key]
+                await db.commit()
+
+        for key, aggregate in list(_aggregates.items()):
+            if not aggregate.is_open(now) and not aggregate.dirty:
+                del _aggregates[key]
+
+        aggregator_stats["flushes"] += 1
+        aggregator_stats["rows_updated"] += updated
+        return updated
+
+
+@event.listens_for(Session, "after_commit")
+def _committed(session):
+    pending = session.info.pop(PENDING_KEY, None)
+    if pending:
+        _aggregates.update(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _rolled_back(session):
+    session.info.pop(PENDING_KEY, None)
+
+
+async def run_flush_loop():
+    """Background task that flushes aggregates every ALERT_FLUSH_INTERVAL seconds."""
+    try:
+        while True:
+            await asyncio.sleep(ALERT_FLUSH_INTERVAL)
+            try:
+                await flush_aggregates()
+            except Exception as e:
+                print(f"[AlertAggregator] Error: {e}")
+    finally:
+        # Shutdown (task cancelled) - don't lose pending counts
+        await asyncio.shield(flush_aggregates())
+
+
+def start_flush_loop() -> asyncio.Task:
+    """Start the aggregate flush loop as a background task."""
+    task = asyncio.create_task(run_flush_loop())
+    print(f"[AlertAggregator] Started with {ALERT_FLUSH_INTERVAL}s flush interval, "
+          f"{ALERT_DEDUP_WINDOW}s dedup window")
+    return task
@@ -0,0 +1,135 @@
+"""
+Alert Counters for SafeWander
+Keeps Patient.active_alerts in step with unresolved alerts.
+
+Every change is a single UPDATE with the arithmetic done in SQL, so
+concurrent requests cannot lose increments and no Patient SELECT is needed
+per alert. Updates join the caller's transaction; the caller commits.
+"""
+
+from typing import Dict, List, Optional
+
+from sqlalchemy import and_, case, func, select, update
+
+from change_tracker import mark_changed, mark_reset
+
+
+async def increment_active_alerts(db, patient_id: str, level: Optional[str] = None) -> None:
+    """
+    Count a new unresolved alert. When level is given, escalate the
+    patient's status like a manually raised alert does (critical ->
+    emergency, high -> warning unless already in emergency).
+    """
+    from database import Patient
+
+    values = {"active_alerts": func.coalesce(Patient.active_alerts, 0) + 1}
+    level = getattr(level, "value", level)
+    if level == "critical":
+        values["status"] = "emergency"
+    elif level == "high":
+        values["status"] = case((Patient.status == "emergency", "emergency"), else_="warning")
+
+    await db.execute(update(Patient).where(Patient.id == patient_id).values(**values))
+    mark_changed(db, "patients", [patient_id])
+
+
+async def decrement_active_alerts(db, patient_id: str) -> None:
+    """Count a resolved alert; the patient goes back to safe at zero."""
+    from database import Patient
+
+    remaining = func.coalesce(Patient.active_alerts, 0) - 1
+    await db.execute(
+        update(Patient)
+        .where(Patient.id == patient_id)
+        .values(
+            active_alerts=func.max(remaining, 0),
+            status=case((remaining <= 0, "safe"), else_=Patient.status),
+        )
+    )
+    mark_changed(db, "patients", [patient_id])
+
+
+async def reset_active_alerts(db, patient_id: Optional[str] = None) -> None:
+    """Zero the counter (one patient or all) after alerts are cleared."""
+    from database import Patient
+
+    stmt = update(Patient).values(active_alerts=0, status="safe")
+    if patient_id:
+        stmt = stmt.where(Patient.id == patient_id)
+        mark_changed(db, "patients", [patient_id])
+    else:
+        mark_reset(db, "patients")
+    await db.execute(stmt)
+
+
+async def recount_active_alerts(db) -> int:
+    """
+    Re-derive every counter from the alerts table in one statement, fixing
+    drift left by older read-modify-write updates. Returns patients updated.
+    """
+    from database import Patient, Alert
+
+    unresolved = (
+        select(func.count(Alert.id))
+        .where(Alert.patient_id == Patient.id)
+        .where(Alert.resolved == False)
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        update(Patient)
+        .where(func.coalesce(Patient.active_alerts, 0) != unresolved)
+        .values(active_alerts=unresolved)
+    )
+    if result.rowcount:
+        mark_reset(db, "patients")
+    return result.rowcount
+
+
+async def get_alert_summaries(db) -> List[Dict]:
+    """
+    Unresolved alert counts by level for every patient, in one grouped query.
+    Patients without open alerts are included with zero counts.
+    """
+    from database import Patient, Alert
+
+    def count_where(condition):
+        return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+    # Only unresolved alerts take part in the join (ix_alerts_patient_resolved)
+    result = await db.execute(
+        select(
+            Patient.id,
+            Patient.name,
+            Patient.status,
+            Patient.fsm_state,
+            func.count(Alert.id).label("active"),
+            count_where(Alert.acknowledged == False).label("unacknowledged"),
+            count_where(Alert.level == "low").label("low"),
+            count_where(Alert.level == "medium").label("medium"),
+            count_where(Alert.level == "high").label("high"),
+            count_where(Alert.level == "critical").label("critical"),
+            func.max(Alert.timestamp).label("last_alert_at"),
+        )
+        .outerjoin(Alert, and_(Alert.patient_id == Patient.id, Alert.resolved == False))
+        .group_by(Patient.id)
+        .order_by(Patient.name)
+    )
+
+    return [
+        {
+            "patient_id": row.id,
+            "name": row.name,
+            "status": row.status,
+            "fsm_state": row.fsm_state,
+            "active_alerts": row.active,
+            "unacknowledged": row.unacknowledged,
+            "by_level": {
+                "low": row.low,
+                "medium": row.medium,
+                "high": row.high,
+                "critical": row.critical,
+            },
+            "last_alert_at": row.last_alert_at,
+        }
+        for row in result.all()
+    ]
@@ -3,7 +3,23 @@ Statistical Anomaly Detection for SafeWander
 Detects confusion patterns using simple statistics, not ML.
 """
 
-from typing import List, Dict
+import math
+from collections import deque
+from datetime import datetime
+from typing import List, Dict, Optional, Tuple
+
+from config import (
+    TRAJECTORY_WINDOW,
+    DIRECTION_CHANGE_THRESHOLD,
+    MIN_HEADING_STEP,
+    RETURN_DISTANCE,
+    DWELL_RADIUS,
+    DWELL_MIN_TIME,
+    GRID_CELL_SIZE,
+    GRID_MIN_STEP,
+    GRID_MIN_LOOP_CELLS,
+    GRID_CIRCLING_PASSES,
+)
 
 
 def detect_anomaly(
@@ -142,6 +158,260 @@ def calculate_wandering_score(
     return min(score, 100)
 
 
+class GridOccupancy:
+    """
+    Circling detector over a local metric grid.
+    
+    Fixes are projected onto GRID_CELL_SIZE cells around the first fix and
+    each cell entry is numbered. Entering a cell next to one last entered at
+    least GRID_MIN_LOOP_CELLS entries ago is a new pass over that spot.
+    Each cell keeps the times of its passes (its own and those chained from
+    the neighbour it returned to); passes older than the window are dropped,
+    so a cell with GRID_CIRCLING_PASSES passes within the window (the same
+    two returns that is_circling_pattern looks for) marks circling. Unlike
+    is_circling_pattern this finds loops anywhere in the window, not just at
+    the first point, and costs O(1) amortized per fix.
+    """
+    
+    _NEIGHBOURS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+    
+    def __init__(self, cell_size: float = GRID_CELL_SIZE, window: float = TRAJECTORY_WINDOW):
+        self.cell_size = cell_size
+        self.window = window
+        self._origin = None  # (lat, lon, meters per degree of longitude)
+        # key -> [entries in window, last entry index, deque of pass times]
+        self._cells: Dict[int, list] = {}
+        self._entries = deque()  # (timestamp, key) per cell entry
+        self._entry_index = 0
+        self._current = None
+        self._anchor = None  # (x, y) of the last fix that counted as movement
+        self._circling = set()  # keys of cells with GRID_CIRCLING_PASSES passes in the window
+    
+    @staticmethod
+    def _key(cx: int, cy: int) -> int:
+        # Pack signed cell coordinates into one int for a compact dict key
+        return ((cx & 0xFFFFFFFF) << 32) | (cy & 0xFFFFFFFF)
+    
+    def project(self, lat: float, lon: float) -> Tuple[float, float]:
+        """Local x/y offset in meters from the first fix."""
+        if self._origin is None:
+            self._origin = (lat, lon, 111320.0 * math.cos(math.radians(lat)))
+        lat0, lon0, m_per_lon = self._origin
+        return (lon - lon0) * m_per_lon, (lat - lat0) * 110540.0
+    
+    def update(self, lat: float, lon: float, timestamp: datetime) -> None:
+        """Consume one fix (fixes must arrive in time order)."""
+        self._evict(timestamp)
+        x, y = self.project(lat, lon)
+        # Only count a fix once it has moved GRID_MIN_STEP from the last counted
+        # one, so GPS jitter while standing still does not walk across cells
+        if self._anchor and math.hypot(x - self._anchor[0], y - self._anchor[1]) < GRID_MIN_STEP:
+            return
+        self._anchor = (x, y)
+        cx, cy = math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+        if (cx, cy) == self._current:
+            return  # Still in the same cell - dwelling is not revisiting
+        self._current = (cx, cy)
+        self._entry_index += 1
+        
+        # Longest run of passes (within the window) this entry continues
+        chain = ()
+        for dx, dy in self._NEIGHBOURS:
+            cell = self._cells.get(self._key(cx + dx, cy + dy))
+            if cell and self._entry_index - cell[1] >= GRID_MIN_LOOP_CELLS:
+                self._trim(cell[2], timestamp)
+                if len(cell[2]) > len(chain):
+                    chain = cell[2]
+        
+        key = self._key(cx, cy)
+        cell = self._cells.get(key)
+        if cell is None:
+            cell = [0, 0, deque(maxlen=GRID_CIRCLING_PASSES)]
+            self._cells[key] = cell
+        self._trim(cell[2], timestamp)
+        cell[0] += 1
+        cell[1] = self._entry_index
+        if len(chain) + 1 > len(cell[2]):
+            cell[2] = deque(chain, maxlen=GRID_CIRCLING_PASSES)
+            cell[2].append(timestamp)
+        if len(cell[2]) >= GRID_CIRCLING_PASSES:
+            self._circling.add(key)
+        self._entries.append((timestamp, key))
+    
+    def _evict(self, now: datetime) -> None:
+        while self._entries and (now - self._entries[0][0]).total_seconds() > self.window:
+            _, key = self._entries.popleft()
+            cell = self._cells[key]
+            cell[0] -= 1
+            if cell[0] == 0:
+                self._circling.discard(key)
+                del self._cells[key]
+        # Passes only count while inside the window: circling cells are
+        # re-checked here, other cells are trimmed when next looked at
+        for key in list(self._circling):
+            passes = self._cells[key][2]
+            self._trim(passes, now)
+            if len(passes) < GRID_CIRCLING_PASSES:
+                self._circling.discard(key)
+    
+    def _trim(self, passes: deque, now: datetime) -> None:
+        while passes and (now - passes[0]).total_seconds() > self.window:
+            passes.popleft()
+    
+    @property
+    def circling_cells(self) -> int:
+        return len(self._circling)
+    
+    @property
+    def is_circling(self) -> bool:
+        return bool(self._circling)
+
+
+class TrajectoryTracker:
+    """
+    Incremental trajectory features for one patient, updated in O(1)
+    amortized per fix instead of rescanning the location history.
+    
+    Features:
+    - direction changes within a sliding time window
+    - returns to the trip origin and grid-cell loops (circling indicators)
+    - path tortuosity over the window (path length / displacement)
+    - dwell time within a small radius
+    """
+    
+    def __init__(self, window: float = TRAJECTORY_WINDOW):
+        from geo_utils import haversine_distance, get_heading
+        
+        self._distance = haversine_distance
+        self._heading = get_heading
+        self.window = window
+        # (timestamp, step_distance, direction_changed, lat, lon)
+        self._fixes = deque()
+        self._direction_changes = 0
+        self._path_length = 0.0
+        self._last = None  # (lat, lon, timestamp)
+        self._last_heading: Optional[float] = None
+        self._origin = None
+        self._was_far = False
+        self.returns = 0
+        self._dwell_anchor = None  # (lat, lon, timestamp)
+        self.grid = GridOccupancy(window=window)
+    
+    def update(self, lat: float, lon: float, timestamp: datetime,
+               heading: Optional[float] = None) -> None:
+        """Consume one fix (fixes must arrive in time order)."""
+        step = 0.0
+        changed = False
+        
+        if self._last:
+            step = self._distance(self._last[0], self._last[1], lat, lon)
+            if step >= MIN_HEADING_STEP:
+                if heading is None:
+                    heading = self._heading(self._last[0], self._last[1], lat, lon)
+                if self._last_heading is not None:
+                    diff = abs(heading - self._last_heading)
+                    if diff > 180:
+                        diff = 360 - diff
+                    changed = diff > DIRECTION_CHANGE_THRESHOLD
+                self._last_heading = heading
+        
+        self._fixes.append((timestamp, step, changed, lat, lon))
+        self._path_length += step
+        self._direction_changes += changed
+        self._evict(timestamp)
+        
+        # Return-to-origin counter (same rule as is_circling_pattern)
+        if self._origin is None:
+            self._origin = (lat, lon)
+        else:
+            origin_dist = self._distance(self._origin[0], self._origin[1], lat, lon)
+            if origin_dist > RETURN_DISTANCE * 3:
+                self._was_far = True
+            elif self._was_far and origin_dist < RETURN_DISTANCE:
+                self.returns += 1
+                self._was_far = False
+        
+        # Dwell: re-anchor whenever the patient leaves the dwell radius
+        if (self._dwell_anchor is None or
+                self._distance(self._dwell_anchor[0], self._dwell_anchor[1], lat, lon) > DWELL_RADIUS):
+            self._dwell_anchor = (lat, lon, timestamp)
+        
+        self.grid.update(lat, lon, timestamp)
+        self._last = (lat, lon, timestamp)
+    
+    def start_trip(self) -> None:
+        """Reset the return-to-origin counter; the next fix becomes the origin."""
+        self._origin = None
+        self._was_far = False
+        self.returns = 0
+    
+    def _evict(self, now: datetime) -> None:
+        while self._fixes and (now - self._fixes[0][0]).total_seconds() > self.window:
+            _, step, changed, _, _ = self._fixes.popleft()
+            self._direction_changes -= changed
+            self._path_length -= step
+    
+    @property
+    def direction_changes(self) -> int:
+        return self._direction_changes
+    
+    @property
+    def is_circling(self) -> bool:
+        return self.returns >= 2 or self.grid.is_circling
+    
+    @property
+    def tortuosity(self) -> float:
+        """Path length / straight-line displacement over the window (1.0 = straight)."""
+        if len(self._fixes) < 2:
+            return 1.0
+        first, last = self._fixes[0], self._fixes[-1]
+        # The first fix's step started before the window
+        path = self._path_length - first[1]
+        displacement = self._distance(first[3], first[4], last[3], last[4])
+        if displacement < MIN_HEADING_STEP:
+            return float("inf") if path >= MIN_HEADING_STEP else 1.0
+        return max(path / displacement, 1.0)
+    
+    @property
+    def dwell_seconds(self) -> float:
+        if not self._dwell_anchor or not self._last:
+            return 0.0
+        return (self._last[2] - self._dwell_anchor[2]).total_seconds()
+    
+    @property
+    def is_dwelling(self) -> bool:
+        return self.dwell_seconds >= DWELL_MIN_TIME
+    
+    def wandering_score(self, duration_ratio: float) -> int:
+        """calculate_wandering_score from the running features."""
+        return calculate_wandering_score(self.direction_changes, self.is_circling, duration_ratio)
+    
+    def features(self) -> Dict:
+        tortuosity = self.tortuosity
+        return {
+            "direction_changes": self.direction_changes,
+            "returns_to_origin": self.returns,
+            "circling_cells": self.grid.circling_cells,
+            "is_circling": self.is_circling,
+            "tortuosity": round(tortuosity, 2) if tortuosity != float("inf") else None,
+            "dwell_seconds": int(self.dwell_seconds),
+            "is_dwelling": self.is_dwelling,
+        }
+
+
+# Per-patient trackers, fed by the ingest path
+_trackers: Dict[str, TrajectoryTracker] = {}
+
+
+def get_trajectory_tracker(patient_id: str) -> TrajectoryTracker:
+    """Get (or create) the in-memory trajectory tracker for a patient."""
+    tracker = _trackers.get(patient_id)
+    if tracker is None:
+        tracker = TrajectoryTracker()
+        _trackers[patient_id] = tracker
+    return tracker
+
+
 def get_anomaly_description(
     current_speed: float,
     current_duration: float,
@@ -0,0 +1,254 @@
+"""
+Columnar Cold-Data Archive for SafeWander
+Moves old locations, vitals and resolved alerts out of SQLite into
+per-patient, per-day partitions of NumPy column files.
+
+Layout: ARCHIVE_DIR/<table>/<patient_id>/<YYYY-MM-DD>/<column>.npy
+
+Every column is a fixed-width array (timestamps as int64 epoch microseconds,
+missing numbers as NaN, text as fixed-width unicode), so partitions can be
+memory-mapped by the reader instead of parsed.
+"""
+
+import json
+import os
+import shutil
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from config import ARCHIVE_DIR, ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE
+
+ARCHIVE_ROOT = Path(__file__).resolve().parent / ARCHIVE_DIR
+
+_EPOCH = datetime(1970, 1, 1)
+NO_TIME = -1  # int64 sentinel for missing timestamps
+
+
+def to_epoch_us(timestamp: Optional[datetime]) -> int:
+    if timestamp is None:
+        return NO_TIME
+    return (timestamp - _EPOCH) // timedelta(microseconds=1)
+
+
+def from_epoch_us(value: int) -> Optional[datetime]:
+    if value == NO_TIME:
+        return None
+    return _EPOCH + timedelta(microseconds=int(value))
+
+
+def _float(value) -> float:
+    return np.nan if value is None else float(value)
+
+
+def _json(value) -> str:
+    return "" if value is None else json.dumps(value)
+
+
+# Column specs per archived table: column -> (dtype, row getter)
+# "U" dtypes are sized to the longest value when the array is built
+LOCATION_COLUMNS = {
+    "timestamp": ("i8", lambda r: to_epoch_us(r.timestamp)),
+    "latitude": ("f8", lambda r: r.latitude),
+    "longitude": ("f8", lambda r: r.longitude),
+    "accuracy": ("f4", lambda r: _float(r.accuracy)),
+    "speed": ("f4", lambda r: _float(r.speed)),
+    "heading": ("f4", lambda r: _float(getattr(r, "heading", None))),
+    "sample_count": ("i4", lambda r: getattr(r, "sample_count", None) or 1),
+}
+
+VITAL_COLUMNS = {
+    "timestamp": ("i8", lambda r: to_epoch_us(r.timestamp)),
+    "heart_rate": ("f4", lambda r: _float(r.heart_rate)),
+    "blood_pressure_systolic": ("f4", lambda r: _float(r.blood_pressure_systolic)),
+    "blood_pressure_diastolic": ("f4", lambda r: _float(r.blood_pressure_diastolic)),
+    "oxygen_level": ("f4", lambda r: _float(r.oxygen_level)),
+    "temperature": ("f4", lambda r: _float(r.temperature)),
+}
+
+ALERT_COLUMNS = {
+    "timestamp": ("i8", lambda r: to_epoch_us(r.timestamp)),
+    "id": ("U", lambda r: r.id),
+    "type": ("U", lambda r: r.type or ""),
+    "level": ("U", lambda r: r.level or ""),
+    "message": ("U", lambda r: r.message or ""),
+    "description": ("U", lambda r: r.description or ""),
+    "location": ("U", lambda r: _json(r.location)),
+    "acknowledged": ("?", lambda r: bool(r.acknowledged)),
+    "acknowledged_at": ("i8", lambda r: to_epoch_us(r.acknowledged_at)),
+    "acknowledged_by": ("U", lambda r: r.acknowledged_by or ""),
+    "resolved_at": ("i8", lambda r: to_epoch_us(r.resolved_at)),
+    "extra_data": ("U", lambda r: _json(r.extra_data)),
+    "occurrences": ("i4", lambda r: r.occurrences or 1),
+    "last_seen_at": ("i8", lambda r: to_epoch_us(r.last_seen_at)),
+}
+
+
+def build_columns(rows: List, spec: Dict) -> Dict[str, np.ndarray]:
+    """Convert ORM rows to a dict of typed column arrays."""
+    columns = {}
+    for name, (dtype, getter) in spec.items():
+        values = [getter(r) for r in rows]
+        columns[name] = np.array(values, dtype=None if dtype == "U" else dtype)
+        if dtype == "U" and columns[name].dtype.kind != "U":
+            columns[name] = columns[name].astype("U1")
+    return columns
+
+
+def _missing(col: np.ndarray, size: int) -> np.ndarray:
+    """Filler for a column added to the spec after a partition was written."""
+    fill = {"f": np.nan, "U": "", "b": False}.get(col.dtype.kind, NO_TIME if col.dtype == np.int64 else 0)
+    return np.full(size, fill, dtype=col.dtype)
+
+
+def partition_path(table: str, patient_id: str, day: date, root: Path = None) -> Path:
+    return (root or ARCHIVE_ROOT) / table / patient_id / day.isoformat()
+
+
+def write_partition(table: str, patient_id: str, day: date, columns: Dict[str, np.ndarray],
+                    root: Path = None) -> int:
+    """
+    Write (or append to) one partition, sorted by timestamp.
+    The new partition is written to a temp directory and swapped in, so
+    readers never see a half-written partition. Returns total row count.
+    """
+    path = partition_path(table, patient_id, day, root)
+    if path.exists():
+        existing = read_partition(table, patient_id, day, root, mmap=False)
+        size = len(existing["timestamp"])
+        columns = {
+            name: np.concatenate([existing[name] if name in existing else _missing(col, size), col])
+            for name, col in columns.items()
+        }
+
+    order = np.argsort(columns["timestamp"], kind="stable")
+    tmp = path.with_name(path.name + ".tmp")
+    if tmp.exists():
+        shutil.rmtree(tmp)
+    tmp.mkdir(parents=True)
+    for name, col in columns.items():
+        with open(tmp / f"{name}.npy", "wb") as f:
+            np.save(f, col[order])
+            f.flush()
+            os.fsync(f.fileno())
+
+    old = path.with_name(path.name + ".old")
+    if path.exists():
+        path.rename(old)
+    tmp.rename(path)
+    if old.exists():
+        shutil.rmtree(old)
+    return len(order)
+
+
+def read_partition(table: str, patient_id: str, day: date, root: Path = None,
+                   mmap: bool = True) -> Dict[str, np.ndarray]:
+    """Load one partition's columns, memory-mapped by default."""
+    path = partition_path(table, patient_id, day, root)
+    return {
+        f.stem: np.load(f, mmap_mode="r" if mmap else None)
+        for f in path.glob("*.npy")
+    }
+
+
+def list_partitions(table: str, patient_id: str, start: date = None, end: date = None,
+                    root: Path = None) -> List[date]:
+    """Archived days for a patient, oldest first, optionally limited to [start, end]."""
+    base = (root or ARCHIVE_ROOT) / table / patient_id
+    if not base.exists():
+        return []
+    days = []
+    for entry in base.iterdir():
+        if not entry.is_dir() or "." in entry.name:
+            continue
+        day = date.fromisoformat(entry.name)
+        if (start is None or day >= start) and (end is None or day <= end):
+            days.append(day)
+    return sorted(days)
+
+
+def iter_partitions(table: str, patient_id: str, start: date = None, end: date = None,
+                    root: Path = None) -> Iterator[Tuple[date, Dict[str, np.ndarray]]]:
+    """Yield (day, memory-mapped columns) for each archived day in order."""
+    for day in list_partitions(table, patient_id, start, end, root):
+        yield day, read_partition(table, patient_id, day, root)
+
+
+def load_range(table: str, patient_id: str, since: datetime = None, until: datetime = None,
+               root: Path = None) -> Dict[str, np.ndarray]:
+    """Concatenate a patient's archived columns for a time range (for analytics)."""
+    parts = []
+    for _, columns in iter_partitions(table, patient_id,
+                                      since.date() if since else None,
+                                      until.date() if until else None, root):
+        ts = columns["timestamp"]
+        mask = np.ones(len(ts), dtype=bool)
+        if since is not None:
+            mask &= ts >= to_epoch_us(since)
+        if until is not None:
+            mask &= ts < to_epoch_us(until)
+        parts.append({name: col[mask] for name, col in columns.items()})
+    if not parts:
+        return {}
+    return {name: np.concatenate([p[name] for p in parts]) for name in parts[0]}
+
+
+async def _archive_model(db, model, table: str, spec: Dict, cutoff: datetime,
+                         extra_filter=None, root: Path = None) -> int:
+    """Move rows of one model older than cutoff into archive partitions, batch by batch."""
+    from sqlalchemy import select, delete
+    from change_tracker import COLLECTIONS, mark_deleted
+
+    moved = 0
+    while True:
+        query = (
+            select(model)
+            .where(model.timestamp < cutoff)
+            .order_by(model.patient_id, model.timestamp)
+            .limit(ARCHIVE_BATCH_SIZE)
+        )
+        if extra_filter is not None:
+            query = query.where(extra_filter)
+        rows = (await db.execute(query)).scalars().all()
+        if not rows:
+            break
+
+        partitions: Dict[Tuple[str, date], List] = {}
+        for row in rows:
+            partitions.setdefault((row.patient_id, row.timestamp.date()), []).append(row)
+
+        # Files are durable before the rows are deleted; a crash in between
+        # only risks archiving a batch twice, never losing it
+        for (patient_id, day), part_rows in partitions.items():
+            write_partition(table, patient_id, day, build_columns(part_rows, spec), root)
+
+        await db.execute(delete(model).where(model.id.in_([r.id for r in rows])))
+        if model.__tablename__ in COLLECTIONS:
+            mark_deleted(db, model.__tablename__, [r.id for r in rows])
+        await db.commit()
+        db.expunge_all()
+        moved += len(rows)
+
+        if len(rows) < ARCHIVE_BATCH_SIZE:
+            break
+    return moved
+
+
+async def archive_cold_data(db, older_than_days: float = ARCHIVE_AFTER_DAYS,
+                            root: Path = None) -> Dict[str, int]:
+    """
+    Archive all cold rows: compacted and raw locations, vitals and resolved alerts.
+    Returns rows moved per source table.
+    """
+    from database import Location, LocationHistory, Vital, Alert
+
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    return {
+        "location_history": await _archive_model(db, LocationHistory, "locations", LOCATION_COLUMNS, cutoff, root=root),
+        "locations": await _archive_model(db, Location, "locations", LOCATION_COLUMNS, cutoff, root=root),
+        "vitals": await _archive_model(db, Vital, "vitals", VITAL_COLUMNS, cutoff, root=root),
+        "alerts": await _archive_model(db, Alert, "alerts", ALERT_COLUMNS, cutoff,
+                                       extra_filter=Alert.resolved == True, root=root),
+    }
@@ -0,0 +1,448 @@
+"""
+Risk Pipeline Backtesting for SafeWander
+Replays stored or synthetic trajectories through the live evaluation step
+(risk_pipeline.evaluate_fix: zone status, anomaly detection, risk score,
+FSM transition) on a simulated clock, to compare RISK_WEIGHTS /
+FSM_THRESHOLDS settings before deploying them.
+
+A scenario is a plain picklable dict - fixes as NumPy columns plus zones,
+baseline, walk histogram, UTC offset and labelled incident windows - so a
+replay needs no database and is deterministic. Stored scenarios are
+labelled from the emergencies table (false alarms excluded); synthetic ones
+know whether they contain a wandering episode.
+
+Per run: alerts by level (coalesced like alert_aggregator), time in each
+FSM state, time from incident start to EMERGENCY, missed incidents and
+false alarms (escalations to WARNING or above outside incident windows).
+Parameter sweeps run one configuration per worker in a process pool.
+"""
+
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import select
+
+import config
+from alert_aggregator import UNCOALESCED_LEVELS
+from anomaly import TrajectoryTracker
+from risk_pipeline import evaluate_fix
+from state_machine import get_state_priority, state_to_alert_level
+from walk_histogram import WalkTimeHistogram
+from config import (
+    ALERT_DEDUP_WINDOW,
+    ALERT_DEDUP_MAX_SPAN,
+    ROLLUP_MAX_GAP,
+    BACKTEST_WORKERS,
+    BACKTEST_FIX_INTERVAL,
+)
+
+# Config dicts a configuration may override (updated in place, so every
+# module that imported them sees the change)
+TUNABLE = ("RISK_WEIGHTS", "FSM_THRESHOLDS")
+
+FALSE_ALARM_STATE = "warning"  # escalations to this state or above count as alarms
+
+DEFAULT_BASELINE = {
+    "avg_speed": 0.8,
+    "avg_duration": 900,
+    "std_speed": 0.2,
+    "std_duration": 300,
+}
+
+
+def _utc(epoch: float) -> datetime:
+    return datetime(1970, 1, 1) + timedelta(seconds=epoch)
+
+
+def _epoch(when: datetime) -> float:
+    return (when - datetime(1970, 1, 1)).total_seconds()
+
+
+# ==================== CONFIGURATIONS ====================
+
+def apply_overrides(overrides: Optional[Dict]) -> Dict:
+    """
+    Update the tunable config dicts in place.
+
+    Args:
+        overrides: e.g. {"RISK_WEIGHTS": {"night_hours": 25}}
+
+    Returns:
+        The previous values, for restore_overrides
+    """
+    previous = {}
+    for name, values in (overrides or {}).items():
+        if name not in TUNABLE:
+            raise ValueError(f"{name} is not tunable (one of {', '.join(TUNABLE)})")
+        target = getattr(config, name)
+        unknown = set(values) - set(target)
+        if unknown:
+            raise ValueError(f"unknown {name} keys: {', '.join(sorted(unknown))}")
+        previous[name] = {key: target[key] for key in values}
+        target.update(values)
+    return previous
+
+
+def restore_overrides(previous: Dict) -> None:
+    for name, values in previous.items():
+        getattr(config, name).update(values)
+
+
+# ==================== REPLAY ====================
+
+def replay_scenario(scenario: Dict) -> Dict:
+    """
+    Run one scenario through the pipeline with the current configuration.
+
+    Returns:
+        Per-scenario stats (see module docstring)
+    """
+    fixes = scenario["fixes"]
+    times = fixes["t"]
+    lats, lons = fixes["lat"], fixes["lon"]
+    speeds, headings = fixes["speed"], fixes["heading"]
+    zones = scenario["zones"]
+    baseline = scenario.get("baseline") or DEFAULT_BASELINE
+    histogram = WalkTimeHistogram(data=scenario["walk_histogram"]) if scenario.get("walk_histogram") else None
+    utc_offset = timedelta(seconds=scenario.get("utc_offset", 0))
+    incidents = scenario.get("incidents", [])
+
+    start = _utc(float(times[0])) if len(times) else None
+    state = SimpleNamespace(fsm_state="safe", state_entered_at=start, last_safe_zone_exit=None,
+                            risk_score=0, status="safe")
+    tracker = TrajectoryTracker()
+
+    alerts = {"low": 0, "medium": 0, "high": 0, "critical": 0}
+    open_alerts = {}  # level -> (first_seen, last_seen), as in alert_aggregator
+    time_in_state = {}
+    false_alarms = 0
+    first_emergency = {}  # incident index -> epoch of first EMERGENCY
+    alarm_threshold = get_state_priority(FALSE_ALARM_STATE)
+
+    previous_t = None
+    for i in range(len(times)):
+        t = float(times[i])
+        now = _utc(t)
+        if previous_t is not None:
+            elapsed = min(t - previous_t, ROLLUP_MAX_GAP)
+            time_in_state[state.fsm_state] = time_in_state.get(state.fsm_state, 0.0) + elapsed
+        previous_t = t
+
+        evaluation = evaluate_fix(
+            state, float(lats[i]), float(lons[i]), now, zones, baseline, histogram,
+            None if np.isnan(speeds[i]) else float(speeds[i]),
+            None if np.isnan(headings[i]) else float(headings[i]),
+            tracker=tracker, utc_offset=utc_offset,
+        )
+        new_state = evaluation["new_state"]
+        if not evaluation["alert_message"]:
+            continue
+
+        level = state_to_alert_level(new_state)
+        window = open_alerts.get(level)
+        if (window and level not in UNCOALESCED_LEVELS
+                and t - window[1] < ALERT_DEDUP_WINDOW and t - window[0] < ALERT_DEDUP_MAX_SPAN):
+            open_alerts[level] = (window[0], t)
+        else:
+            open_alerts[level] = (t, t)
+            alerts[level] += 1
+
+        incident = next((k for k, (a, b) in enumerate(incidents) if a <= t <= b), None)
+        escalated = get_state_priority(new_state) > get_state_priority(evaluation["previous_state"])
+        if escalated and get_state_priority(new_state) >= alarm_threshold and incident is None:
+            false_alarms += 1
+        if new_state == "emergency" and incident is not None and incident not in first_emergency:
+            first_emergency[incident] = t
+
+    simulated = float(times[-1] - times[0]) if len(times) > 1 else 0.0
+    in_incidents = sum(max(min(b, previous_t) - max(a, float(times[0])), 0.0) for a, b in incidents) if len(times) else 0.0
+
+    return {
+        "name": scenario.get("name"),
+        "fixes": int(len(times)),
+        "simulated_seconds": simulated,
+        "quiet_seconds": simulated - in_incidents,  # outside incident windows
+        "alerts": alerts,
+        "time_in_state": time_in_state,
+        "false_alarms": false_alarms,
+        "incidents": len(incidents),
+        "detected": len(first_emergency),
+        "time_to_emergency": [first_emergency[k] - incidents[k][0] for k in sorted(first_emergency)],
+        "final_state": state.fsm_state,
+    }
+
+
+def summarize(results: List[Dict], wall_seconds: float) -> Dict:
+    """Totals over scenario results."""
+    alerts = {level: sum(r["alerts"][level] for r in results) for level in ("low", "medium", "high", "critical")}
+    time_in_state = {}
+    for r in results:
+        for state, seconds in r["time_in_state"].items():
+            time_in_state[state] = time_in_state.get(state, 0.0) + seconds
+    delays = [d for r in results for d in r["time_to_emergency"]]
+    incidents = sum(r["incidents"] for r in results)
+    detected = sum(r["detected"] for r in results)
+    simulated = sum(r["simulated_seconds"] for r in results)
+    quiet_hours = sum(r["quiet_seconds"] for r in results) / 3600
+    false_alarms = sum(r["false_alarms"] for r in results)
+    return {
+        "scenarios": len(results),
+        "fixes": sum(r["fixes"] for r in results),
+        "alerts": alerts,
+        "time_in_state": time_in_state,
+        "incidents": incidents,
+        "detected": detected,
+        "missed": incidents - detected,
+        "time_to_emergency_median": float(np.median(delays)) if delays else None,
+        "time_to_emergency_max": float(max(delays)) if delays else None,
+        "false_alarms": false_alarms,
+        "false_alarms_per_day": false_alarms / quiet_hours * 24 if quiet_hours else None,
+        "simulated_seconds": simulated,
+        "wall_seconds": wall_seconds,
+        "speedup": simulated / wall_seconds if wall_seconds > 0 else None,
+    }
+
+
+def run_backtest(scenarios: List[Dict], overrides: Optional[Dict] = None) -> Dict:
+    """Replay all scenarios under one configuration (restored afterwards)."""
+    previous = apply_overrides(overrides)
+    try:
+        started = time.perf_counter()
+        results = [replay_scenario(s) for s in scenarios]
+        summary = summarize(results, time.perf_counter() - started)
+    finally:
+        restore_overrides(previous)
+    return {"config": overrides or {}, "summary": summary, "scenarios": results}
+
+
+# ==================== PARAMETER SWEEP ====================
+
+_worker_scenarios: List[Dict] = []
+
+
+def _init_worker(scenarios: List[Dict]) -> None:
+    """Process pool initializer: scenarios are shipped once per worker."""
+    global _worker_scenarios
+    _worker_scenarios = scenarios
+
+
+def _run_in_worker(overrides: Dict) -> Dict:
+    """Process pool entry point."""
+    result = run_backtest(_worker_scenarios, overrides)
+    result.pop("scenarios")
+    return result
+
+
+def sweep(scenarios: List[Dict], configurations: List[Dict],
+          workers: int = BACKTEST_WORKERS) -> List[Dict]:
+    """
+    Backtest each configuration (overrides dict) against the same scenarios.
+    With workers > 1, configurations run in parallel in a process pool.
+
+    Returns:
+        [{"config", "summary"}] in the order of `configurations`
+    """
+    for overrides in configurations:
+        restore_overrides(apply_overrides(overrides))  # validate before forking
+
+    if workers <= 1 or len(configurations) <= 1:
+        _init_worker(scenarios)
+        return [_run_in_worker(overrides) for overrides in configurations]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(scenarios,)) as pool:
+        return list(pool.map(_run_in_worker, configurations))
+
+
+def grid(base: Optional[Dict] = None, **axes) -> List[Dict]:
+    """
+    Cartesian product of overrides, e.g.
+    grid(RISK_WEIGHTS__night_hours=[10, 15, 20], FSM_THRESHOLDS__urgent_hold_time=[300, 600]).
+    """
+    configurations = [base or {}]
+    for axis, values in axes.items():
+        name, key = axis.split("__", 1)
+        configurations = [
+            {**c, name: {**c.get(name, {}), key: value}}
+            for c in configurations for value in values
+        ]
+    return configurations
+
+
+# ==================== SCENARIOS ====================
+
+def _columns(t, lat, lon, speed=None, heading=None) -> Dict[str, np.ndarray]:
+    n = len(t)
+    nan = np.full(n, np.nan)
+    return {
+        "t": np.asarray(t, dtype=np.float64),
+        "lat": np.asarray(lat, dtype=np.float64),
+        "lon": np.asarray(lon, dtype=np.float64),
+        "speed": nan if speed is None else np.asarray(speed, dtype=np.float64),
+        "heading": nan if heading is None else np.asarray(heading, dtype=np.float64),
+    }
+
+
+async def load_scenario(db, patient_id: str, since: datetime, until: datetime) -> Optional[Dict]:
+    """
+    Scenario from a patient's stored fixes in [since, until), with current
+    zones and baseline, and emergencies (except false alarms) as incidents.
+    """
+    from database import Location, Zone, Emergency, Baseline
+    from walk_histogram import utc_to_local
+
+    rows = (await db.execute(
+        select(Location.timestamp, Location.latitude, Location.longitude, Location.speed, Location.heading)
+        .where(Location.patient_id == patient_id)
+        .where(Location.timestamp >= since)
+        .where(Location.timestamp < until)
+        .order_by(Location.timestamp, Location.id)
+    )).all()
+    if not rows:
+        return None
+
+    zones = (await db.execute(
+        select(Zone).where(Zone.patient_id == patient_id).where(Zone.active == True)
+    )).scalars().all()
+    baseline = (await db.execute(
+        select(Baseline).where(Baseline.patient_id == patient_id)
+    )).scalar_one_or_none()
+    emergencies = (await db.execute(
+        select(Emergency)
+        .where(Emergency.patient_id == patient_id)
+        .where(Emergency.status != "false_alarm")
+    )).scalars().all()
+
+    incidents = []
+    for e in emergencies:
+        begin = e.missing_since or e.created_at
+        end = e.resolved_at or until
+        if begin and begin < until and end >= since:
+            incidents.append((_epoch(begin), _epoch(end)))
+
+    return {
+        "name": f"{patient_id} {since:%Y-%m-%d %H:%M} - {until:%Y-%m-%d %H:%M}",
+        "patient_id": patient_id,
+        "fixes": _columns(
+            [_epoch(r.timestamp) for r in rows],
+            [r.latitude for r in rows],
+            [r.longitude for r in rows],
+            [np.nan if r.speed is None else r.speed for r in rows],
+            [np.nan if r.heading is None else r.heading for r in rows],
+        ),
+        "zones": [
+            {
+                "id": z.id,
+                "name": z.name,
+                "type": z.type or "safe",
+                "center": z.coordinates[0] if z.coordinates else {"lat": 0, "lng": 0},
+                "radius": z.radius or 100,
+            }
+            for z in zones
+        ],
+        "baseline": {
+            "avg_speed": baseline.avg_speed,
+            "avg_duration": baseline.avg_duration,
+            "std_speed": baseline.std_speed,
+            "std_duration": baseline.std_duration,
+        } if baseline else DEFAULT_BASELINE,
+        "walk_histogram": baseline.walk_histogram if baseline else None,
+        # Frozen so replays do not depend on the machine running them
+        "utc_offset": (utc_to_local(since) - since).total_seconds(),
+        "incidents": sorted(incidents),
+    }
+
+
+async def load_scenarios(patient_ids: Optional[List[str]] = None,
+                         since: Optional[datetime] = None,
+                         until: Optional[datetime] = None) -> List[Dict]:
+    """Stored scenarios, one per patient (default: all patients, last 7 days)."""
+    from database import async_session_maker, init_db, Patient
+
+    await init_db()  # add columns missing from older databases
+    until = until or datetime.utcnow()
+    since = since or until - timedelta(days=7)
+    async with async_session_maker() as db:
+        if patient_ids is None:
+            patient_ids = list((await db.execute(select(Patient.id))).scalars().all())
+        scenarios = [await load_scenario(db, patient_id, since, until) for patient_id in patient_ids]
+    return [s for s in scenarios if s is not None]
+
+
+HOME = (40.7580, -73.9855)
+_METERS_PER_DEGREE = 111320.0
+
+
+def _to_latlon(x: np.ndarray, y: np.ndarray):
+    lat = HOME[0] + y / _METERS_PER_DEGREE
+    lon = HOME[1] + x / (_METERS_PER_DEGREE * np.cos(np.radians(HOME[0])))
+    return lat, lon
+
+
+def synthetic_scenario(seed: int, wandering: bool, interval: float = BACKTEST_FIX_INTERVAL) -> Dict:
+    """
+    A walk from home with safe + buffer zones and a danger zone nearby.
+    Routine walks go out and come back within the usual trip duration;
+    wandering episodes drift away on a tortuous path for 1-2 hours and are
+    labelled as an incident from the moment the patient leaves home.
+    """
+    rng = np.random.default_rng(seed)
+    start = 1_700_000_000 + int(rng.integers(0, 7 * 86400))
+    speed = rng.uniform(0.6, 1.1)
+    step = speed * interval
+
+    home_fixes = int(rng.integers(30, 90))
+    if wandering:
+        fixes = int(rng.uniform(3600, 7200) / interval)
+        turns = rng.normal(0, 0.5, fixes)  # strong random turning
+    else:
+        fixes = int(rng.uniform(900, 2400) / interval)
+        turns = rng.normal(0, 0.1, fixes)
+
+    heading = rng.uniform(0, 2 * np.pi) + np.cumsum(turns)
+    dx, dy = step * np.cos(heading), step * np.sin(heading)
+    if not wandering:
+        # Walk out for the first half, then retrace to home
+        half = fixes // 2
+        dx[half:half * 2], dy[half:half * 2] = -dx[:half][::-1], -dy[:half][::-1]
+        dx[half * 2:], dy[half * 2:] = 0.0, 0.0
+    x = np.concatenate([rng.normal(0, 5, home_fixes), np.cumsum(dx)])
+    y = np.concatenate([rng.normal(0, 5, home_fixes), np.cumsum(dy)])
+    x += rng.normal(0, 4, x.size)  # GPS noise
+    y += rng.normal(0, 4, y.size)
+    lat, lon = _to_latlon(x, y)
+    t = start + interval * np.arange(x.size)
+    speeds = np.concatenate([np.zeros(home_fixes), np.full(fixes, speed)])
+    headings = np.concatenate([np.full(home_fixes, np.nan), np.degrees(heading) % 360])
+
+    danger_lat, danger_lon = _to_latlon(np.array([rng.uniform(-600, 600)]), np.array([rng.uniform(-600, 600)]))
+    zones = [
+        {"id": "home", "name": "Home", "type": "safe", "center": {"lat": HOME[0], "lng": HOME[1]},
+         "radius": 100},
+        {"id": "home-buffer", "name": "Home - Buffer", "type": "buffer",
+         "center": {"lat": HOME[0], "lng": HOME[1]}, "radius": 100 + config.ZONE_DEFAULTS["buffer_offset"]},
+        {"id": "road", "name": "Road", "type": "danger",
+         "center": {"lat": float(danger_lat[0]), "lng": float(danger_lon[0])}, "radius": 50},
+    ]
+
+    return {
+        "name": f"synthetic-{seed}-{'wander' if wandering else 'walk'}",
+        "patient_id": None,
+        "fixes": _columns(t, lat, lon, speeds, headings),
+        "zones": zones,
+        "baseline": DEFAULT_BASELINE,
+        "walk_histogram": None,
+        "utc_offset": 0,
+        "incidents": [(float(t[home_fixes]), float(t[-1]))] if wandering else [],
+    }
+
+
+def synthetic_scenarios(count: int, seed: int = 0, wandering_share: float = 0.3) -> List[Dict]:
+    """`count` reproducible synthetic scenarios, about `wandering_share` of them incidents."""
+    rng = np.random.default_rng(seed)
+    return [synthetic_scenario(seed * 100003 + i, bool(rng.random() < wandering_share))
+            for i in range(count)]
@@ -6,7 +6,15 @@ Rolling 7-14 day averages for patient behavior patterns.
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
+
+from walk_histogram import WalkTimeHistogram, utc_to_local
+
+# In-memory walk-time histograms with the baseline row's updated_at they
+# match. Callers pass the updated_at of the row they already loaded, so a
+# rebuild written by another process (scripts/rebuild_baselines.py) is picked
+# up instead of being overwritten by the next record_walk.
+_walk_histograms: Dict[str, Tuple[Optional[datetime], WalkTimeHistogram]] = {}
 
 
 async def get_baseline(db: AsyncSession, patient_id: str) -> Dict:
@@ -29,6 +37,7 @@ async def get_baseline(db: AsyncSession, patient_id: str) -> Dict:
             "std_speed": 0.2,
             "std_duration": 300,   # 5 min standard deviation
             "common_walk_hours": [7, 8, 9, 17, 18, 19],  # Default morning/evening
+            "updated_at": None,
         }
     
     return {
@@ -37,6 +46,7 @@ async def get_baseline(db: AsyncSession, patient_id: str) -> Dict:
         "std_speed": baseline.std_speed,
         "std_duration": baseline.std_duration,
         "common_walk_hours": baseline.common_walk_hours or [7, 8, 9, 17, 18, 19],
+        "updated_at": baseline.updated_at,
     }
 
 
@@ -117,8 +127,12 @@ async def reset_baseline(db: AsyncSession, patient_id: str) -> None:
         baseline.std_speed = 0.2
         baseline.std_duration = 300
         baseline.sample_count = 0
+        baseline.common_walk_hours = None
+        baseline.walk_histogram = None
         baseline.updated_at = datetime.utcnow()
         await db.commit()
+    
+    _walk_histograms.pop(patient_id, None)
 
 
 def is_usual_walk_time(current_hour: int, common_hours: list) -> bool:
@@ -126,19 +140,56 @@ def is_usual_walk_time(current_hour: int, common_hours: list) -> bool:
     return current_hour in common_hours
 
 
-async def add_walk_hour(db: AsyncSession, patient_id: str, hour: int) -> None:
-    """Add an hour to common walking times if frequently observed."""
+async def get_walk_histogram(
+    db: AsyncSession,
+    patient_id: str,
+    version: Optional[datetime],
+) -> WalkTimeHistogram:
+    """
+    Get the patient's walk-time histogram.
+    `version` is the updated_at of the baseline row the caller loaded
+    (get_baseline()["updated_at"]). Served from memory while it is unchanged,
+    reloaded from the row otherwise.
+    """
+    from database import Baseline
+    
+    cached = _walk_histograms.get(patient_id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    
+    result = await db.execute(
+        select(Baseline.walk_histogram).where(Baseline.patient_id == patient_id)
+    )
+    histogram = WalkTimeHistogram(data=result.scalar_one_or_none())
+    _walk_histograms[patient_id] = (version, histogram)
+    return histogram
+
+
+def invalidate_walk_histogram(patient_id: str) -> None:
+    """Drop the cached histogram so the next lookup reloads it (e.g. after a rebuild)."""
+    _walk_histograms.pop(patient_id, None)
+
+
+async def record_walk(db: AsyncSession, patient_id: str, started_at: datetime) -> None:
+    """
+    Record a completed trip that started at `started_at` (UTC).
+    O(1) histogram update; the packed histogram is written to the baseline
+    row and committed by the caller.
+    """
     from database import Baseline
     
     result = await db.execute(
         select(Baseline).where(Baseline.patient_id == patient_id)
     )
     baseline = result.scalar_one_or_none()
+    histogram = await get_walk_histogram(db, patient_id, baseline.updated_at if baseline else None)
+    histogram.record(utc_to_local(started_at))
     
-    if baseline and baseline.common_walk_hours:
-        if hour not in baseline.common_walk_hours:
-            # Simple approach: add if we see it, list management can be enhanced
-            hours = list(baseline.common_walk_hours)
-            hours.append(hour)
-            baseline.common_walk_hours = hours[-10:]  # Keep last 10 unique hours
-            await db.commit()
+    if not baseline:
+        baseline = Baseline(patient_id=patient_id, sample_count=0)
+        db.add(baseline)
+    
+    baseline.walk_histogram = histogram.to_bytes()
+    baseline.common_walk_hours = histogram.common_hours() or None
+    baseline.updated_at = datetime.utcnow()
+    _walk_histograms[patient_id] = (baseline.updated_at, histogram)
@@ -0,0 +1,303 @@
+"""
+Offline Baseline Rebuild for SafeWander
+Recomputes behavioral baselines from stored location history.
+
+History is streamed per patient in keyset-paginated chunks, segmented into
+trips (safe zone exit -> re-entry) and reduced to running statistics, so
+memory stays bounded no matter how many months of fixes are stored.
+"""
+
+import asyncio
+import math
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import select, and_, or_
+
+from config import (
+    BASELINE_REBUILD_CHUNK_SIZE,
+    BASELINE_REBUILD_WORKERS,
+    TRIP_MAX_GAP,
+    TRIP_MIN_DURATION,
+)
+from geo_utils import haversine_distance, get_zone_status
+from walk_histogram import WalkTimeHistogram, utc_to_local
+from baseline import invalidate_walk_histogram
+
+
+class RunningStats:
+    """Welford running mean / standard deviation."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+    @property
+    def std(self) -> float:
+        if self.count < 2:
+            return 0.0
+        return math.sqrt(self._m2 / (self.count - 1))
+
+
+class TripSegmenter:
+    """
+    Splits a time-ordered stream of fixes into trips outside safe zones.
+    A trip starts on the first fix outside every safe zone and ends on the
+    first fix back inside one. Gaps longer than max_gap abandon the trip.
+    """
+
+    def __init__(self, zones: List[Dict], max_gap: float = TRIP_MAX_GAP,
+                 min_duration: float = TRIP_MIN_DURATION):
+        self.zones = zones
+        self.max_gap = max_gap
+        self.min_duration = min_duration
+        self._start: Optional[datetime] = None
+        self._last: Optional[tuple] = None  # (lat, lon, timestamp)
+        self._distance = 0.0
+
+    def feed(self, lat: float, lon: float, timestamp: datetime) -> Optional[Dict]:
+        """
+        Consume one fix. Returns a completed trip dict
+        ({start, end, duration, distance, speed}) or None.
+        """
+        if self._last and (timestamp - self._last[2]).total_seconds() > self.max_gap:
+            self._start = None
+
+        in_safe = get_zone_status(lat, lon, self.zones)["in_safe"]
+        trip = None
+
+        if self._start is None:
+            if not in_safe:
+                self._start = timestamp
+                self._distance = 0.0
+        else:
+            self._distance += haversine_distance(self._last[0], self._last[1], lat, lon)
+            if in_safe:
+                duration = (timestamp - self._start).total_seconds()
+                if duration >= self.min_duration:
+                    trip = {
+                        "start": self._start,
+                        "end": timestamp,
+                        "duration": duration,
+                        "distance": self._distance,
+                        "speed": self._distance / duration,
+                    }
+                self._start = None
+
+        self._last = (lat, lon, timestamp)
+        return trip
+
+
+async def _stream_table(db, model, patient_id: str, chunk_size: int, after: datetime = None):
+    """Keyset-paginated (timestamp, id) scan of one patient's rows in a location table."""
+    last_ts, last_id = None, None
+    while True:
+        query = (
+            select(model.id, model.latitude, model.longitude, model.timestamp)
+            .where(model.patient_id == patient_id)
+            .where(model.timestamp.is_not(None))
+            .order_by(model.timestamp, model.id)
+            .limit(chunk_size)
+        )
+        if after is not None:
+            query = query.where(model.timestamp > after)
+        if last_ts is not None:
+            query = query.where(or_(
+                model.timestamp > last_ts,
+                and_(model.timestamp == last_ts, model.id > last_id),
+            ))
+
+        rows = (await db.execute(query)).all()
+        if not rows:
+            return
+
+        for row in rows:
+            yield row.latitude, row.longitude, row.timestamp
+
+        last_ts, last_id = rows[-1].timestamp, rows[-1].id
+        if len(rows) < chunk_size:
+            return
+
+
+async def stream_locations(db, patient_id: str, chunk_size: int = BASELINE_REBUILD_CHUNK_SIZE):
+    """
+    Yield (latitude, longitude, timestamp) rows for a patient in time order:
+    archived partitions first, then compacted history, then full-resolution
+    fixes, each source starting after the last timestamp of the previous one.
+    Database sources use (timestamp, id) keyset pagination so each chunk is an
+    index seek; archive partitions are memory-mapped one day at a time.
+    """
+    from database import Location, LocationHistory
+    from archive import iter_partitions, from_epoch_us, to_epoch_us
+
+    last_ts = None
+    for _, columns in iter_partitions("locations", patient_id):
+        timestamps = columns["timestamp"]
+        lats, lons = columns["latitude"], columns["longitude"]
+        start = 0
+        if last_ts is not None:
+            start = int(timestamps.searchsorted(to_epoch_us(last_ts), side="right"))
+        for i in range(start, len(timestamps)):
+            last_ts = from_epoch_us(timestamps[i])
+            yield float(lats[i]), float(lons[i]), last_ts
+
+    async for lat, lon, timestamp in _stream_table(db, LocationHistory, patient_id, chunk_size, after=last_ts):
+        last_ts = timestamp
+        yield lat, lon, timestamp
+
+    async for row in _stream_table(db, Location, patient_id, chunk_size, after=last_ts):
+        yield row
+
+
+async def get_safe_zones(db, patient_id: str) -> List[Dict]:
+    """Load a patient's active safe zones in the dict format geo_utils expects."""
+    from database import Zone
+
+    result = await db.execute(
+        select(Zone)
+        .where(Zone.patient_id == patient_id)
+        .where(Zone.active == True)
+        .where(Zone.type == "safe")
+    )
+    return [
+        {
+            "id": z.id,
+            "name": z.name,
+            "type": z.type,
+            "center": z.coordinates[0] if z.coordinates else {"lat": 0, "lng": 0},
+            "radius": z.radius or 100,
+        }
+        for z in result.scalars().all()
+    ]
+
+
+async def compute_baseline_from_history(db, patient_id: str) -> Optional[Dict]:
+    """
+    Reduce a patient's full location history to baseline statistics.
+    Returns None if the patient has no safe zones to segment trips against.
+    """
+    zones = await get_safe_zones(db, patient_id)
+    if not zones:
+        return None
+
+    segmenter = TripSegmenter(zones)
+    speeds = RunningStats()
+    durations = RunningStats()
+    walk_histogram = WalkTimeHistogram()
+    fixes = 0
+
+    async for lat, lon, timestamp in stream_locations(db, patient_id):
+        fixes += 1
+        trip = segmenter.feed(lat, lon, timestamp)
+        if trip:
+            speeds.add(trip["speed"])
+            durations.add(trip["duration"])
+            walk_histogram.record(utc_to_local(trip["start"]))
+
+    trips = durations.count
+
+    return {
+        "patient_id": patient_id,
+        "fixes": fixes,
+        "trips": trips,
+        "avg_speed": speeds.mean,
+        "std_speed": speeds.std,
+        "avg_duration": durations.mean,
+        "std_duration": durations.std,
+        "walk_histogram": walk_histogram,
+    }
+
+
+async def write_baseline(db, stats: Dict) -> None:
+    """Upsert a Baseline row from computed statistics."""
+    from database import Baseline
+
+    result = await db.execute(
+        select(Baseline).where(Baseline.patient_id == stats["patient_id"])
+    )
+    baseline = result.scalar_one_or_none()
+    if not baseline:
+        baseline = Baseline(patient_id=stats["patient_id"])
+        db.add(baseline)
+
+    baseline.avg_speed = stats["avg_speed"]
+    baseline.avg_duration = stats["avg_duration"]
+    # A single trip has no spread; keep the model defaults until more data exists
+    baseline.std_speed = stats["std_speed"] if stats["trips"] > 1 else 0.2
+    baseline.std_duration = stats["std_duration"] if stats["trips"] > 1 else 300
+    baseline.sample_count = stats["trips"]
+    baseline.walk_histogram = stats["walk_histogram"].to_bytes()
+    baseline.common_walk_hours = stats["walk_histogram"].common_hours() or None
+    baseline.updated_at = datetime.utcnow()
+    await db.commit()
+    invalidate_walk_histogram(stats["patient_id"])
+
+
+async def rebuild_patient_baseline(db, patient_id: str) -> Dict:
+    """
+    Recompute and store one patient's baseline.
+    Patients without safe zones or completed trips keep their current baseline.
+    """
+    stats = await compute_baseline_from_history(db, patient_id)
+    if stats is None:
+        return {"patient_id": patient_id, "status": "skipped", "reason": "no safe zones"}
+    if stats["trips"] == 0:
+        return {"patient_id": patient_id, "status": "skipped", "reason": "no trips",
+                "fixes": stats["fixes"]}
+
+    await write_baseline(db, stats)
+    return {"patient_id": patient_id, "status": "rebuilt", "fixes": stats["fixes"],
+            "trips": stats["trips"]}
+
+
+async def _rebuild_with_own_engine(patient_id: str) -> Dict:
+    """Rebuild using a private engine - connections cannot cross process boundaries."""
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+    from database import DATABASE_URL
+
+    engine = create_async_engine(DATABASE_URL)
+    session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    try:
+        async with session_maker() as db:
+            return await rebuild_patient_baseline(db, patient_id)
+    finally:
+        await engine.dispose()
+
+
+def _rebuild_in_process(patient_id: str) -> Dict:
+    """Process pool entry point."""
+    return asyncio.run(_rebuild_with_own_engine(patient_id))
+
+
+async def rebuild_all_baselines(patient_ids: List[str] = None,
+                                workers: int = BASELINE_REBUILD_WORKERS) -> List[Dict]:
+    """
+    Rebuild baselines for the given patients (default: all patients).
+    With workers > 1, patients are processed in parallel in a process pool.
+    """
+    from database import async_session_maker, Patient
+
+    if patient_ids is None:
+        async with async_session_maker() as db:
+            patient_ids = list((await db.execute(select(Patient.id))).scalars().all())
+
+    if workers <= 1 or len(patient_ids) <= 1:
+        results = []
+        for patient_id in patient_ids:
+            results.append(await _rebuild_with_own_engine(patient_id))
+        return results
+
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(await asyncio.gather(*[
+            loop.run_in_executor(pool, _rebuild_in_process, patient_id)
+            for patient_id in patient_ids
+        ]))
@@ -0,0 +1,149 @@
+"""
+Binary Fix Format for SafeWander
+Fixed-width location records for low-power trackers, decoded in bulk with
+NumPy instead of validating one JSON object per fix.
+
+A payload is a 4-byte header followed by N packed little-endian records:
+
+    header  magic "SW" | version u8 (=1) | reserved u8
+    record  device_id u32 | lat i32 | lon i32 | accuracy u16 | speed u16 |
+            heading u16 | epoch u32                            (22 bytes)
+
+lat/lon are microdegrees, accuracy decimetres, speed cm/s, heading
+centidegrees (0-35999) and epoch UTC seconds. 0xFFFF in accuracy, speed or
+heading means "not available". device_id is the id returned when the
+tracker was registered (POST /api/tracking/devices).
+
+On the device WebSocket channel a binary frame is a u32 sequence number
+followed by a payload; the server acks the sequence number once the
+frame's fixes are committed.
+"""
+
+import struct
+from datetime import datetime
+from typing import Dict, Iterable
+
+import numpy as np
+
+MEDIA_TYPE = "application/vnd.safewander.fix"
+MAGIC = b"SW"
+VERSION = 1
+HEADER = struct.Struct("<2sBB")
+RECORD = struct.Struct("<IiiHHHI")
+FRAME_SEQ = struct.Struct("<I")
+MISSING = 0xFFFF
+
+RECORD_DTYPE = np.dtype([
+    ("device_id", "<u4"),
+    ("lat", "<i4"),
+    ("lon", "<i4"),
+    ("accuracy", "<u2"),
+    ("speed", "<u2"),
+    ("heading", "<u2"),
+    ("epoch", "<u4"),
+])
+assert RECORD_DTYPE.itemsize == RECORD.size
+
+
+class FixFormatError(ValueError):
+    """Payload is not a well-formed fix batch."""
+
+
+def _optional(values: np.ndarray, scale: float) -> np.ndarray:
+    """Scaled float column with NaN where the device sent MISSING."""
+    out = values.astype(np.float64) / scale
+    out[values == MISSING] = np.nan
+    return out
+
+
+def decode_fixes(payload: bytes) -> Dict[str, np.ndarray]:
+    """
+    Decode a payload into column arrays in SI units.
+
+    Returns:
+        device_id, epoch, lat, lon (degrees), accuracy (m), speed (m/s),
+        heading (degrees, NaN when missing) and `valid`, a mask of records
+        with in-range coordinates and heading.
+    """
+    if len(payload) < HEADER.size:
+        raise FixFormatError("payload shorter than header")
+    magic, version, _ = HEADER.unpack_from(payload)
+    if magic != MAGIC:
+        raise FixFormatError("bad magic")
+    if version != VERSION:
+        raise FixFormatError(f"unsupported version {version}")
+    body = len(payload) - HEADER.size
+    if body % RECORD.size:
+        raise FixFormatError(f"body length {body} is not a multiple of {RECORD.size}")
+
+    records = np.frombuffer(payload, dtype=RECORD_DTYPE, offset=HEADER.size)
+    lat = records["lat"] / 1e6
+    lon = records["lon"] / 1e6
+    heading = _optional(records["heading"], 100.0)
+    valid = (
+        (np.abs(lat) <= 90) & (np.abs(lon) <= 180)
+        & ~((lat == 0) & (lon == 0))  # no fix yet
+        & (np.isnan(heading) | (heading < 360))
+        & (records["epoch"] > 0)
+    )
+    return {
+        "device_id": records["device_id"].astype(np.int64),
+        "epoch": records["epoch"].astype(np.int64),
+        "lat": lat,
+        "lon": lon,
+        "accuracy": _optional(records["accuracy"], 10.0),
+        "speed": _optional(records["speed"], 100.0),
+        "heading": heading,
+        "valid": valid,
+    }
+
+
+def decode_frame(frame: bytes):
+    """(sequence number, decode_fixes columns) for a device channel frame."""
+    if len(frame) < FRAME_SEQ.size:
+        raise FixFormatError("frame shorter than sequence number")
+    (seq,) = FRAME_SEQ.unpack_from(frame)
+    return seq, decode_fixes(frame[FRAME_SEQ.size:])
+
+
+def iter_fixes(columns: Dict[str, np.ndarray]):
+    """Valid records as dicts in device-time order (NaN -> None)."""
+    index = np.flatnonzero(columns["valid"])
+    index = index[np.argsort(columns["epoch"][index], kind="stable")]
+    nan_to_none = lambda v: None if np.isnan(v) else float(v)
+    for i in index.tolist():
+        yield {
+            "device_id": int(columns["device_id"][i]),
+            "timestamp": datetime.utcfromtimestamp(int(columns["epoch"][i])),
+            "latitude": float(columns["lat"][i]),
+            "longitude": float(columns["lon"][i]),
+            "accuracy": nan_to_none(columns["accuracy"][i]),
+            "speed": nan_to_none(columns["speed"][i]),
+            "heading": nan_to_none(columns["heading"][i]),
+        }
+
+
+def _scaled(value, scale: float, limit: int = MISSING - 1) -> int:
+    if value is None:
+        return MISSING
+    return min(max(int(round(value * scale)), 0), limit)
+
+
+def encode_fixes(fixes: Iterable[dict]) -> bytes:
+    """
+    Pack fixes ({device_id, latitude, longitude, epoch, accuracy?, speed?,
+    heading?}) into a payload - the reference encoder for tracker firmware.
+    """
+    parts = [HEADER.pack(MAGIC, VERSION, 0)]
+    for fix in fixes:
+        heading = fix.get("heading")
+        parts.append(RECORD.pack(
+            fix["device_id"],
+            int(round(fix["latitude"] * 1e6)),
+            int(round(fix["longitude"] * 1e6)),
+            _scaled(fix.get("accuracy"), 10.0),
+            _scaled(fix.get("speed"), 100.0),
+            _scaled(heading % 360 if heading is not None else None, 100.0, 35999),
+            int(fix["epoch"]),
+        ))
+    return b"".join(parts)
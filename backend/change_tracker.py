@@ -0,0 +1,170 @@
+"""
+Change Tracking for SafeWander
+Monotonic change versions for the patients, alerts and emergencies
+collections, so polling dashboards can skip unchanged data.
+
+Every committed change gets the next value of one process-wide clock; each
+collection remembers the version of its latest change and of every changed
+item. That gives:
+- ETags per collection (If-None-Match -> 304 without touching the database);
+- deltas: the ids changed or deleted since a client's last version.
+
+ORM changes (session.add / attribute sets / session.delete) are picked up
+automatically from flushes. Core UPDATE/DELETE statements bypass the unit of
+work, so code issuing them calls mark_changed / mark_deleted / mark_reset.
+Versions are applied only after the transaction commits, so a client never
+sees a version whose data it could not read yet.
+
+The clock starts at the current time in microseconds, so versions keep
+increasing across restarts; versions older than this process (or older than
+pruned history) ask the client for a full resync.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import Request, Response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from config import SYNC_MAX_TRACKED
+
+# Collections are named after their tables
+COLLECTIONS = ("patients", "alerts", "emergencies")
+
+_clock = time.time_ns() // 1000
+_collection_version: Dict[str, int] = {c: _clock for c in COLLECTIONS}
+# Changes at or below this version are not individually known (full resync)
+_floor: Dict[str, int] = {c: _clock for c in COLLECTIONS}
+# id -> version of its last change, oldest first
+_changed: Dict[str, "OrderedDict[str, int]"] = {c: OrderedDict() for c in COLLECTIONS}
+_deleted: Dict[str, "OrderedDict[str, int]"] = {c: OrderedDict() for c in COLLECTIONS}
+
+PENDING_KEY = "change_tracker.pending"
+
+
+def current_version(collection: Optional[str] = None) -> int:
+    """Version of the latest change in a collection (or in any collection)."""
+    return _collection_version[collection] if collection else max(_collection_version.values())
+
+
+def etag(collection: Optional[str] = None) -> str:
+    return f'W/"{collection or "all"}-{current_version(collection)}"'
+
+
+def matches(if_none_match: Optional[str], tag: str) -> bool:
+    """True when an If-None-Match header already names this ETag."""
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or tag in [t.strip() for t in if_none_match.split(",")]
+
+
+def not_modified(request: Request, collection: Optional[str] = None) -> Optional[Response]:
+    """A 304 response when the client's If-None-Match is still current, else None."""
+    tag = etag(collection)
+    if matches(request.headers.get("if-none-match"), tag):
+        return Response(status_code=304, headers={"ETag": tag})
+    return None
+
+
+def _record(store: "OrderedDict[str, int]", item_id: str, version: int) -> None:
+    store[item_id] = version
+    store.move_to_end(item_id)
+
+
+def _prune(collection: str) -> None:
+    """Forget the oldest half once too many items are tracked; raises the resync floor."""
+    for store in (_changed[collection], _deleted[collection]):
+        if len(store) > SYNC_MAX_TRACKED:
+            for _ in range(len(store) // 2):
+                _, version = store.popitem(last=False)
+                _floor[collection] = max(_floor[collection], version)
+
+
+def _apply(pending: Dict) -> None:
+    global _clock
+    for collection, entry in pending.items():
+        changed, deleted = entry["changed"], entry["deleted"]
+        if not (changed or deleted or entry["reset"]):
+            continue
+        _clock += 1
+        if entry["reset"]:
+            _floor[collection] = _clock
+            _changed[collection].clear()
+            _deleted[collection].clear()
+        for item_id in changed:
+            _deleted[collection].pop(item_id, None)
+            _record(_changed[collection], item_id, _clock)
+        for item_id in deleted:
+            _changed[collection].pop(item_id, None)
+            _record(_deleted[collection], item_id, _clock)
+        _collection_version[collection] = _clock
+        _prune(collection)
+
+
+def changes_since(collection: str, version: int) -> Optional[Tuple[List[str], List[str]]]:
+    """
+    Ids changed and deleted after `version`, or None when the client must
+    resync in full (version predates what is tracked).
+    """
+    if version < _floor[collection]:
+        return None
+    return _newer(_changed[collection], version), _newer(_deleted[collection], version)
+
+
+def _newer(store: "OrderedDict[str, int]", version: int) -> List[str]:
+    # Stores are in version order, so walk back from the newest entry
+    ids = []
+    for item_id, item_version in reversed(store.items()):
+        if item_version <= version:
+            break
+        ids.append(item_id)
+    return ids
+
+
+# ==================== MARKING ====================
+
+def _entry(db, collection: str) -> Dict:
+    """Pending changes of one collection in a session (AsyncSession or Session)."""
+    session = getattr(db, "sync_session", db)
+    pending = session.info.setdefault(PENDING_KEY, {})
+    return pending.setdefault(collection, {"changed": set(), "deleted": set(), "reset": False})
+
+
+def mark_changed(db, collection: str, ids: Iterable[str]) -> None:
+    """Record items changed by a Core statement; applied when db commits."""
+    _entry(db, collection)["changed"].update(i for i in ids if i is not None)
+
+
+def mark_deleted(db, collection: str, ids: Iterable[str]) -> None:
+    _entry(db, collection)["deleted"].update(i for i in ids if i is not None)
+
+
+def mark_reset(db, collection: str) -> None:
+    """Record a change too broad to list (e.g. clearing a table): clients resync."""
+    _entry(db, collection)["reset"] = True
+
+
+@event.listens_for(Session, "after_flush")
+def _collect(session, flush_context):
+    for obj in list(session.new) + list(session.dirty):
+        collection = getattr(obj, "__tablename__", None)
+        if collection in COLLECTIONS and (obj in session.new or session.is_modified(obj)):
+            _entry(session, collection)["changed"].add(obj.id)
+    for obj in session.deleted:
+        collection = getattr(obj, "__tablename__", None)
+        if collection in COLLECTIONS:
+            _entry(session, collection)["deleted"].add(obj.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _committed(session):
+    pending = session.info.pop(PENDING_KEY, None)
+    if pending:
+        _apply(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _rolled_back(session):
+    session.info.pop(PENDING_KEY, None)
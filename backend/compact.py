@@ -0,0 +1,89 @@
+"""
+Compact Encodings for SafeWander
+Smaller alternatives to array-of-objects JSON for bulk location data,
+negotiated from the Accept header (or `encoding` on WebSocket URLs).
+
+- columnar JSON (application/vnd.safewander.columnar+json): one array per
+  field instead of repeating key names per row, timestamps as epoch
+  milliseconds;
+- MessagePack (application/msgpack): the columnar document in binary, when
+  the optional `msgpack` package is installed.
+"""
+
+import json
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+from fastapi import Response
+
+try:
+    import msgpack
+except ImportError:  # optional: columnar JSON still available
+    msgpack = None
+
+COLUMNAR_MEDIA_TYPE = "application/vnd.safewander.columnar+json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+MEDIA_TYPES = {
+    COLUMNAR_MEDIA_TYPE: "columnar",
+    MSGPACK_MEDIA_TYPE: "msgpack",
+    "application/x-msgpack": "msgpack",
+    "application/json": "json",
+}
+
+
+def negotiate(accept: Optional[str]) -> str:
+    """"msgpack", "columnar" or "json" (default) from an Accept header."""
+    if not accept:
+        return "json"
+    choices = []
+    for position, part in enumerate(accept.split(",")):
+        media_type, _, params = part.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        fmt = MEDIA_TYPES.get(media_type.strip().lower())
+        if fmt == "msgpack" and msgpack is None:
+            continue
+        if fmt and q > 0:
+            choices.append((-q, position, fmt))
+    return min(choices)[2] if choices else "json"
+
+
+def _epoch_ms(value) -> Optional[int]:
+    if value is None:
+        return None
+    return int(value.replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def columnar(rows: Iterable, fields: List[str], time_fields=("timestamp",), **constants) -> Dict:
+    """
+    Column arrays for ORM rows (or dicts). Values shared by every row (such
+    as patient_id) are passed as constants and sent once.
+    """
+    rows = list(rows)
+    get = (lambda row, name: row.get(name)) if rows and isinstance(rows[0], dict) else getattr
+    document = {**constants, "count": len(rows), "time_unit": "ms"}
+    for name in fields:
+        values = [get(row, name) for row in rows]
+        if name in time_fields:
+            values = [_epoch_ms(v) if isinstance(v, datetime) else v for v in values]
+        document[name] = values
+    return document
+
+
+def encode(document, fmt: str) -> bytes:
+    if fmt == "msgpack":
+        return msgpack.packb(document, use_bin_type=True)
+    return json.dumps(document, separators=(",", ":")).encode()
+
+
+def compact_response(document: Dict, fmt: str, headers: Optional[Dict] = None) -> Response:
+    media_type = MSGPACK_MEDIA_TYPE if fmt == "msgpack" else COLUMNAR_MEDIA_TYPE
+    return Response(encode(document, fmt), media_type=media_type,
+                    headers={**(headers or {}), "Vary": "Accept"})
@@ -0,0 +1,141 @@
+"""
+Response Compression for SafeWander
+ASGI middleware that compresses HTTP responses with brotli or gzip,
+negotiated from Accept-Encoding.
+
+Responses smaller than COMPRESSION_MIN_SIZE, already encoded (e.g. the
+export endpoint with gzip=true) or of already-compressed media types pass
+through untouched. Streaming responses are compressed chunk by chunk.
+Brotli is used when the optional `brotli` package is installed and the
+client accepts it; otherwise gzip.
+"""
+
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from config import COMPRESSION_MIN_SIZE, COMPRESSION_GZIP_LEVEL, COMPRESSION_BROTLI_QUALITY
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+# Media types that are compressed already
+_SKIP_TYPES = ("image/", "audio/", "video/", "application/gzip", "application/zip")
+
+
+class _GzipCompressor:
+    def __init__(self):
+        self._z = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._z.compress(data)
+
+    def finish(self) -> bytes:
+        return self._z.flush()
+
+
+class _BrotliCompressor:
+    def __init__(self):
+        self._c = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._c.process(data)
+
+    def finish(self) -> bytes:
+        return self._c.finish()
+
+
+COMPRESSORS = {"gzip": _GzipCompressor}
+if brotli is not None:
+    COMPRESSORS["br"] = _BrotliCompressor
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Preferred supported encoding (br over gzip on equal q) or None."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+
+    best, best_q = None, 0.0
+    for name in ("br", "gzip"):
+        q = accepted.get(name, accepted.get("*", 0.0))
+        if name in COMPRESSORS and q > best_q:
+            best, best_q = name, q
+    return best
+
+
+class _CompressingSend:
+    """Wraps an ASGI send callable; decides on the first body chunk."""
+
+    def __init__(self, send, encoding: str, minimum_size: int):
+        self.send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start = None
+        self.compressor = None
+        self.passthrough = False
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start is not None:
+            start, self.start = self.start, None
+            headers = MutableHeaders(raw=start["headers"])
+            content_type = headers.get("content-type", "")
+            if ("content-encoding" in headers or content_type.startswith(_SKIP_TYPES)
+                    or (not more_body and len(body) < self.minimum_size)):
+                self.passthrough = True
+                await self.send(start)
+                await self.send(message)
+                return
+
+            self.compressor = COMPRESSORS[self.encoding]()
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if not more_body:
+                data = self.compressor.compress(body) + self.compressor.finish()
+                headers["Content-Length"] = str(len(data))
+                await self.send(start)
+                await self.send({"type": "http.response.body", "body": data})
+                return
+            if "content-length" in headers:
+                del headers["Content-Length"]
+            await self.send(start)
+
+        data = self.compressor.compress(body)
+        if not more_body:
+            data += self.compressor.finish()
+        if data or not more_body:
+            await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+            if encoding is not None:
+                send = _CompressingSend(send, encoding, self.minimum_size)
+        await self.app(scope, receive, send)
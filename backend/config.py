@@ -66,3 +66,141 @@ NO_RESPONSE_THRESHOLD = 600     # 10 minutes
 # Anomaly detection
 SPEED_DEVIATION_THRESHOLD = 0.5  # m/s
 DURATION_STD_MULTIPLIER = 2      # standard deviations
+
+# Offline baseline rebuild
+BASELINE_REBUILD_CHUNK_SIZE = 5000   # location rows fetched per query
+BASELINE_REBUILD_WORKERS = 4         # process pool size across patients
+TRIP_MAX_GAP = 1800                  # seconds without fixes that abandons an open trip
+TRIP_MIN_DURATION = 60               # seconds, shorter excursions are GPS noise
+
+# Usual walk-time histogram (7 weekdays x 24 hours)
+WALK_HISTOGRAM_DECAY = 0.97          # per-trip decay, ~30 trip memory
+WALK_HISTOGRAM_MIN_TRIPS = 5         # decayed trips needed before trusting the histogram
+USUAL_WALK_MIN_PROBABILITY = 0.03    # slot share counted as usual (uniform is ~0.006)
+
+# Streaming trajectory features (confusion detection)
+TRAJECTORY_WINDOW = 600              # seconds of history in the sliding window
+DIRECTION_CHANGE_THRESHOLD = 45.0    # degrees
+MIN_HEADING_STEP = 3.0               # meters, shorter steps are GPS jitter
+RETURN_DISTANCE = 20.0               # meters to count as back at the trip origin
+DWELL_RADIUS = 15.0                  # meters
+DWELL_MIN_TIME = 120                 # seconds within DWELL_RADIUS to count as dwelling
+WANDERING_SCORE_THRESHOLD = 50       # wandering score treated as a behavioral anomaly
+
+# Grid-occupancy circling detection
+GRID_CELL_SIZE = 10.0                # meters per grid cell
+GRID_MIN_STEP = 15.0                 # meters moved before a fix counts (GPS jitter gate)
+GRID_MIN_LOOP_CELLS = 6              # cell entries between visits for a revisit to count as a new pass
+GRID_CIRCLING_PASSES = 3             # passes over one spot within TRAJECTORY_WINDOW that indicate circling
+
+# Vitals monitoring
+# Absolute limits per metric; outside low/high -> HIGH alert, outside critical -> CRITICAL
+VITAL_LIMITS = {
+    "heart_rate": {"low": 45, "high": 120, "critical_low": 35, "critical_high": 150},
+    "oxygen_level": {"low": 92, "high": None, "critical_low": 85, "critical_high": None},
+    "temperature": {"low": 35.5, "high": 38.0, "critical_low": 35.0, "critical_high": 39.5},
+    "blood_pressure_systolic": {"low": 90, "high": 160, "critical_low": 80, "critical_high": 180},
+    "blood_pressure_diastolic": {"low": 50, "high": 100, "critical_low": 40, "critical_high": 120},
+}
+VITALS_WINDOW = 120                  # readings kept per metric for rolling statistics
+VITALS_MIN_SAMPLES = 30              # readings needed before z-score detection
+VITALS_ZSCORE_THRESHOLD = 3.0        # |z| above this is a MEDIUM alert
+VITALS_ALERT_COOLDOWN = 300          # seconds between alerts for the same patient/metric
+VITALS_STORAGE_INTERVAL = 60         # seconds per downsampled row in the vitals table
+VITALS_FLUSH_INTERVAL = 30           # seconds between writes of buckets no reading has closed
+
+# Location history retention
+RETENTION_ENABLED = True
+RETENTION_INTERVAL = 3600            # seconds between compaction passes
+LOCATION_RETENTION_DAYS = 7          # full-resolution fixes kept this long
+HISTORY_BUCKET_SECONDS = 60          # older fixes are averaged into one point per bucket
+RETENTION_BATCH_SIZE = 2000          # rows compacted per transaction (keeps write locks short)
+
+# Cold data archive (columnar NumPy files per patient per day)
+ARCHIVE_DIR = "archive"              # relative to the backend directory
+ARCHIVE_AFTER_DAYS = 90              # rows older than this leave SQLite
+ARCHIVE_BATCH_SIZE = 5000            # rows moved per transaction
+
+# Simplified trajectories for map rendering
+TRAJECTORY_DEFAULT_HOURS = 24        # time range when the request gives no `since`
+TRAJECTORY_DEFAULT_TOLERANCE = 5.0   # meters of deviation allowed by Douglas-Peucker
+TRAJECTORY_MAX_POINTS = 5000         # upper bound on points returned per request
+TRAJECTORY_CACHE_SIZE = 128          # cached results for closed time ranges
+TRAJECTORY_CLOSED_GRACE = 60         # seconds after `until` before a range counts as closed
+
+# Streaming exports
+EXPORT_CHUNK_SIZE = 2000             # rows read per keyset query / encoded per chunk
+
+# Daily rollups and report jobs
+ROLLUP_MAX_GAP = 300                 # seconds between fixes credited to time-in-state / time outside
+REPORT_JOB_HISTORY = 200             # finished report jobs kept for status polling
+
+# Alert deduplication (repeated FSM alerts per patient/type/level)
+ALERT_DEDUP_WINDOW = 600             # seconds of quiet before a repeat opens a new alert
+ALERT_DEDUP_MAX_SPAN = 3600          # seconds after which a still-repeating alert is raised again
+ALERT_FLUSH_INTERVAL = 30            # seconds between occurrence-count flushes
+
+# Notification dispatch (outbox + per-channel workers)
+NOTIFY_MIN_LEVEL = "high"            # alerts at or above this level notify emergency contacts
+NOTIFICATION_TRANSPORT = "file"      # file (local NDJSON stub) or http (webhook)
+NOTIFICATION_FILE = "notifications.ndjson"  # relative to the backend directory
+NOTIFICATION_WEBHOOK_URL = None      # required for the http transport
+NOTIFICATION_BATCH_SIZE = 50         # deliveries handed to a transport at once
+NOTIFICATION_POLL_INTERVAL = 2       # seconds between outbox polls per channel
+NOTIFICATION_MAX_ATTEMPTS = 6        # deliveries are marked failed after this many tries
+NOTIFICATION_BACKOFF_BASE = 5        # seconds before the first retry, doubled per attempt
+NOTIFICATION_BACKOFF_MAX = 600       # retry delay cap (seconds)
+
+# Probabilistic search area (emergency heatmap)
+SEARCH_GRID_CELL = 10.0              # finest grid cell (meters)
+SEARCH_GRID_MAX_CELLS = 201          # cells per side; larger areas use coarser cells
+SEARCH_MIN_RADIUS = 200              # meters covered by the grid at minimum
+SEARCH_MAX_RADIUS = 5000             # meters covered by the grid at most
+SEARCH_DISPLACEMENT_RATIO = 0.5      # net displacement / distance walked (meandering)
+SEARCH_STAY_WEIGHT = 0.15            # probability mass for "stopped near the last fix"
+SEARCH_STAY_RADIUS = 75              # meters, spread of the stopped-nearby component
+SEARCH_HEADING_KAPPA = 2.0           # von Mises concentration around the last heading
+SEARCH_HEADING_DECAY = 1800          # seconds for the heading bias to fade by 1/e
+SEARCH_HISTORY_DAYS = 30             # past fixes used as familiar-route density
+SEARCH_HISTORY_WEIGHT = 2.0          # max boost on familiar routes (x1 + weight)
+SEARCH_HISTORY_BLUR = 30             # meters, smoothing of the history density
+SEARCH_DANGER_ATTRACTION = 2.0       # danger zones (water, roads) attract wandering patients
+SEARCH_DANGER_BUFFER = 50            # meters around danger zones that get the boost
+SEARCH_RESTRICTED_FACTOR = 0.3       # restricted areas are hard to enter
+SEARCH_SAFE_FACTOR = 0.5             # the patient would likely be noticed in a safe zone
+SEARCH_HEATMAP_TTL = 5               # seconds a computed heatmap is served from cache
+SEARCH_HEATMAP_COVERAGE = 0.95       # probability mass returned as sparse cells
+SEARCH_HEATMAP_MAX_CELLS = 5000      # cap on cells returned
+
+# Reachability isochrone (walkable search region)
+ISOCHRONE_UNKNOWN_COST = 1.4         # cost per meter off known routes (buildings, detours)
+ISOCHRONE_KNOWN_THRESHOLD = 0.05     # history density marking a cell as known walkable
+ISOCHRONE_BLOCKED_ZONES = ("danger", "restricted")  # zone types treated as impassable
+ISOCHRONE_SOURCE_RADIUS = 25         # meters around the last fix used as start cells
+ISOCHRONE_ESCAPE_COST = 2.0          # cost per meter inside a blocked zone containing the last fix
+ISOCHRONE_TTL = 5                    # seconds a computed isochrone is served from cache
+
+# Change versions (ETags and delta sync)
+SYNC_MAX_TRACKED = 50000             # changed ids remembered per collection before pruning
+
+# Response compression
+COMPRESSION_MIN_SIZE = 1024          # bytes; smaller responses are sent as-is
+COMPRESSION_GZIP_LEVEL = 6           # zlib level (1 fastest - 9 smallest)
+COMPRESSION_BROTLI_QUALITY = 4       # brotli quality (0-11), used when brotli is installed
+
+# Device WebSocket ingest channel
+DEVICE_WS_BATCH_SIZE = 20            # fixes committed together (one ack per batch)
+DEVICE_WS_BATCH_INTERVAL = 1.0       # seconds a partial batch waits before it is flushed
+DEVICE_WS_MAX_FIXES_PER_FRAME = 500  # larger frames are rejected
+
+# Idempotent ingest (duplicate suppression)
+INGEST_DEDUP_WINDOW = 4096           # recent sequence numbers remembered per device
+
+# Event-time evaluation (late / out-of-order fixes)
+LATE_REPLAY_WINDOW = 600             # seconds behind the newest fix within which late fixes are replayed
+LATE_REPLAY_MAX_FIXES = 1200         # evaluated fixes kept per patient for replays
+LATENESS_BUCKETS = (1, 5, 30, 60, 300, 900, 3600)  # histogram bounds (seconds)
+
+# Backtesting (offline replays of the risk pipeline)
+BACKTEST_WORKERS = 4                 # process pool size across sweep configurations
+BACKTEST_FIX_INTERVAL = 10           # seconds between fixes in synthetic scenarios
@@ -1,6 +1,6 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
-from sqlalchemy import Column, String, Integer, Float, DateTime, Boolean, Text, JSON
+from sqlalchemy import Column, String, Integer, BigInteger, Float, Date, DateTime, Boolean, Text, JSON, LargeBinary, Index, inspect, text
 from datetime import datetime
 import enum
 
@@ -76,6 +76,45 @@ class Location(Base):
     timestamp = Column(DateTime, default=datetime.utcnow)
     speed = Column(Float)
     heading = Column(Float)
+    device_id = Column(Integer)  # Reporting tracker (0 = none) when seq is set
+    seq = Column(BigInteger)  # Device sequence number or client epoch ms (dedup key)
+    
+    __table_args__ = (
+        Index("ix_locations_patient_timestamp", "patient_id", "timestamp", "id"),
+        Index("ux_locations_source_seq", "patient_id", "device_id", "seq", unique=True),
+    )
+
+class LocationHistory(Base):
+    """Compacted location history - one averaged point per patient per minute."""
+    __tablename__ = "location_history"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    patient_id = Column(String, nullable=False)
+    timestamp = Column(DateTime, nullable=False)  # Start of the minute bucket
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
+    accuracy = Column(Float)
+    speed = Column(Float)
+    sample_count = Column(Integer, default=1)  # Raw fixes merged into this point
+    
+    __table_args__ = (
+        Index("ix_location_history_patient_timestamp", "patient_id", "timestamp", "id"),
+    )
+
+class Device(Base):
+    """Registered tracker; binary uploads identify themselves by this numeric id."""
+    __tablename__ = "devices"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    patient_id = Column(String, nullable=False)
+    name = Column(String)
+    token_hash = Column(String)  # SHA-256 of the device channel token
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_seen_at = Column(DateTime)
+    
+    __table_args__ = (
+        Index("ix_devices_patient", "patient_id"),
+    )
 
 class Zone(Base):
     __tablename__ = "zones"
@@ -108,6 +147,14 @@ class Alert(Base):
     resolved = Column(Boolean, default=False)
     resolved_at = Column(DateTime)
     extra_data = Column(JSON)
+    occurrences = Column(Integer, default=1)  # Repeats coalesced into this alert
+    last_seen_at = Column(DateTime)  # Time of the latest coalesced repeat
+    
+    __table_args__ = (
+        Index("ix_alerts_timestamp", "timestamp", "id"),
+        Index("ix_alerts_patient_timestamp", "patient_id", "timestamp", "id"),
+        Index("ix_alerts_patient_resolved", "patient_id", "resolved"),
+    )
 
 class Emergency(Base):
     __tablename__ = "emergencies"
@@ -119,10 +166,26 @@ class Emergency(Base):
     missing_since = Column(DateTime, default=datetime.utcnow)
     search_radius = Column(Float, default=500)
     responders_notified = Column(JSON)
-    timeline = Column(JSON)
+    timeline = Column(JSON)  # Legacy event list; events now live in emergency_events
     resolved_at = Column(DateTime)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+class EmergencyEvent(Base):
+    """Append-only emergency timeline entry."""
+    __tablename__ = "emergency_events"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    emergency_id = Column(String, nullable=False)
+    time = Column(DateTime, default=datetime.utcnow)
+    type = Column(String, default="update")  # system, update, note, sighting
+    event = Column(Text, nullable=False)
+    author = Column(String)
+    location = Column(JSON)  # {lat, lng} for sightings
+    
+    __table_args__ = (
+        Index("ix_emergency_events_emergency_time", "emergency_id", "time", "id"),
+    )
+
 class Vital(Base):
     __tablename__ = "vitals"
     
@@ -134,6 +197,10 @@ class Vital(Base):
     oxygen_level = Column(Integer)
     temperature = Column(Float)
     timestamp = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_vitals_patient_timestamp", "patient_id", "timestamp", "id"),
+    )
 
 class Activity(Base):
     __tablename__ = "activities"
@@ -144,6 +211,10 @@ class Activity(Base):
     description = Column(String, nullable=False)
     extra_data = Column(JSON)
     timestamp = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_activities_patient_timestamp", "patient_id", "timestamp", "id"),
+    )
 
 class Settings(Base):
     __tablename__ = "settings"
@@ -178,8 +249,51 @@ class Baseline(Base):
     std_duration = Column(Float, default=300)
     sample_count = Column(Integer, default=0)
     common_walk_hours = Column(JSON)  # List of common walking hours
+    walk_histogram = Column(LargeBinary)  # Packed 7x24 float64 decayed trip-start histogram
     updated_at = Column(DateTime, default=datetime.utcnow)
 
+class Notification(Base):
+    """Notification outbox - one row per delivery, written with the alert it announces."""
+    __tablename__ = "notification_outbox"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    patient_id = Column(String, nullable=False)
+    alert_id = Column(String)
+    emergency_id = Column(String)
+    channel = Column(String, nullable=False)  # sms, email
+    recipient = Column(String, nullable=False)  # Phone number or email address
+    payload = Column(JSON)
+    status = Column(String, default="pending")  # pending, sending, sent, failed
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime)
+    
+    __table_args__ = (
+        Index("ix_notification_outbox_due", "status", "channel", "next_attempt_at"),
+    )
+
+class DailyRollup(Base):
+    """Per-patient, per-day (UTC) report counters, updated incrementally."""
+    __tablename__ = "daily_rollups"
+    
+    patient_id = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    incidents = Column(Integer, default=0)  # Emergencies activated
+    alerts_low = Column(Integer, default=0)
+    alerts_medium = Column(Integer, default=0)
+    alerts_high = Column(Integer, default=0)
+    alerts_critical = Column(Integer, default=0)
+    acknowledged_count = Column(Integer, default=0)
+    ack_latency_seconds = Column(Float, default=0.0)  # Sum over acknowledged alerts
+    outside_safe_seconds = Column(Float, default=0.0)
+    safe_seconds = Column(Float, default=0.0)  # FSM time-in-state
+    advisory_seconds = Column(Float, default=0.0)
+    warning_seconds = Column(Float, default=0.0)
+    urgent_seconds = Column(Float, default=0.0)
+    emergency_seconds = Column(Float, default=0.0)
+
 async def get_db():
     async with async_session_maker() as session:
         try:
@@ -187,6 +301,28 @@ async def get_db():
         finally:
             await session.close()
 
+def _migrate_existing_tables(sync_conn):
+    """
+    create_all never alters existing tables, so add columns and indexes
+    introduced after a database file was first created (nullable, no backfill).
+    """
+    inspector = inspect(sync_conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=sync_conn.dialect)
+                sync_conn.execute(text(
+                    f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}'
+                ))
+        existing_indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                index.create(sync_conn)
+
 async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_migrate_existing_tables)
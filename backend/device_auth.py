@@ -0,0 +1,51 @@
+"""
+Device Authentication for SafeWander
+Per-tracker secret tokens for the device ingest channel. Only a SHA-256 of
+each token is stored; the token itself is returned once, on registration
+or rotation.
+"""
+
+import hashlib
+import hmac
+import secrets
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def issue_token(device) -> str:
+    """Generate a new token for `device` (replacing any previous one)."""
+    token = secrets.token_urlsafe(24)
+    device.token_hash = hash_token(token)
+    return token
+
+
+async def authenticate_device(db: AsyncSession, device_id, token: Optional[str]):
+    """
+    Device row for a valid (device_id, token) pair, else None.
+
+    Args:
+        device_id: Numeric device id (string form accepted from headers/query)
+        token: Token presented by the device
+    """
+    from database import Device
+
+    try:
+        device_id = int(device_id)
+    except (TypeError, ValueError):
+        return None
+    if not token:
+        return None
+
+    result = await db.execute(select(Device).where(Device.id == device_id))
+    device = result.scalar_one_or_none()
+    if device is None or not device.token_hash:
+        return None
+    if not hmac.compare_digest(device.token_hash, hash_token(token)):
+        return None
+    return device
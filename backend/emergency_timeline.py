@@ -0,0 +1,76 @@
+"""
+Emergency Timeline for SafeWander
+Append-only event log for an emergency (system events, responder updates,
+sightings).
+
+Each event is its own row in emergency_events, so appending is one INSERT
+regardless of how long the search has run, and clients poll only the events
+after their cursor via the (emergency_id, time, id) index. Emergencies
+created before the table existed keep their JSON `timeline` list until
+migrate_legacy_timelines moves it over at startup.
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import select, and_, or_
+
+
+async def append_event(db, emergency_id: str, event: str, type: str = "update",
+                       author: Optional[str] = None, location: Optional[Dict] = None,
+                       time: Optional[datetime] = None):
+    """Add an event to the caller's transaction; the caller commits."""
+    from database import EmergencyEvent
+
+    row = EmergencyEvent(
+        emergency_id=emergency_id,
+        time=time or datetime.utcnow(),
+        type=type,
+        event=event,
+        author=author,
+        location=location,
+    )
+    db.add(row)
+    return row
+
+
+async def get_events(db, emergency_id: str, after: Optional[tuple] = None,
+                     limit: int = 500) -> List:
+    """
+    Events in time order, optionally only those after a (time, id) position.
+    """
+    from database import EmergencyEvent
+
+    query = (
+        select(EmergencyEvent)
+        .where(EmergencyEvent.emergency_id == emergency_id)
+        .order_by(EmergencyEvent.time, EmergencyEvent.id)
+        .limit(limit)
+    )
+    if after is not None:
+        after_time, after_id = after
+        query = query.where(or_(
+            EmergencyEvent.time > after_time,
+            and_(EmergencyEvent.time == after_time, EmergencyEvent.id > after_id),
+        ))
+    result = await db.execute(query)
+    return result.scalars().all()
+
+
+async def migrate_legacy_timelines(db) -> int:
+    """Move JSON timeline lists into emergency_events. Returns emergencies migrated."""
+    from database import Emergency
+
+    result = await db.execute(select(Emergency).where(Emergency.timeline.is_not(None)))
+    migrated = 0
+    for emergency in result.scalars().all():
+        for entry in emergency.timeline or []:
+            try:
+                time = datetime.fromisoformat(entry["time"])
+            except (KeyError, TypeError, ValueError):
+                time = emergency.created_at or datetime.utcnow()
+            await append_event(db, emergency.id, entry.get("event", ""),
+                               type=entry.get("type", "update"), time=time)
+        emergency.timeline = None
+        migrated += 1
+    return migrated
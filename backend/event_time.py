@@ -0,0 +1,121 @@
+"""
+Event-Time Tracking for SafeWander
+Per-patient watermarks so fixes are evaluated in the order they were
+recorded on the device, not the order they reached the server.
+
+The watermark is the newest event time evaluated for a patient. A fix at or
+after it is evaluated normally. A late fix within LATE_REPLAY_WINDOW of the
+watermark is inserted into the recent evaluation history and the window from
+that point on is replayed: the FSM state saved before the first later fix is
+restored and every fix from there is re-evaluated in event-time order. Older
+fixes are stored as history only.
+
+Entries also keep the transition each fix alerted on, so a replay raises
+only transitions that were not alerted before. Alerts a replay makes
+obsolete are not retracted. The trajectory tracker, daily rollups and walk
+learning are not replayed either.
+
+Lateness (watermark - event time) of late fixes and delivery delay (receipt
+- event time) of all fixes are counted in histograms.
+"""
+
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from config import LATE_REPLAY_WINDOW, LATE_REPLAY_MAX_FIXES, LATENESS_BUCKETS
+
+event_time_stats = {
+    "in_order": 0,
+    "replay": 0,        # late fixes that triggered a replay
+    "too_late": 0,      # late fixes stored as history only
+    "reevaluated": 0,   # fixes re-evaluated by replays
+    "max_lateness": 0.0,
+}
+_lateness = [0] * (len(LATENESS_BUCKETS) + 1)
+_delay = [0] * (len(LATENESS_BUCKETS) + 1)
+
+
+class PatientClock:
+    """
+    Watermark and recently evaluated fixes of one patient.
+    Entries are dicts with at least `time` and `before` (the FSM snapshot
+    taken just before the fix was evaluated), oldest first.
+    """
+
+    def __init__(self, watermark: Optional[datetime] = None):
+        self.watermark = watermark
+        self.entries: List[Dict] = []
+
+    def classify(self, event_time: datetime) -> str:
+        """"in_order", "replay" or "too_late"."""
+        if self.watermark is None or event_time >= self.watermark:
+            return "in_order"
+        if (self.entries and event_time >= self.entries[0]["time"]
+                and (self.watermark - event_time).total_seconds() <= LATE_REPLAY_WINDOW):
+            return "replay"
+        return "too_late"
+
+    def record(self, entry: Dict) -> None:
+        """Append an in-order fix and advance the watermark."""
+        self.entries.append(entry)
+        self.watermark = entry["time"]
+        self._trim()
+
+    def insert_late(self, entry: Dict) -> List[Dict]:
+        """Insert a late fix; returns it followed by the entries to replay."""
+        position = bisect_right([e["time"] for e in self.entries], entry["time"])
+        self.entries.insert(position, entry)
+        return self.entries[position:]
+
+    def _trim(self) -> None:
+        cutoff = self.watermark - timedelta(seconds=LATE_REPLAY_WINDOW)
+        drop = 0
+        while drop < len(self.entries) and self.entries[drop]["time"] < cutoff:
+            drop += 1
+        drop = max(drop, len(self.entries) - LATE_REPLAY_MAX_FIXES)
+        if drop > 0:
+            del self.entries[:drop]
+
+
+_clocks: Dict[str, PatientClock] = {}
+
+
+def get_clock(patient_id: str) -> PatientClock:
+    """
+    Clock for a patient. A new clock (e.g. after a restart) has no
+    watermark, so its first fix is evaluated in order whatever its time.
+    """
+    clock = _clocks.get(patient_id)
+    if clock is None:
+        clock = _clocks[patient_id] = PatientClock()
+    return clock
+
+
+def _bucket(seconds: float) -> int:
+    """Index of the first bucket bound >= seconds (last bucket: above all)."""
+    return bisect_left(LATENESS_BUCKETS, seconds)
+
+
+def observe(kind: str, watermark: Optional[datetime], event_time: datetime, received: datetime) -> None:
+    """Count a fix classified by PatientClock.classify."""
+    event_time_stats[kind] += 1
+    _delay[_bucket(max((received - event_time).total_seconds(), 0.0))] += 1
+    if kind != "in_order":
+        lateness = (watermark - event_time).total_seconds()
+        _lateness[_bucket(lateness)] += 1
+        event_time_stats["max_lateness"] = max(event_time_stats["max_lateness"], lateness)
+
+
+def _histogram(counts: List[int]) -> Dict[str, int]:
+    labels = [f"<={b}s" for b in LATENESS_BUCKETS] + [f">{LATENESS_BUCKETS[-1]}s"]
+    return dict(zip(labels, counts))
+
+
+def event_time_metrics() -> Dict:
+    return {
+        **event_time_stats,
+        "lateness": _histogram(_lateness),
+        "delivery_delay": _histogram(_delay),
+        "patients_tracked": len(_clocks),
+    }
@@ -0,0 +1,213 @@
+"""
+Streaming Data Export for SafeWander
+CSV / NDJSON exports of a patient's locations, vitals and alerts.
+
+Rows are read in (timestamp, id) keyset chunks, each in its own short
+session, and encoded chunk by chunk, so memory stays flat and ingestion
+is never blocked behind a long-running read. Archived partitions are
+included, so an export covers everything recorded for the range.
+"""
+
+import csv
+import io
+import json
+import math
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+
+from sqlalchemy import select, and_, or_
+
+from archive import iter_partitions, from_epoch_us, to_epoch_us
+from config import EXPORT_CHUNK_SIZE
+
+EXPORT_FIELDS = {
+    "locations": ["timestamp", "latitude", "longitude", "accuracy", "speed", "heading",
+                  "sample_count", "source"],
+    "vitals": ["timestamp", "heart_rate", "blood_pressure_systolic", "blood_pressure_diastolic",
+               "oxygen_level", "temperature", "source"],
+    "alerts": ["id", "timestamp", "type", "level", "message", "description", "location",
+               "acknowledged", "acknowledged_at", "acknowledged_by", "resolved", "resolved_at",
+               "extra_data", "occurrences", "last_seen_at", "source"],
+}
+
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+# Archived text columns that hold JSON, and timestamp columns stored as epoch us
+_ARCHIVE_JSON = {"location", "extra_data"}
+_ARCHIVE_TIMES = {"timestamp", "acknowledged_at", "resolved_at", "last_seen_at"}
+
+
+def _archive_value(name: str, value):
+    if name in _ARCHIVE_TIMES:
+        return from_epoch_us(int(value))
+    if name in _ARCHIVE_JSON:
+        return json.loads(value) if value else None
+    if isinstance(value, str):
+        return value or None
+    value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def _archive_rows(kind: str, patient_id: str, since: Optional[datetime],
+                  until: Optional[datetime]) -> Iterator[Dict]:
+    """Rows from archived partitions in [since, until), oldest first."""
+    fields = EXPORT_FIELDS[kind]
+    for _, columns in iter_partitions(kind, patient_id,
+                                      since.date() if since else None,
+                                      until.date() if until else None):
+        timestamps = columns["timestamp"]
+        start = int(timestamps.searchsorted(to_epoch_us(since))) if since else 0
+        end = int(timestamps.searchsorted(to_epoch_us(until))) if until else len(timestamps)
+        for i in range(start, end):
+            row = {name: _archive_value(name, columns[name][i]) if name in columns else None
+                   for name in fields}
+            row["source"] = "archive"
+            if kind == "alerts":
+                row["resolved"] = True  # only resolved alerts are archived
+            yield row
+
+
+async def _table_rows(model, patient_id: str, fields: List[str], source: str,
+                      since: Optional[datetime], until: Optional[datetime],
+                      chunk_size: int) -> AsyncIterator[List[Dict]]:
+    """Keyset-paginated chunks of rows from one table, each read in a fresh session."""
+    from database import async_session_maker
+
+    last_ts, last_id = None, None
+    while True:
+        query = (
+            select(model)
+            .where(model.patient_id == patient_id)
+            .where(model.timestamp.is_not(None))
+            .order_by(model.timestamp, model.id)
+            .limit(chunk_size)
+        )
+        if since is not None:
+            query = query.where(model.timestamp >= since)
+        if until is not None:
+            query = query.where(model.timestamp < until)
+        if last_ts is not None:
+            query = query.where(or_(
+                model.timestamp > last_ts,
+                and_(model.timestamp == last_ts, model.id > last_id),
+            ))
+
+        async with async_session_maker() as db:
+            rows = (await db.execute(query)).scalars().all()
+        if not rows:
+            return
+
+        yield [
+            {**{name: getattr(row, name, None) for name in fields}, "source": source}
+            for row in rows
+        ]
+
+        last_ts, last_id = rows[-1].timestamp, rows[-1].id
+        if len(rows) < chunk_size:
+            return
+
+
+async def iter_export_rows(kind: str, patient_id: str, since: Optional[datetime] = None,
+                           until: Optional[datetime] = None,
+                           chunk_size: int = EXPORT_CHUNK_SIZE) -> AsyncIterator[List[Dict]]:
+    """
+    Yield chunks of export rows for one patient: archived rows first, then the
+    live tables. For locations each tier only contributes rows after the last
+    timestamp of the previous one, so compacted and raw points never overlap.
+    """
+    from database import Location, LocationHistory, Vital, Alert
+
+    fields = EXPORT_FIELDS[kind]
+    last_ts = None
+
+    chunk = []
+    for row in _archive_rows(kind, patient_id, since, until):
+        chunk.append(row)
+        last_ts = row["timestamp"]
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+    tables = {
+        "locations": [(LocationHistory, "history"), (Location, "raw")],
+        "vitals": [(Vital, "raw")],
+        "alerts": [(Alert, "raw")],
+    }[kind]
+
+    for model, source in tables:
+        after = last_ts if kind == "locations" else None
+        lower = since if after is None else (after if since is None else max(since, after))
+        async for rows in _table_rows(model, patient_id, fields, source, lower, until, chunk_size):
+            if after is not None:
+                rows = [r for r in rows if r["timestamp"] > after]
+            if rows:
+                last_ts = rows[-1]["timestamp"]
+                yield rows
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def encode_chunk(rows: List[Dict], fmt: str, fields: List[str], header: bool = False) -> bytes:
+    """Encode a chunk of rows as CSV (optionally with a header line) or NDJSON."""
+    if fmt == "ndjson":
+        return "".join(json.dumps(row, default=_json_default) + "\n" for row in rows).encode()
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(fields)
+    writer.writerows([_cell(row.get(name)) for name in fields] for row in rows)
+    return buffer.getvalue().encode()
+
+
+async def stream_export(kind: str, patient_id: str, fmt: str, since: Optional[datetime] = None,
+                        until: Optional[datetime] = None, compress: bool = False) -> AsyncIterator[bytes]:
+    """
+    Encoded export body, one chunk at a time.
+
+    Args:
+        kind: "locations", "vitals" or "alerts"
+        fmt: "csv" or "ndjson"
+        compress: Gzip the stream on the fly
+
+    Yields:
+        Byte chunks ready to send
+    """
+    fields = EXPORT_FIELDS[kind]
+    gzip = zlib.compressobj(wbits=31) if compress else None
+
+    header = fmt == "csv"
+    if header:
+        # Header goes out even when the range is empty
+        data = encode_chunk([], fmt, fields, header=True)
+        yield gzip.compress(data) if gzip else data
+
+    async for rows in iter_export_rows(kind, patient_id, since, until):
+        data = encode_chunk(rows, fmt, fields)
+        if gzip:
+            data = gzip.compress(data)
+            if not data:
+                continue
+        yield data
+
+    if gzip:
+        yield gzip.flush()
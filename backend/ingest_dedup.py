@@ -0,0 +1,138 @@
+"""
+Ingest Deduplication for SafeWander
+Suppresses retried uploads and separates out-of-order fixes, keyed by a
+per-source sequence number (the device's `seq`, or the client timestamp in
+epoch milliseconds when no seq is sent).
+
+A source is (patient_id, device_id); fixes without a device use device 0.
+Each source keeps an in-memory high-water mark (highest committed seq) and
+the last INGEST_DEDUP_WINDOW committed seqs:
+- seq above the mark          -> "new": full pipeline (risk, FSM, broadcast);
+- seq among the recent seqs   -> "duplicate": dropped without touching the DB;
+- any other seq at/below mark -> "late": stored through an INSERT that the
+  unique (patient_id, device_id, seq) index turns into a no-op when the fix
+  is already stored (e.g. after a restart), then evaluated in event time
+  (see event_time) if it carries a device timestamp.
+
+Admitted seqs are applied to the marks only after the transaction commits
+(same pattern as change_tracker), so a rolled-back batch can be retried.
+"""
+
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event, func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from config import INGEST_DEDUP_WINDOW
+
+NO_DEVICE = 0
+
+# (patient_id, device_id) -> highest committed seq
+_high_water: Dict[Tuple[str, int], int] = {}
+# (patient_id, device_id) -> (set, deque) of the last INGEST_DEDUP_WINDOW committed seqs
+_recent: Dict[Tuple[str, int], tuple] = {}
+
+PENDING_KEY = "ingest_dedup.pending"
+
+dedup_stats = {"new": 0, "late": 0, "duplicate": 0}
+
+
+def timestamp_seq(timestamp: datetime) -> int:
+    """Sequence number for a fix identified only by its (naive UTC) device time."""
+    return int(timestamp.replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def source_key(patient_id: str, device_id: Optional[int]) -> Tuple[str, int]:
+    return patient_id, device_id if device_id is not None else NO_DEVICE
+
+
+def _pending(db) -> Dict[Tuple[str, int], set]:
+    session = getattr(db, "sync_session", db)
+    return session.info.setdefault(PENDING_KEY, {})
+
+
+async def _load_high_water(db: AsyncSession, key: Tuple[str, int]) -> int:
+    """High-water mark for a source, read from the table on first use."""
+    if key not in _high_water:
+        from database import Location
+
+        result = await db.execute(
+            select(func.max(Location.seq))
+            .where(Location.patient_id == key[0])
+            .where(Location.device_id == key[1])
+        )
+        highest = result.scalar()
+        _high_water[key] = highest if highest is not None else -1
+    return _high_water[key]
+
+
+async def admit(db: AsyncSession, patient_id: str, device_id: Optional[int], seq: int) -> str:
+    """
+    Classify a fix as "new", "late" or "duplicate" and reserve its seq in
+    the session (also catches repeats within one batch).
+    """
+    key = source_key(patient_id, device_id)
+    pending = _pending(db).setdefault(key, set())
+
+    if seq in pending:
+        status = "duplicate"
+    else:
+        top = max(await _load_high_water(db, key), max(pending, default=-1))
+        recent = _recent.get(key)
+        if seq > top:
+            status = "new"
+        elif recent is not None and seq in recent[0]:
+            status = "duplicate"
+        else:
+            status = "late"
+        pending.add(seq)
+
+    dedup_stats[status] += 1
+    return status
+
+
+async def insert_late(db: AsyncSession, values: dict) -> bool:
+    """
+    Store an out-of-order fix as history only.
+
+    Returns:
+        False when the (patient_id, device_id, seq) row already exists
+    """
+    from database import Location
+
+    result = await db.execute(
+        insert(Location).values(**values)
+        .on_conflict_do_nothing(index_elements=["patient_id", "device_id", "seq"])
+    )
+    return result.rowcount > 0
+
+
+def _remember(key: Tuple[str, int], seqs: set) -> None:
+    if key in _high_water:
+        _high_water[key] = max(_high_water[key], max(seqs))
+    seen, order = _recent.setdefault(key, (set(), deque()))
+    for seq in sorted(seqs):
+        if seq in seen:
+            continue
+        seen.add(seq)
+        order.append(seq)
+        if len(order) > INGEST_DEDUP_WINDOW:
+            seen.discard(order.popleft())
+
+
+@event.listens_for(Session, "after_commit")
+def _committed(session):
+    pending = session.info.pop(PENDING_KEY, None)
+    if pending:
+        for key, seqs in pending.items():
+            if seqs:
+                _remember(key, seqs)
+
+
+@event.listens_for(Session, "after_rollback")
+def _rolled_back(session):
+    session.info.pop(PENDING_KEY, None)
@@ -0,0 +1,170 @@
+"""
+Reachability Isochrone for SafeWander
+Where could a missing patient have walked to, given the time elapsed?
+
+Instead of a straight-line circle, travel cost is accumulated over a local
+walkability grid (the same grid as the search heatmap):
+- cells on the patient's past trajectories or inside safe/buffer zones are
+  known walkable (cost 1 per meter);
+- other cells are walkable but slower (ISOCHRONE_UNKNOWN_COST per meter),
+  standing in for buildings, fences and detours we have no map data for;
+- danger and restricted zones are impassable, except one the patient was
+  last seen in or next to (a river bank, a road): leaving it is possible,
+  so its cells cost ISOCHRONE_ESCAPE_COST per meter instead.
+
+Shortest walking distances from the last fix are found with a vectorized
+multi-source relaxation (Bellman-Ford style sweeps over the 8 neighbour
+shifts), with costs beyond the walking budget cut off so only the reachable
+region converges. A 5 km area (~200x200 cells) takes tens of milliseconds.
+"""
+
+import asyncio
+import math
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from config import (
+    TERRAIN_FACTOR,
+    ISOCHRONE_UNKNOWN_COST,
+    ISOCHRONE_KNOWN_THRESHOLD,
+    ISOCHRONE_BLOCKED_ZONES,
+    ISOCHRONE_ESCAPE_COST,
+    ISOCHRONE_SOURCE_RADIUS,
+    ISOCHRONE_TTL,
+)
+from search_area import SearchGrid, history_density, load_search_context
+
+# 8-connected neighbour offsets (row, col)
+NEIGHBOURS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+
+# emergency_id -> (monotonic time computed, result)
+_isochrones: Dict[str, Tuple[float, Dict]] = {}
+
+
+def walk_cost_grid(grid: SearchGrid, context: Dict) -> np.ndarray:
+    """Cost per meter of walking through each cell (inf where impassable)."""
+    cost = np.full((grid.n, grid.n), ISOCHRONE_UNKNOWN_COST / TERRAIN_FACTOR)
+
+    history = history_density(grid, context["history_lat"], context["history_lon"])
+    if history is not None:
+        cost[history >= ISOCHRONE_KNOWN_THRESHOLD] = 1.0
+
+    for zone in context["zones"]:
+        inside = grid.circle(zone["lat"], zone["lng"], zone["radius"])
+        if zone["type"] in ISOCHRONE_BLOCKED_ZONES:
+            x, y = grid.to_meters(zone["lat"], zone["lng"])
+            around_origin = math.hypot(x, y) <= zone["radius"] + ISOCHRONE_SOURCE_RADIUS
+            cost[inside] = ISOCHRONE_ESCAPE_COST / TERRAIN_FACTOR if around_origin else np.inf
+        elif zone["type"] in ("safe", "buffer"):
+            cost[inside] = 1.0
+    return cost
+
+
+def walking_distance(cost: np.ndarray, sources: np.ndarray, cell_size: float,
+                     limit: float) -> np.ndarray:
+    """
+    Cost-weighted walking distance from any source cell to every cell.
+
+    Args:
+        cost: Cost per meter for each cell (inf = impassable)
+        sources: Boolean mask of start cells (distance 0, even if impassable)
+        cell_size: Cell size in meters
+        limit: Distances above this are not needed and come back as inf
+
+    Returns:
+        Array of distances in effective meters
+    """
+    n_rows, n_cols = cost.shape
+    padded_cost = np.full((n_rows + 2, n_cols + 2), np.inf)
+    padded_cost[1:-1, 1:-1] = np.where(sources, 1.0, cost)
+
+    # Edge weight into each cell from each neighbour: step length x mean cost
+    edges = []
+    for dr, dc in NEIGHBOURS:
+        neighbour = padded_cost[1 + dr:n_rows + 1 + dr, 1 + dc:n_cols + 1 + dc]
+        weight = math.hypot(dr, dc) * cell_size * (padded_cost[1:-1, 1:-1] + neighbour) / 2
+        edges.append((dr, dc, weight))
+
+    padded = np.full((n_rows + 2, n_cols + 2), np.inf)
+    dist = padded[1:-1, 1:-1]
+    dist[sources] = 0.0
+    candidate = np.empty_like(dist)
+
+    # Each pass extends shortest paths by at least one cell; the bound covers
+    # paths that wind around obstacles
+    for _ in range(4 * (n_rows + n_cols)):
+        before = dist.copy()
+        for dr, dc, weight in edges:
+            np.add(padded[1 + dr:n_rows + 1 + dr, 1 + dc:n_cols + 1 + dc], weight, out=candidate)
+            np.minimum(dist, candidate, out=dist)
+        dist[dist > limit] = np.inf
+        if np.array_equal(dist, before):
+            break
+    return dist
+
+
+def reachable_runs(reachable: np.ndarray) -> list:
+    """Row runs [row, first_col, last_col] covering a boolean mask."""
+    runs = []
+    for row in np.flatnonzero(reachable.any(axis=1)):
+        line = np.concatenate(([False], reachable[row], [False])).astype(np.int8)
+        edges = np.flatnonzero(np.diff(line))
+        for start, end in zip(edges[::2], edges[1::2]):
+            runs.append([int(row), int(start), int(end - 1)])
+    return runs
+
+
+def compute_isochrone(context: Dict) -> Dict:
+    """Reachable region for a search context (see search_area.load_search_context)."""
+    origin = context["origin"]
+    budget = (context["avg_speed"] * context["mobility_factor"] * TERRAIN_FACTOR
+              * max(context["elapsed"], 60.0))
+    grid = SearchGrid.around(origin["lat"], origin["lng"], budget)
+
+    sources = grid.distance <= max(ISOCHRONE_SOURCE_RADIUS, grid.cell / 2)
+    dist = walking_distance(walk_cost_grid(grid, context), sources, grid.cell, budget)
+    reachable = np.isfinite(dist)
+
+    straight = grid.distance[reachable]
+    return {
+        **grid.describe(),
+        "origin": origin,
+        "elapsed_seconds": int(context["elapsed"]),
+        "walking_budget": round(budget, 1),
+        # Budget reaches past the grid edge (SEARCH_MAX_RADIUS): region is clipped
+        "truncated": budget > grid.center * grid.cell,
+        "reachable_area": round(float(reachable.sum()) * grid.cell ** 2, 1),
+        "search_radius": round(float(straight.max()), 1) if straight.size else 0.0,
+        "runs": reachable_runs(reachable),
+    }
+
+
+async def get_isochrone(db, emergency) -> Optional[Dict]:
+    """
+    Reachable region for an emergency, recomputed at most every ISOCHRONE_TTL seconds.
+    None when there is no known location to start from.
+    """
+    cached = _isochrones.get(emergency.id)
+    if cached and time.monotonic() - cached[0] < ISOCHRONE_TTL:
+        return cached[1]
+
+    context = await load_search_context(db, emergency)
+    if context["origin"] is None:
+        return None
+    # Grid relaxation is CPU-bound; keep it off the event loop (ingest shares it)
+    region = await asyncio.to_thread(compute_isochrone, context)
+    result = {
+        "emergency_id": emergency.id,
+        "patient_id": emergency.patient_id,
+        "computed_at": datetime.utcnow().isoformat(),
+        **region,
+    }
+    _isochrones[emergency.id] = (time.monotonic(), result)
+    return result
+
+
+def invalidate_isochrone(emergency_id: str) -> None:
+    _isochrones.pop(emergency_id, None)
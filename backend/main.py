@@ -1,16 +1,51 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 from database import init_db
-from routers import patients, tracking, alerts, emergency, reports, settings, auth
+from compression import CompressionMiddleware
+from config import RETENTION_ENABLED
+from routers import patients, tracking, alerts, emergency, reports, settings, auth, vitals, export, notifications, sync
+
+async def _sync_alert_counters():
+    from database import async_session_maker
+    from alert_counters import recount_active_alerts
+    async with async_session_maker() as db:
+        fixed = await recount_active_alerts(db)
+        await db.commit()
+    if fixed:
+        print(f"[Alerts] Re-synced active alert counts for {fixed} patients")
+
+async def _migrate_emergency_timelines():
+    from database import async_session_maker
+    from emergency_timeline import migrate_legacy_timelines
+    async with async_session_maker() as db:
+        migrated = await migrate_legacy_timelines(db)
+        await db.commit()
+    if migrated:
+        print(f"[Emergency] Moved timelines of {migrated} emergencies to emergency_events")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup: Initialize database
     await init_db()
+    await _sync_alert_counters()
+    await _migrate_emergency_timelines()
+    background_tasks = []
+    if RETENTION_ENABLED:
+        from retention import start_retention_loop
+        background_tasks.append(start_retention_loop())
+    from alert_aggregator import start_flush_loop
+    background_tasks.append(start_flush_loop())
+    from vitals_monitor import start_flush_loop as start_vitals_flush_loop
+    background_tasks.append(start_vitals_flush_loop())
+    from notifications import start_dispatcher
+    background_tasks.append(start_dispatcher())
     yield
-    # Shutdown: cleanup if needed
-    pass
+    # Shutdown: stop background tasks (the flush loops write pending alert counts and vitals buckets)
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
 
 app = FastAPI(
     title="SafeWander API",
@@ -26,16 +61,24 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
+# Gzip / brotli for larger responses (negotiated from Accept-Encoding)
+app.add_middleware(CompressionMiddleware)
+
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(patients.router, prefix="/api/patients", tags=["Patients"])
 app.include_router(tracking.router, prefix="/api/tracking", tags=["Tracking"])
 app.include_router(alerts.router, prefix="/api/alerts", tags=["Alerts"])
+app.include_router(vitals.router, prefix="/api/vitals", tags=["Vitals"])
 app.include_router(emergency.router, prefix="/api/emergency", tags=["Emergency"])
 app.include_router(reports.router, prefix="/api/reports", tags=["Reports"])
 app.include_router(settings.router, prefix="/api/settings", tags=["Settings"])
+app.include_router(export.router, prefix="/api/export", tags=["Export"])
+app.include_router(notifications.router, prefix="/api/notifications", tags=["Notifications"])
+app.include_router(sync.router, prefix="/api/sync", tags=["Sync"])
 
 @app.get("/")
 async def root():
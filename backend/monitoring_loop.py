@@ -7,7 +7,7 @@ import asyncio
 from datetime import datetime
 from typing import List, Optional
 
-from config import LOOP_INTERVAL, DANGER_ZONE_PROXIMITY
+from config import LOOP_INTERVAL, DANGER_ZONE_PROXIMITY, WANDERING_SCORE_THRESHOLD
 
 
 async def run_monitoring_loop():
@@ -59,8 +59,8 @@ async def process_patient(db, patient):
     from sqlalchemy import select, desc
     from risk_engine import compute_risk_score
     from state_machine import transition_state, state_to_alert_level
-    from baseline import get_baseline
-    from anomaly import detect_anomaly
+    from baseline import get_baseline, get_walk_histogram, record_walk
+    from anomaly import detect_anomaly, get_trajectory_tracker
     from geo_utils import get_zone_status, calculate_speed
     
     patient_id = patient.id
@@ -109,7 +109,15 @@ async def process_patient(db, patient):
     current_speed = latest.speed or 0.8
     current_duration = time_outside_safe if time_outside_safe > 0 else 0
     
-    has_anomaly = detect_anomaly(current_speed, current_duration, baseline)
+    # Trajectory features are fed by the ingest path; only read them here
+    avg_duration = baseline.get("avg_duration") or 0
+    duration_ratio = current_duration / avg_duration if avg_duration else 0.0
+    wandering_score = get_trajectory_tracker(patient_id).wandering_score(duration_ratio)
+    
+    has_anomaly = (
+        detect_anomaly(current_speed, current_duration, baseline)
+        or wandering_score >= WANDERING_SCORE_THRESHOLD
+    )
     
     # 5. Check zone status
     zone_status = get_zone_status(lat, lon, zones_data)
@@ -118,6 +126,7 @@ async def process_patient(db, patient):
     # 6. Compute risk score
     gps_signal = "good"  # TODO: get from device status
     no_response_time = 0  # TODO: track last acknowledgement
+    walk_histogram = await get_walk_histogram(db, patient_id, baseline["updated_at"])
     
     risk_score = compute_risk_score(
         lat=lat,
@@ -128,7 +137,7 @@ async def process_patient(db, patient):
         no_response_time=no_response_time,
         current_hour=datetime.now().hour,
         has_anomaly=has_anomaly,
-        usual_walk_time=False  # TODO: check baseline
+        usual_walk_time=walk_histogram.is_usual(datetime.now())
     )
     
     # 7. FSM state transition
@@ -167,6 +176,8 @@ async def process_patient(db, patient):
     if not zone_status["in_safe"] and not patient.last_safe_zone_exit:
         patient.last_safe_zone_exit = datetime.utcnow()
     elif zone_status["in_safe"]:
+        if patient.last_safe_zone_exit:
+            await record_walk(db, patient_id, patient.last_safe_zone_exit)
         patient.last_safe_zone_exit = None
     
     await db.commit()
@@ -175,23 +186,18 @@ async def process_patient(db, patient):
 async def create_state_change_alert(db, patient_id: str, new_state: str, 
                                      message: str, lat: float, lon: float):
     """Create an alert when FSM state changes."""
-    from database import Alert
     from state_machine import state_to_alert_level
-    import uuid
-    
-    alert_level = state_to_alert_level(new_state)
+    from alert_aggregator import raise_alert
     
-    alert = Alert(
-        id=str(uuid.uuid4()),
+    await raise_alert(
+        db,
         patient_id=patient_id,
         type="geofence",
-        level=alert_level,
+        level=state_to_alert_level(new_state),
         message=message,
         description=f"State changed to {new_state.upper()}",
         location={"lat": lat, "lng": lon},
-        timestamp=datetime.utcnow(),
     )
-    db.add(alert)
 
 
 def start_monitoring_loop():
@@ -0,0 +1,364 @@
+"""
+Notification Dispatch for SafeWander
+Delivers alert and emergency notifications to a patient's emergency contacts.
+
+Deliveries are written to the notification_outbox table in the same
+transaction as the alert, so a notification exists exactly when its alert
+does and ingest requests never wait on a transport. One worker task per
+channel claims due rows in batches, hands them to that channel's transport
+and reschedules failures with exponential backoff.
+"""
+
+import asyncio
+import json
+import random
+import urllib.request
+from collections import deque
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from config import (
+    NOTIFY_MIN_LEVEL,
+    NOTIFICATION_TRANSPORT,
+    NOTIFICATION_FILE,
+    NOTIFICATION_WEBHOOK_URL,
+    NOTIFICATION_BATCH_SIZE,
+    NOTIFICATION_POLL_INTERVAL,
+    NOTIFICATION_MAX_ATTEMPTS,
+    NOTIFICATION_BACKOFF_BASE,
+    NOTIFICATION_BACKOFF_MAX,
+)
+
+CHANNELS = ("sms", "email")
+LEVEL_ORDER = {"low": 0, "medium": 1, "high": 2, "critical": 3}
+
+notification_stats = {
+    "enqueued": 0,
+    "sent": 0,
+    "retried": 0,
+    "failed": 0,
+    "batches": 0,
+}
+
+# Recent enqueue-to-delivery latencies per channel (seconds)
+_latencies: Dict[str, deque] = {channel: deque(maxlen=1000) for channel in CHANNELS}
+
+# patient_id -> (name, emergency contacts)
+_contacts: Dict[str, Tuple[str, List[Dict]]] = {}
+
+_wake: Dict[str, asyncio.Event] = {}
+
+
+# ==================== TRANSPORTS ====================
+
+class Transport:
+    """Delivers a batch for one channel. Returns an error string (or None) per item."""
+
+    async def send_batch(self, channel: str, items: List[Dict]) -> List[Optional[str]]:
+        raise NotImplementedError
+
+
+class FileTransport(Transport):
+    """Local stub: appends each delivery as a JSON line to a file."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    async def send_batch(self, channel: str, items: List[Dict]) -> List[Optional[str]]:
+        lines = "".join(json.dumps({"channel": channel, **item}, default=str) + "\n" for item in items)
+        await asyncio.to_thread(self._append, lines)
+        return [None] * len(items)
+
+    def _append(self, lines: str) -> None:
+        with open(self.path, "a") as f:
+            f.write(lines)
+
+
+class HttpTransport(Transport):
+    """POSTs the whole batch as JSON to a webhook (e.g. an SMS/email gateway)."""
+
+    def __init__(self, url: str, timeout: float = 10.0):
+        self.url = url
+        self.timeout = timeout
+
+    async def send_batch(self, channel: str, items: List[Dict]) -> List[Optional[str]]:
+        body = json.dumps({"channel": channel, "notifications": items}, default=str).encode()
+        try:
+            await asyncio.to_thread(self._post, body)
+            return [None] * len(items)
+        except Exception as e:
+            return [str(e)] * len(items)
+
+    def _post(self, body: bytes) -> None:
+        request = urllib.request.Request(
+            self.url, data=body, headers={"Content-Type": "application/json"}, method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            if response.status >= 300:
+                raise RuntimeError(f"HTTP {response.status}")
+
+
+_transports: Dict[str, Transport] = {}
+
+
+def register_transport(channel: str, transport: Transport) -> None:
+    """Use a custom transport for a channel (replaces the configured default)."""
+    _transports[channel] = transport
+
+
+def get_transport(channel: str) -> Transport:
+    transport = _transports.get(channel)
+    if transport is None:
+        if NOTIFICATION_TRANSPORT == "http" and NOTIFICATION_WEBHOOK_URL:
+            transport = HttpTransport(NOTIFICATION_WEBHOOK_URL)
+        else:
+            transport = FileTransport(Path(__file__).resolve().parent / NOTIFICATION_FILE)
+        _transports[channel] = transport
+    return transport
+
+
+# ==================== OUTBOX ====================
+
+async def get_contacts(db, patient_id: str) -> Tuple[str, List[Dict]]:
+    """Patient name and emergency contacts, cached after the first lookup."""
+    from database import Patient
+    from sqlalchemy import select
+
+    cached = _contacts.get(patient_id)
+    if cached is None:
+        result = await db.execute(
+            select(Patient.name, Patient.emergency_contacts).where(Patient.id == patient_id)
+        )
+        row = result.first()
+        cached = (row.name, row.emergency_contacts or []) if row else (patient_id, [])
+        _contacts[patient_id] = cached
+    return cached
+
+
+def invalidate_contacts(patient_id: str) -> None:
+    """Drop cached contacts after a patient update."""
+    _contacts.pop(patient_id, None)
+
+
+def _recipients(contacts: List[Dict]) -> List[Dict]:
+    recipients = []
+    for contact in contacts:
+        if contact.get("phone"):
+            recipients.append({"name": contact.get("name", ""), "channel": "sms",
+                               "recipient": contact["phone"]})
+        if contact.get("email"):
+            recipients.append({"name": contact.get("name", ""), "channel": "email",
+                               "recipient": contact["email"]})
+    return recipients
+
+
+async def enqueue(db, patient_id: str, payload: Dict, alert_id: str = None,
+                  emergency_id: str = None) -> List[Dict]:
+    """
+    Add one outbox row per contact and channel to the caller's transaction.
+    Returns the recipients queued.
+    """
+    from database import Notification
+
+    name, contacts = await get_contacts(db, patient_id)
+    recipients = _recipients(contacts)
+    for r in recipients:
+        db.add(Notification(
+            patient_id=patient_id,
+            alert_id=alert_id,
+            emergency_id=emergency_id,
+            channel=r["channel"],
+            recipient=r["recipient"],
+            payload={**payload, "patient_name": name, "contact_name": r["name"]},
+            created_at=datetime.utcnow(),
+            next_attempt_at=datetime.utcnow(),
+        ))
+    if recipients:
+        _wake_after_commit(db, {r["channel"] for r in recipients})
+    notification_stats["enqueued"] += len(recipients)
+    return recipients
+
+
+async def notify_alert(db, alert) -> None:
+    """Queue notifications for an alert at or above NOTIFY_MIN_LEVEL."""
+    level = getattr(alert.level, "value", alert.level)
+    if LEVEL_ORDER.get(level, 0) < LEVEL_ORDER[NOTIFY_MIN_LEVEL]:
+        return
+    await enqueue(db, alert.patient_id, {
+        "kind": "alert",
+        "level": level,
+        "type": getattr(alert.type, "value", alert.type),
+        "message": alert.message,
+        "location": alert.location,
+        "timestamp": (alert.timestamp or datetime.utcnow()).isoformat(),
+    }, alert_id=alert.id)
+
+
+async def notify_emergency(db, emergency) -> List[Dict]:
+    """Queue notifications for an activated emergency; returns recipients for responders_notified."""
+    return await enqueue(db, emergency.patient_id, {
+        "kind": "emergency",
+        "level": "critical",
+        "message": "Emergency mode activated - patient missing",
+        "location": emergency.last_known_location,
+        "search_radius": emergency.search_radius,
+        "timestamp": datetime.utcnow().isoformat(),
+    }, emergency_id=emergency.id)
+
+
+# ==================== WORKERS ====================
+
+def _wake_channel(channel: str) -> None:
+    event = _wake.get(channel)
+    if event is not None:
+        event.set()
+
+
+def _wake_after_commit(db, channels) -> None:
+    """Wake the channel workers once the caller's transaction commits."""
+    from sqlalchemy import event
+
+    def wake(session):
+        for channel in channels:
+            _wake_channel(channel)
+
+    event.listen(db.sync_session, "after_commit", wake, once=True)
+
+
+def backoff_delay(attempts: int) -> float:
+    """Seconds before retry number `attempts` (1-based), with +/-10% jitter."""
+    delay = min(NOTIFICATION_BACKOFF_BASE * 2 ** (attempts - 1), NOTIFICATION_BACKOFF_MAX)
+    return delay * random.uniform(0.9, 1.1)
+
+
+async def dispatch_batch(channel: str) -> int:
+    """Claim up to NOTIFICATION_BATCH_SIZE due deliveries, send them, record results."""
+    from database import async_session_maker, Notification
+    from sqlalchemy import select, update
+
+    now = datetime.utcnow()
+    async with async_session_maker() as db:
+        rows = (await db.execute(
+            select(Notification)
+            .where(Notification.status == "pending")
+            .where(Notification.channel == channel)
+            .where(Notification.next_attempt_at <= now)
+            .order_by(Notification.next_attempt_at, Notification.id)
+            .limit(NOTIFICATION_BATCH_SIZE)
+        )).scalars().all()
+        if not rows:
+            return 0
+        await db.execute(
+            update(Notification)
+            .where(Notification.id.in_([r.id for r in rows]))
+            .values(status="sending")
+        )
+        await db.commit()
+
+    items = [
+        {"id": r.id, "recipient": r.recipient, "alert_id": r.alert_id,
+         "emergency_id": r.emergency_id, "payload": r.payload}
+        for r in rows
+    ]
+    try:
+        errors = await get_transport(channel).send_batch(channel, items)
+    except Exception as e:
+        errors = [str(e)] * len(rows)
+
+    sent_at = datetime.utcnow()
+    sent_ids = [r.id for r, error in zip(rows, errors) if error is None]
+    async with async_session_maker() as db:
+        if sent_ids:
+            await db.execute(
+                update(Notification)
+                .where(Notification.id.in_(sent_ids))
+                .values(status="sent", sent_at=sent_at, attempts=Notification.attempts + 1)
+            )
+        for row, error in zip(rows, errors):
+            if error is None:
+                _latencies[channel].append((sent_at - row.created_at).total_seconds())
+                continue
+            attempts = (row.attempts or 0) + 1
+            if attempts >= NOTIFICATION_MAX_ATTEMPTS:
+                values = {"status": "failed"}
+                notification_stats["failed"] += 1
+                print(f"[Notifications] Giving up on {channel} to {row.recipient}: {error}")
+            else:
+                values = {"status": "pending",
+                          "next_attempt_at": sent_at + timedelta(seconds=backoff_delay(attempts))}
+                notification_stats["retried"] += 1
+            await db.execute(
+                update(Notification)
+                .where(Notification.id == row.id)
+                .values(attempts=attempts, last_error=error, **values)
+            )
+        await db.commit()
+
+    notification_stats["sent"] += len(sent_ids)
+    notification_stats["batches"] += 1
+    return len(rows)
+
+
+async def run_channel_worker(channel: str):
+    """Drain due deliveries for one channel; sleep until woken or the next poll."""
+    event = _wake.setdefault(channel, asyncio.Event())
+    while True:
+        # Cleared before draining so wake-ups during a send are not lost
+        event.clear()
+        try:
+            while await dispatch_batch(channel) == NOTIFICATION_BATCH_SIZE:
+                pass
+        except Exception as e:
+            cancelling = getattr(asyncio.current_task(), "cancelling", None)
+            if cancelling and cancelling():
+                # Shutdown cancelled a send and the driver reported it as an error
+                raise asyncio.CancelledError() from e
+            print(f"[Notifications] {channel} worker error: {e}")
+
+        try:
+            await asyncio.wait_for(event.wait(), timeout=NOTIFICATION_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def _release_claims() -> None:
+    """Return deliveries claimed by a previous process that stopped mid-send."""
+    from database import async_session_maker, Notification
+    from sqlalchemy import update
+
+    async with async_session_maker() as db:
+        await db.execute(
+            update(Notification).where(Notification.status == "sending").values(status="pending")
+        )
+        await db.commit()
+
+
+async def run_dispatcher():
+    await _release_claims()
+    await asyncio.gather(*(run_channel_worker(channel) for channel in CHANNELS))
+
+
+def start_dispatcher() -> asyncio.Task:
+    """Start the per-channel notification workers as a background task."""
+    task = asyncio.create_task(run_dispatcher())
+    print(f"[Notifications] Dispatcher started for {', '.join(CHANNELS)} "
+          f"({NOTIFICATION_TRANSPORT} transport)")
+    return task
+
+
+def get_stats() -> Dict:
+    """Counters plus per-channel delivery latency (mean / p50 / p95 / max seconds)."""
+    latency = {}
+    for channel, samples in _latencies.items():
+        if not samples:
+            continue
+        ordered = sorted(samples)
+        latency[channel] = {
+            "samples": len(ordered),
+            "mean": round(sum(ordered) / len(ordered), 3),
+            "p50": round(ordered[len(ordered) // 2], 3),
+            "p95": round(ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)], 3),
+            "max": round(ordered[-1], 3),
+        }
+    return {**notification_stats, "latency_seconds": latency}
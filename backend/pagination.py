@@ -0,0 +1,73 @@
+"""
+Keyset Pagination for SafeWander history endpoints
+Newest-first (timestamp, id) cursors with since/until filters.
+
+Pages are fetched with a seek on (timestamp, id) instead of OFFSET, so a
+deep page costs the same as the first one. The cursor for the next page
+is returned in the X-Next-Cursor response header, keeping list bodies
+unchanged for existing clients.
+"""
+
+import base64
+import json
+from datetime import datetime, timezone
+from typing import Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Response
+from sqlalchemy import and_, or_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(timestamp: datetime, row_id) -> str:
+    raw = json.dumps([timestamp.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, object]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(timestamp), row_id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_page(query, model, limit: int, cursor: Optional[str] = None,
+                since: Optional[datetime] = None, until: Optional[datetime] = None):
+    """
+    Apply newest-first ordering, time-range filters and the cursor seek.
+    Fetches limit + 1 rows so the caller can tell whether another page exists.
+    """
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+    if since is not None:
+        query = query.where(model.timestamp >= naive_utc(since))
+    if until is not None:
+        query = query.where(model.timestamp < naive_utc(until))
+    if cursor:
+        timestamp, row_id = decode_cursor(cursor)
+        query = query.where(or_(
+            model.timestamp < timestamp,
+            and_(model.timestamp == timestamp, model.id < row_id),
+        ))
+
+    return query.order_by(model.timestamp.desc(), model.id.desc()).limit(limit + 1)
+
+
+def finish_page(rows: Sequence, limit: int, response: Response) -> Sequence:
+    """Trim the probe row and set X-Next-Cursor if there are more rows."""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.timestamp, last.id)
+    return rows
+
+
+def naive_utc(value: datetime) -> datetime:
+    # Stored timestamps are naive UTC
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
@@ -0,0 +1,156 @@
+"""
+Patient Serialization for SafeWander
+Fast path for the frontend patient payload built by PatientResponse.dict().
+
+Most of that payload (name split, medical and contact sections) only
+changes when the patient record is edited, yet it was rebuilt through
+model_validate + model_dump on every dashboard poll. Here the static
+sections are built once per patient and reused until the patient is edited
+(invalidate_patient) or one of its scalar profile fields differs; only the
+live fields (position, battery, last seen, status, FSM state) are filled in
+per request. The output is identical to
+PatientResponse.model_validate(p).dict().
+"""
+
+from datetime import datetime
+from typing import Dict, Tuple
+
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional: faster encoding when installed
+    orjson = None
+
+# patient_id -> (profile signature, head section, middle section)
+_static: Dict[str, Tuple[tuple, Dict, Dict]] = {}
+
+
+def _signature(p) -> tuple:
+    # JSON sections are only edited through update_patient, which invalidates;
+    # comparing them here would cost as much as rebuilding. `location`
+    # changes with every fix, so it is parsed per request instead.
+    return (p.name, p.age, p.photo_url)
+
+
+def _position(location) -> Dict:
+    lat, lng = 40.7580, -73.9855
+    if location and ',' in location:
+        try:
+            parts = location.split(',')
+            lat = float(parts[0])
+            lng = float(parts[1])
+        except ValueError:
+            pass
+    return {"lat": lat, "lng": lng}
+
+
+def _build_static(p) -> Tuple[Dict, Dict]:
+    name = p.name or ''
+    name_parts = name.split(' ', 1)
+    first_name = name_parts[0] if name_parts else ''
+    last_name = name_parts[1] if len(name_parts) > 1 else ''
+
+    medical = p.medical_info or {}
+    behavioral = p.behavioral_patterns or {}
+
+    head = {
+        "id": p.id,
+        "firstName": first_name,
+        "lastName": last_name,
+        "name": p.name,
+        "photo": p.photo_url or '/placeholder-user.jpg',
+        "dateOfBirth": "1947-01-01",
+        "height": "5'6\"",
+        "weight": "150 lbs",
+        "eyeColor": "Brown",
+        "hairColor": "Gray",
+        "distinguishingFeatures": behavioral.get('distinguishing_features', 'None noted'),
+        "diagnosis": medical.get('diagnosis', 'Unknown'),
+        "conditions": medical.get('medical_history', []),
+        "medications": [
+            {"name": med, "dosage": "As prescribed", "frequency": "Daily"}
+            for med in medical.get('medications', [])
+        ],
+        "allergies": medical.get('allergies', []),
+        "bloodType": "O+",
+        "wanderingTriggers": behavioral.get('trigger_locations', []),
+        "calmingStrategies": ["Gentle redirection", "Favorite music"],
+        "communicationAbility": "limited",
+        "mobilityLevel": "medium",
+    }
+    middle = {
+        "currentZone": "Home",
+    }
+    contacts = [
+        {
+            "id": f"EC-{i}",
+            "name": contact.get('name', ''),
+            "relationship": contact.get('relationship', ''),
+            "phone": contact.get('phone', ''),
+            "isPrimary": i == 0
+        }
+        for i, contact in enumerate(p.emergency_contacts or [])
+    ]
+    return head, {**middle, "emergencyContacts": contacts}
+
+
+def _iso(value) -> str:
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def serialize_patient(p) -> Dict:
+    """Frontend payload for a Patient (same as PatientResponse(...).dict())."""
+    signature = _signature(p)
+    cached = _static.get(p.id)
+    if cached is None or cached[0] != signature:
+        cached = (signature, *_build_static(p))
+        _static[p.id] = cached
+    _, head, middle = cached
+
+    battery = p.battery
+    last_seen = _iso(p.last_seen)
+    status = getattr(p.status, "value", p.status)
+    return {
+        **head,
+        "device": {
+            "id": f"DEV-{p.id}",
+            "name": "GPS Tracker",
+            "batteryLevel": battery,
+            "signalStrength": "strong" if battery > 20 else "weak",
+            "lastUpdate": last_seen,
+        },
+        "currentPosition": _position(p.location),
+        "currentZone": middle["currentZone"],
+        "status": status,
+        "emergencyContacts": middle["emergencyContacts"],
+        "age": p.age,
+        "location": p.location,
+        "last_seen": last_seen,
+        "battery": battery,
+        "active_alerts": p.active_alerts,
+        "created_at": _iso(p.created_at),
+        "updated_at": _iso(p.updated_at),
+        "fsm_state": p.fsm_state,
+        "risk_score": p.risk_score,
+        "state_entered_at": p.state_entered_at.isoformat() if isinstance(p.state_entered_at, datetime) else None,
+        "mobility_level": p.mobility_level,
+    }
+
+
+def invalidate_patient(patient_id: str) -> None:
+    """Drop the cached static sections after a patient edit or delete."""
+    _static.pop(patient_id, None)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response for payloads that are already plain dicts/lists/str: skips
+    FastAPI's jsonable_encoder pass and uses orjson when it is installed.
+    Same bytes as the default response.
+    """
+
+    def render(self, content) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content)
+        return super().render(content)
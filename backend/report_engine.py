@@ -0,0 +1,187 @@
+"""
+Report Engine for SafeWander
+Builds summary reports from daily rollups as background jobs.
+
+A request is turned into a job that runs off the request path and stores
+its result as a Report row; clients poll the job for status. Results for
+ranges that are fully in the past are cached by parameters, and dropped
+again if a late update touches one of the days they cover.
+"""
+
+import asyncio
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from config import REPORT_JOB_HISTORY
+from rollups import STATE_COLUMNS, LEVEL_COLUMNS
+
+# job_id -> job dict (status: pending, running, completed, failed)
+_jobs: "OrderedDict[str, Dict]" = OrderedDict()
+_tasks = set()
+
+# (patient_id or None, start, end) -> report_id
+_cache: Dict[Tuple[Optional[str], date, date], str] = {}
+
+
+def _empty_totals() -> Dict:
+    return {
+        "incidents": 0,
+        "alerts_by_level": {level: 0 for level in LEVEL_COLUMNS},
+        "alerts_total": 0,
+        "acknowledged": 0,
+        "mean_ack_latency_seconds": None,
+        "time_outside_safe_minutes": 0.0,
+        "time_in_state_minutes": {state: 0.0 for state in STATE_COLUMNS},
+        "_ack_latency": 0.0,
+    }
+
+
+def _add_rollup(totals: Dict, row) -> None:
+    totals["incidents"] += row.incidents or 0
+    for level, column in LEVEL_COLUMNS.items():
+        count = getattr(row, column) or 0
+        totals["alerts_by_level"][level] += count
+        totals["alerts_total"] += count
+    totals["acknowledged"] += row.acknowledged_count or 0
+    totals["_ack_latency"] += row.ack_latency_seconds or 0.0
+    totals["time_outside_safe_minutes"] += (row.outside_safe_seconds or 0.0) / 60
+    for state, column in STATE_COLUMNS.items():
+        totals["time_in_state_minutes"][state] += (getattr(row, column) or 0.0) / 60
+
+
+def _finish(totals: Dict) -> Dict:
+    latency = totals.pop("_ack_latency")
+    if totals["acknowledged"]:
+        totals["mean_ack_latency_seconds"] = round(latency / totals["acknowledged"], 1)
+    totals["time_outside_safe_minutes"] = round(totals["time_outside_safe_minutes"], 1)
+    totals["time_in_state_minutes"] = {
+        state: round(minutes, 1) for state, minutes in totals["time_in_state_minutes"].items()
+    }
+    return totals
+
+
+async def compute_report(db, start: date, end: date, patient_id: Optional[str] = None) -> Dict:
+    """
+    Aggregate rollups for [start, end] (inclusive, UTC days).
+
+    Returns:
+        Dict with overall totals and per-patient totals and daily breakdowns
+    """
+    from database import DailyRollup
+    from sqlalchemy import select
+
+    query = (
+        select(DailyRollup)
+        .where(DailyRollup.day >= start)
+        .where(DailyRollup.day <= end)
+        .order_by(DailyRollup.patient_id, DailyRollup.day)
+    )
+    if patient_id:
+        query = query.where(DailyRollup.patient_id == patient_id)
+    rows = (await db.execute(query)).scalars().all()
+
+    overall = _empty_totals()
+    patients: Dict[str, Dict] = {}
+    for row in rows:
+        entry = patients.setdefault(row.patient_id, {"totals": _empty_totals(), "days": []})
+        day_totals = _empty_totals()
+        _add_rollup(day_totals, row)
+        entry["days"].append({"day": row.day.isoformat(), **_finish(day_totals)})
+        _add_rollup(entry["totals"], row)
+        _add_rollup(overall, row)
+
+    return {
+        "start_date": start.isoformat(),
+        "end_date": end.isoformat(),
+        "patient_id": patient_id,
+        "totals": _finish(overall),
+        "patients": [
+            {"patient_id": pid, "totals": _finish(entry["totals"]), "days": entry["days"]}
+            for pid, entry in patients.items()
+        ],
+    }
+
+
+def submit_report(start: date, end: date, patient_id: Optional[str] = None,
+                  title: Optional[str] = None, generated_by: Optional[str] = None) -> Dict:
+    """
+    Queue a report job, or return an already completed one when a cached
+    report exists for the same closed range.
+    """
+    key = (patient_id, start, end)
+    job = {
+        "id": str(uuid.uuid4()),
+        "status": "pending",
+        "patient_id": patient_id,
+        "start_date": start,
+        "end_date": end,
+        "report_id": None,
+        "error": None,
+        "cached": False,
+        "created_at": datetime.utcnow(),
+        "finished_at": None,
+    }
+    _remember(job)
+
+    report_id = _cache.get(key)
+    if report_id is not None:
+        job.update(status="completed", report_id=report_id, cached=True, finished_at=datetime.utcnow())
+        return job
+
+    task = asyncio.create_task(_run_job(job, title, generated_by))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return job
+
+
+def get_job(job_id: str) -> Optional[Dict]:
+    return _jobs.get(job_id)
+
+
+def _remember(job: Dict) -> None:
+    _jobs[job["id"]] = job
+    while len(_jobs) > REPORT_JOB_HISTORY:
+        _jobs.popitem(last=False)
+
+
+async def _run_job(job: Dict, title: Optional[str], generated_by: Optional[str]) -> None:
+    from database import async_session_maker, Report
+
+    job["status"] = "running"
+    start, end, patient_id = job["start_date"], job["end_date"], job["patient_id"]
+    try:
+        async with async_session_maker() as db:
+            data = await compute_report(db, start, end, patient_id)
+            report = Report(
+                id=str(uuid.uuid4()),
+                type="summary",
+                title=title or f"Summary {start.isoformat()} to {end.isoformat()}",
+                date_range=f"{start.isoformat()}/{end.isoformat()}",
+                generated_by=generated_by or "system",
+                data=data,
+            )
+            db.add(report)
+            await db.commit()
+
+        job.update(status="completed", report_id=report.id)
+        if end < datetime.utcnow().date():
+            _cache[(patient_id, start, end)] = report.id
+    except Exception as e:
+        print(f"[Reports] Job {job['id']} failed: {e}")
+        job.update(status="failed", error=str(e))
+    finally:
+        job["finished_at"] = datetime.utcnow()
+
+
+def invalidate_reports(patient_id: Optional[str] = None, day: Optional[date] = None,
+                       report_id: Optional[str] = None) -> None:
+    """Drop cached reports covering a patient-day, or pointing at a deleted report."""
+    stale: List[Tuple] = [
+        key for key, cached_id in _cache.items()
+        if (report_id is not None and cached_id == report_id)
+        or (day is not None and key[1] <= day <= key[2] and key[0] in (None, patient_id))
+    ]
+    for key in stale:
+        del _cache[key]
@@ -0,0 +1,201 @@
+"""
+Location History Retention for SafeWander
+Background task that compacts old full-resolution fixes into per-minute history.
+
+Fixes older than LOCATION_RETENTION_DAYS are averaged into one
+LocationHistory point per HISTORY_BUCKET_SECONDS and deleted from
+`locations` in small batches, each in its own short transaction.
+"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+from config import (
+    RETENTION_INTERVAL,
+    LOCATION_RETENTION_DAYS,
+    HISTORY_BUCKET_SECONDS,
+    RETENTION_BATCH_SIZE,
+)
+
+# Serializes passes (background loop vs. manual trigger) so no fix is compacted twice
+_pass_lock = asyncio.Lock()
+
+# Cumulative metrics since process start
+retention_stats = {
+    "runs": 0,
+    "last_run_at": None,
+    "last_duration_ms": 0,
+    "last_rows_compacted": 0,
+    "rows_compacted": 0,
+    "history_rows_written": 0,
+    "bytes_reclaimed": 0,
+    "db_used_bytes": None,
+    "db_free_bytes": None,
+}
+
+
+def bucket_start(timestamp: datetime, bucket_seconds: int = HISTORY_BUCKET_SECONDS) -> datetime:
+    """Floor a timestamp to the start of its bucket."""
+    epoch = datetime(1970, 1, 1)
+    seconds = int((timestamp - epoch).total_seconds())
+    return epoch + timedelta(seconds=seconds - seconds % bucket_seconds)
+
+
+def downsample_fixes(rows: List, bucket_seconds: int = HISTORY_BUCKET_SECONDS) -> List[Dict]:
+    """
+    Average time-ordered fixes into one point per bucket.
+    Rows need latitude, longitude, accuracy, speed and timestamp attributes.
+    """
+    points = []
+    current = None
+    for row in rows:
+        start = bucket_start(row.timestamp, bucket_seconds)
+        if current is None or current["timestamp"] != start:
+            current = {"timestamp": start, "lat": 0.0, "lng": 0.0,
+                       "accuracy": [], "speed": [], "count": 0}
+            points.append(current)
+        current["lat"] += row.latitude
+        current["lng"] += row.longitude
+        current["count"] += 1
+        if row.accuracy is not None:
+            current["accuracy"].append(row.accuracy)
+        if row.speed is not None:
+            current["speed"].append(row.speed)
+
+    return [
+        {
+            "timestamp": p["timestamp"],
+            "latitude": p["lat"] / p["count"],
+            "longitude": p["lng"] / p["count"],
+            "accuracy": sum(p["accuracy"]) / len(p["accuracy"]) if p["accuracy"] else None,
+            "speed": sum(p["speed"]) / len(p["speed"]) if p["speed"] else None,
+            "sample_count": p["count"],
+        }
+        for p in points
+    ]
+
+
+async def get_db_size(db) -> Tuple[int, int]:
+    """Return (used bytes, free-list bytes) of the SQLite database file."""
+    from sqlalchemy import text
+
+    page_size = (await db.execute(text("PRAGMA page_size"))).scalar()
+    page_count = (await db.execute(text("PRAGMA page_count"))).scalar()
+    free_pages = (await db.execute(text("PRAGMA freelist_count"))).scalar()
+    return (page_count - free_pages) * page_size, free_pages * page_size
+
+
+async def compact_patient(db, patient_id: str, cutoff: datetime) -> Tuple[int, int]:
+    """
+    Compact one patient's fixes older than cutoff.
+    Returns (raw rows removed, history rows written).
+    """
+    from database import Location, LocationHistory
+    from sqlalchemy import select, delete
+
+    compacted = 0
+    written = 0
+
+    while True:
+        result = await db.execute(
+            select(Location.id, Location.latitude, Location.longitude,
+                   Location.accuracy, Location.speed, Location.timestamp)
+            .where(Location.patient_id == patient_id)
+            .where(Location.timestamp < cutoff)
+            .order_by(Location.timestamp, Location.id)
+            .limit(RETENTION_BATCH_SIZE)
+        )
+        rows = result.all()
+        if not rows:
+            break
+
+        full_batch = len(rows) == RETENTION_BATCH_SIZE
+        if full_batch:
+            # Leave the trailing bucket for the next batch so it is not split in two
+            last_bucket = bucket_start(rows[-1].timestamp)
+            trimmed = [r for r in rows if bucket_start(r.timestamp) != last_bucket]
+            rows = trimmed or rows
+
+        points = downsample_fixes(rows)
+        deleted = await db.execute(delete(Location).where(Location.id.in_([r.id for r in rows])))
+        if deleted.rowcount != len(rows):
+            # Rows changed under us (another writer) - retry this batch
+            await db.rollback()
+            continue
+        db.add_all([LocationHistory(patient_id=patient_id, **p) for p in points])
+        await db.commit()
+
+        compacted += len(rows)
+        written += len(points)
+
+        if not full_batch:
+            break
+        # Let request handlers get at the database between batches
+        await asyncio.sleep(0)
+
+    return compacted, written
+
+
+async def run_retention_pass(retention_days: float = LOCATION_RETENTION_DAYS) -> Dict:
+    """Run one compaction pass over all patients and update retention_stats."""
+    async with _pass_lock:
+        return await _run_pass(retention_days)
+
+
+async def _run_pass(retention_days: float) -> Dict:
+    from database import async_session_maker, Location
+    from sqlalchemy import select
+
+    started = time.perf_counter()
+    # On a bucket boundary, so no bucket is split between two passes
+    cutoff = bucket_start(datetime.utcnow() - timedelta(days=retention_days))
+    compacted = 0
+    written = 0
+
+    async with async_session_maker() as db:
+        used_before, _ = await get_db_size(db)
+
+        result = await db.execute(
+            select(Location.patient_id).where(Location.timestamp < cutoff).distinct()
+        )
+        for patient_id in result.scalars().all():
+            patient_compacted, patient_written = await compact_patient(db, patient_id, cutoff)
+            compacted += patient_compacted
+            written += patient_written
+
+        used_after, free_after = await get_db_size(db)
+
+    retention_stats["runs"] += 1
+    retention_stats["last_run_at"] = datetime.utcnow().isoformat()
+    retention_stats["last_duration_ms"] = int((time.perf_counter() - started) * 1000)
+    retention_stats["last_rows_compacted"] = compacted
+    retention_stats["rows_compacted"] += compacted
+    retention_stats["history_rows_written"] += written
+    retention_stats["bytes_reclaimed"] += max(used_before - used_after, 0)
+    retention_stats["db_used_bytes"] = used_after
+    retention_stats["db_free_bytes"] = free_after
+
+    if compacted:
+        print(f"[Retention] Compacted {compacted} fixes into {written} history points")
+    return dict(retention_stats)
+
+
+async def run_retention_loop():
+    """Background task that runs a compaction pass every RETENTION_INTERVAL seconds."""
+    while True:
+        try:
+            await run_retention_pass()
+        except Exception as e:
+            print(f"[Retention] Error: {e}")
+
+        await asyncio.sleep(RETENTION_INTERVAL)
+
+
+def start_retention_loop() -> asyncio.Task:
+    """Start the retention loop as a background task."""
+    task = asyncio.create_task(run_retention_loop())
+    print(f"[Retention] Started with {RETENTION_INTERVAL}s interval, "
+          f"keeping {LOCATION_RETENTION_DAYS} days at full resolution")
+    return task
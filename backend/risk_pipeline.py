@@ -0,0 +1,140 @@
+"""
+Per-Fix Risk Evaluation for SafeWander
+One step of the location pipeline - zone status, anomaly detection, risk
+score and FSM transition - as a function of the fix and an explicit clock,
+so the same code serves live ingest, late-fix replay and offline replays.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from anomaly import detect_anomaly
+from geo_utils import get_zone_status
+from risk_engine import compute_risk_score
+from state_machine import transition_state
+from walk_histogram import utc_to_local
+from config import DANGER_ZONE_PROXIMITY, WANDERING_SCORE_THRESHOLD
+
+# Snapshot of these attributes restores a patient's FSM position
+STATE_FIELDS = ("fsm_state", "state_entered_at", "last_safe_zone_exit", "risk_score", "status")
+
+
+def snapshot(state) -> Dict:
+    return {field: getattr(state, field, None) for field in STATE_FIELDS}
+
+
+def restore(state, saved: Dict) -> None:
+    for field, value in saved.items():
+        setattr(state, field, value)
+
+
+def legacy_status(fsm_state: str) -> str:
+    """Patient.status for an FSM state (backward compatibility)."""
+    if fsm_state == "emergency":
+        return "emergency"
+    if fsm_state in ("urgent", "warning"):
+        return "warning"
+    return "safe"
+
+
+def evaluate_fix(
+    state,
+    lat: float,
+    lon: float,
+    now: datetime,
+    zones: List[Dict],
+    baseline: Dict,
+    walk_histogram=None,
+    speed: Optional[float] = None,
+    heading: Optional[float] = None,
+    tracker=None,
+    wandering_score: int = 0,
+    utc_offset: Optional[timedelta] = None,
+) -> Dict:
+    """
+    Evaluate one fix and advance the patient's FSM in place.
+
+    Args:
+        state: Patient row or any object with STATE_FIELDS attributes
+        now: Event time of the fix (naive UTC); all timers use it
+        zones: Active zones as dicts (id, name, type, center, radius)
+        baseline: get_baseline() dict
+        walk_histogram: WalkTimeHistogram, or None for "not a usual walk time"
+        tracker: TrajectoryTracker fed with this fix (in-order fixes only);
+            without one, `wandering_score` is used as given
+        utc_offset: Local time offset for night hours / usual walk times;
+            defaults to the server's time zone (fixed for reproducible replays)
+
+    Returns:
+        Dict with risk_score, wandering_score, has_anomaly, zone_status,
+        previous_state, new_state, alert_message (None without a transition)
+        and trip_started_at (safe zone exit time when this fix ended a trip)
+    """
+    time_outside_safe = 0
+    if state.last_safe_zone_exit:
+        time_outside_safe = max(int((now - state.last_safe_zone_exit).total_seconds()), 0)
+
+    zone_status = get_zone_status(lat, lon, zones)
+    near_danger = zone_status["nearest_danger_dist"] < DANGER_ZONE_PROXIMITY
+
+    duration_ratio = time_outside_safe / baseline["avg_duration"] if baseline["avg_duration"] else 0.0
+    if tracker is not None:
+        if not zone_status["in_safe"] and not state.last_safe_zone_exit:
+            tracker.start_trip()
+        tracker.update(lat, lon, now, heading)
+        wandering_score = tracker.wandering_score(duration_ratio)
+
+    has_anomaly = (
+        detect_anomaly(speed or 0.8, time_outside_safe, baseline)
+        or wandering_score >= WANDERING_SCORE_THRESHOLD
+    )
+
+    local_now = now + utc_offset if utc_offset is not None else utc_to_local(now)
+    usual_walk_time = walk_histogram.is_usual(local_now) if walk_histogram is not None else False
+
+    risk_score = compute_risk_score(
+        lat=lat,
+        lon=lon,
+        zones=zones,
+        gps_signal="good",
+        time_outside_safe=time_outside_safe,
+        no_response_time=0,
+        current_hour=local_now.hour,
+        has_anomaly=has_anomaly,
+        usual_walk_time=usual_walk_time
+    )
+
+    current_state = state.fsm_state or "safe"
+    new_state, alert_message = transition_state(
+        current_state=current_state,
+        risk_score=risk_score,
+        state_entered_at=state.state_entered_at or now,
+        near_danger=near_danger,
+        now=now,
+    )
+
+    state.risk_score = risk_score
+    if new_state != current_state:
+        state.fsm_state = new_state
+        state.state_entered_at = now
+        state.status = legacy_status(new_state)
+    else:
+        alert_message = None
+
+    trip_started_at = None
+    if not zone_status["in_safe"] and not state.last_safe_zone_exit:
+        state.last_safe_zone_exit = now
+    elif zone_status["in_safe"]:
+        trip_started_at = state.last_safe_zone_exit
+        state.last_safe_zone_exit = None
+
+    return {
+        "risk_score": risk_score,
+        "wandering_score": wandering_score,
+        "has_anomaly": has_anomaly,
+        "zone_status": zone_status,
+        "previous_state": current_state,
+        "new_state": new_state,
+        "alert_message": alert_message,
+        "trip_started_at": trip_started_at,
+    }
@@ -0,0 +1,100 @@
+"""
+Daily Rollups for SafeWander
+Per-patient, per-day counters maintained as fixes, alerts and emergencies
+arrive, so reports read one row per patient-day instead of raw tables.
+
+Every update is a single INSERT ... ON CONFLICT DO UPDATE that adds to the
+stored counters, so concurrent writers never lose increments. Updates join
+the caller's transaction; the caller commits.
+"""
+
+from datetime import date, datetime
+from typing import Dict, Tuple
+
+from sqlalchemy.dialects.sqlite import insert
+
+from config import ROLLUP_MAX_GAP
+
+STATE_COLUMNS = {
+    "safe": "safe_seconds",
+    "advisory": "advisory_seconds",
+    "warning": "warning_seconds",
+    "urgent": "urgent_seconds",
+    "emergency": "emergency_seconds",
+}
+
+LEVEL_COLUMNS = {
+    "low": "alerts_low",
+    "medium": "alerts_medium",
+    "high": "alerts_high",
+    "critical": "alerts_critical",
+}
+
+# Last fix per patient: (timestamp, outside safe zone, FSM state)
+_last_fix: Dict[str, Tuple[datetime, bool, str]] = {}
+
+
+async def increment(db, patient_id: str, day: date, **deltas) -> None:
+    """Add deltas to one patient-day row, creating it if needed."""
+    from database import DailyRollup
+
+    deltas = {column: value for column, value in deltas.items() if value}
+    if not deltas:
+        return
+
+    stmt = insert(DailyRollup).values(patient_id=patient_id, day=day, **deltas)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["patient_id", "day"],
+        set_={column: getattr(DailyRollup, column) + stmt.excluded[column] for column in deltas},
+    )
+    await db.execute(stmt)
+
+    # Late changes to a closed day make cached reports covering it stale
+    if day < datetime.utcnow().date():
+        from report_engine import invalidate_reports
+        invalidate_reports(patient_id, day)
+
+
+async def record_fix(db, patient_id: str, timestamp: datetime, outside_safe: bool,
+                     fsm_state: str) -> None:
+    """
+    Credit the time since the patient's previous fix to the FSM state and
+    zone status that held over it. Gaps longer than ROLLUP_MAX_GAP count
+    only up to ROLLUP_MAX_GAP (the device was probably offline).
+    """
+    previous = _last_fix.get(patient_id)
+    _last_fix[patient_id] = (timestamp, outside_safe, fsm_state)
+    if previous is None:
+        return
+
+    last_ts, was_outside, last_state = previous
+    elapsed = min((timestamp - last_ts).total_seconds(), ROLLUP_MAX_GAP)
+    if elapsed <= 0:
+        return
+
+    deltas = {STATE_COLUMNS.get(last_state, "safe_seconds"): elapsed}
+    if was_outside:
+        deltas["outside_safe_seconds"] = elapsed
+    await increment(db, patient_id, timestamp.date(), **deltas)
+
+
+async def record_alert(db, patient_id: str, level: str, timestamp: datetime = None) -> None:
+    """Count a new alert by level."""
+    timestamp = timestamp or datetime.utcnow()
+    column = LEVEL_COLUMNS.get(getattr(level, "value", level), "alerts_low")
+    await increment(db, patient_id, timestamp.date(), **{column: 1})
+
+
+async def record_acknowledgement(db, alert) -> None:
+    """Add an alert's acknowledgement latency to the day it was raised."""
+    if not alert.timestamp or not alert.acknowledged_at:
+        return
+    latency = max((alert.acknowledged_at - alert.timestamp).total_seconds(), 0.0)
+    await increment(db, alert.patient_id, alert.timestamp.date(),
+                    acknowledged_count=1, ack_latency_seconds=latency)
+
+
+async def record_incident(db, patient_id: str, timestamp: datetime = None) -> None:
+    """Count an emergency activation."""
+    timestamp = timestamp or datetime.utcnow()
+    await increment(db, patient_id, timestamp.date(), incidents=1)
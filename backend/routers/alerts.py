@@ -1,22 +1,48 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc, delete
-from typing import List
-from database import get_db, Alert, Patient, Activity
+from sqlalchemy import select, desc, delete, update
+from typing import List, Optional
+from database import get_db, Alert, Activity
 from schemas import AlertCreate, AlertResponse, ActivityCreate, ActivityResponse
 from datetime import datetime
 import uuid
 
+from pagination import keyset_page, finish_page
+from rollups import record_alert, record_acknowledgement
+from alert_aggregator import close_alert, drop_aggregates, aggregator_stats
+from notifications import notify_alert
+from change_tracker import mark_changed, mark_reset, not_modified, etag
+from alert_counters import (
+    increment_active_alerts,
+    decrement_active_alerts,
+    reset_active_alerts,
+    get_alert_summaries,
+)
+
 router = APIRouter()
 
 @router.get("/", response_model=List[AlertResponse])
 async def get_alerts(
+    request: Request,
+    response: Response,
     patient_id: str = None,
     unacknowledged_only: bool = False,
+    limit: int = 100,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_db)
 ):
-    """Get all alerts or alerts for a specific patient"""
-    query = select(Alert).order_by(desc(Alert.timestamp))
+    """
+    Get alerts, newest first, optionally for one patient (next page cursor in X-Next-Cursor).
+    Sends an ETag; a matching If-None-Match gets 304 while no alert has changed.
+    """
+    cached = not_modified(request, "alerts")
+    if cached:
+        return cached
+    response.headers["ETag"] = etag("alerts")
+    
+    query = select(Alert)
     
     if patient_id:
         query = query.where(Alert.patient_id == patient_id)
@@ -24,9 +50,26 @@ async def get_alerts(
     if unacknowledged_only:
         query = query.where(Alert.acknowledged == False)
     
-    result = await db.execute(query)
-    alerts = result.scalars().all()
-    return alerts
+    result = await db.execute(keyset_page(query, Alert, limit, cursor, since, until))
+    return finish_page(result.scalars().all(), limit, response)
+
+@router.get("/summary")
+async def get_alert_summary(db: AsyncSession = Depends(get_db)):
+    """Get open alert counts by level for every patient (dashboard header)"""
+    patients = await get_alert_summaries(db)
+    totals = {"active_alerts": 0, "unacknowledged": 0,
+              "by_level": {"low": 0, "medium": 0, "high": 0, "critical": 0}}
+    for summary in patients:
+        totals["active_alerts"] += summary["active_alerts"]
+        totals["unacknowledged"] += summary["unacknowledged"]
+        for level, count in summary["by_level"].items():
+            totals["by_level"][level] += count
+    return {"totals": totals, "patients": patients}
+
+@router.get("/aggregation")
+async def get_aggregation_stats():
+    """Get alert deduplication metrics"""
+    return aggregator_stats
 
 @router.get("/{alert_id}", response_model=AlertResponse)
 async def get_alert(alert_id: str, db: AsyncSession = Depends(get_db)):
@@ -44,22 +87,15 @@ async def create_alert(alert: AlertCreate, db: AsyncSession = Depends(get_db)):
     """Create a new alert"""
     db_alert = Alert(
         id=str(uuid.uuid4()),
+        timestamp=datetime.utcnow(),
         **alert.model_dump()
     )
     db.add(db_alert)
+    await record_alert(db, alert.patient_id, alert.level, db_alert.timestamp)
+    await notify_alert(db, db_alert)
     
-    # Update patient's active alerts count
-    result = await db.execute(select(Patient).where(Patient.id == alert.patient_id))
-    patient = result.scalar_one_or_none()
-    
-    if patient:
-        patient.active_alerts = (patient.active_alerts or 0) + 1
-        
-        # Update patient status based on alert level
-        if alert.level == "critical":
-            patient.status = "emergency"
-        elif alert.level == "high" and patient.status != "emergency":
-            patient.status = "warning"
+    # Update patient's active alerts count and status (single UPDATE)
+    await increment_active_alerts(db, alert.patient_id, alert.level)
     
     # Create activity log
     activity = Activity(
@@ -89,10 +125,14 @@ async def acknowledge_alert(
     if not alert:
         raise HTTPException(status_code=404, detail="Alert not found")
     
+    first_acknowledgement = not alert.acknowledged
     alert.acknowledged = True
     alert.acknowledged_at = datetime.utcnow()
     alert.acknowledged_by = acknowledged_by
     
+    if first_acknowledgement:
+        await record_acknowledgement(db, alert)
+    
     await db.commit()
     await db.refresh(alert)
     return alert
@@ -106,19 +146,17 @@ async def resolve_alert(alert_id: str, db: AsyncSession = Depends(get_db)):
     if not alert:
         raise HTTPException(status_code=404, detail="Alert not found")
     
-    alert.resolved = True
-    alert.resolved_at = datetime.utcnow()
-    
-    # Update patient's active alerts count
-    patient_result = await db.execute(select(Patient).where(Patient.id == alert.patient_id))
-    patient = patient_result.scalar_one_or_none()
-    
-    if patient:
-        patient.active_alerts = max(0, (patient.active_alerts or 0) - 1)
-        
-        # Update patient status if no more alerts
-        if patient.active_alerts == 0:
-            patient.status = "safe"
+    # Only the request that actually flips resolved decrements the count
+    resolved = await db.execute(
+        update(Alert)
+        .where(Alert.id == alert_id)
+        .where(Alert.resolved == False)
+        .values(resolved=True, resolved_at=datetime.utcnow())
+    )
+    if resolved.rowcount:
+        mark_changed(db, "alerts", [alert_id])
+        await decrement_active_alerts(db, alert.patient_id)
+        close_alert(alert_id)
     
     await db.commit()
     await db.refresh(alert)
@@ -133,42 +171,33 @@ async def clear_all_alerts(
     if patient_id:
         # Delete alerts for specific patient
         await db.execute(delete(Alert).where(Alert.patient_id == patient_id))
-        
-        # Reset patient's active alerts count
-        result = await db.execute(select(Patient).where(Patient.id == patient_id))
-        patient = result.scalar_one_or_none()
-        if patient:
-            patient.active_alerts = 0
-            patient.status = "safe"
     else:
         # Delete all alerts
         await db.execute(delete(Alert))
-        
-        # Reset all patients' active alerts count
-        result = await db.execute(select(Patient))
-        patients = result.scalars().all()
-        for patient in patients:
-            patient.active_alerts = 0
-            patient.status = "safe"
+    
+    # Reset active alerts count (one patient or all)
+    await reset_active_alerts(db, patient_id)
+    mark_reset(db, "alerts")
     
     await db.commit()
+    # Repeats must open new alerts, not bump deleted ones
+    drop_aggregates(patient_id)
     return {"message": "Alerts cleared successfully"}
 
 @router.get("/activities/{patient_id}", response_model=List[ActivityResponse])
 async def get_activities(
     patient_id: str,
+    response: Response,
     limit: int = 50,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_db)
 ):
-    """Get activity timeline for a patient"""
-    result = await db.execute(
-        select(Activity)
-        .where(Activity.patient_id == patient_id)
-        .order_by(desc(Activity.timestamp))
-        .limit(limit)
-    )
-    activities = result.scalars().all()
-    return activities
+    """Get activity timeline for a patient, newest first (next page cursor in X-Next-Cursor)"""
+    query = select(Activity).where(Activity.patient_id == patient_id)
+    result = await db.execute(keyset_page(query, Activity, limit, cursor, since, until))
+    return finish_page(result.scalars().all(), limit, response)
 
 @router.post("/activities", response_model=ActivityResponse)
 async def create_activity(activity: ActivityCreate, db: AsyncSession = Depends(get_db)):
@@ -1,24 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, delete
 from typing import List
-from database import get_db, Emergency, Patient, Activity
-from schemas import EmergencyCreate, EmergencyResponse
+from database import get_db, Emergency, EmergencyEvent, Patient, Activity
+from schemas import EmergencyCreate, EmergencyResponse, TimelineEventCreate, TimelineEventResponse
 from datetime import datetime
+import asyncio
 import uuid
 
 # Import algorithm modules
 from baseline import get_baseline
+from rollups import record_incident
+from notifications import notify_emergency
+from emergency_timeline import append_event, get_events
+from change_tracker import mark_reset, not_modified, etag
+from pagination import NEXT_CURSOR_HEADER, MAX_PAGE_SIZE, encode_cursor, decode_cursor
 from config import MOBILITY_FACTORS, TERRAIN_FACTOR
 
 router = APIRouter()
 
 @router.get("/", response_model=List[EmergencyResponse])
 async def get_emergencies(
+    request: Request,
+    response: Response,
     active_only: bool = True,
     db: AsyncSession = Depends(get_db)
 ):
-    """Get all emergencies"""
+    """Get all emergencies (ETag / If-None-Match supported)"""
+    cached = not_modified(request, "emergencies")
+    if cached:
+        return cached
+    response.headers["ETag"] = etag("emergencies")
+    
     query = select(Emergency)
     
     if active_only:
@@ -39,6 +52,46 @@ async def get_emergency(emergency_id: str, db: AsyncSession = Depends(get_db)):
     
     return emergency
 
+@router.get("/{emergency_id}/heatmap")
+async def get_search_heatmap(emergency_id: str, db: AsyncSession = Depends(get_db)):
+    """
+    Get a probability grid of where the patient may be.
+    Cells are [row, col, probability] covering most of the probability mass;
+    row 0 is the northern edge of `bounds`.
+    """
+    from search_area import get_search_heatmap as compute_search_heatmap
+    
+    result = await db.execute(select(Emergency).where(Emergency.id == emergency_id))
+    emergency = result.scalar_one_or_none()
+    
+    if not emergency:
+        raise HTTPException(status_code=404, detail="Emergency not found")
+    
+    heatmap = await compute_search_heatmap(db, emergency)
+    if heatmap is None:
+        raise HTTPException(status_code=409, detail="Emergency has no known location to search from")
+    return heatmap
+
+@router.get("/{emergency_id}/reachable")
+async def get_reachable_area(emergency_id: str, db: AsyncSession = Depends(get_db)):
+    """
+    Get the region the patient could have walked to (isochrone).
+    The region is row runs [row, first_col, last_col] on the grid in `bounds`;
+    `search_radius` is the farthest reachable straight-line distance.
+    """
+    from isochrone import get_isochrone
+    
+    result = await db.execute(select(Emergency).where(Emergency.id == emergency_id))
+    emergency = result.scalar_one_or_none()
+    
+    if not emergency:
+        raise HTTPException(status_code=404, detail="Emergency not found")
+    
+    region = await get_isochrone(db, emergency)
+    if region is None:
+        raise HTTPException(status_code=409, detail="Emergency has no known location to search from")
+    return region
+
 @router.post("/", response_model=EmergencyResponse)
 async def create_emergency(emergency: EmergencyCreate, db: AsyncSession = Depends(get_db)):
     """Activate emergency mode for a patient"""
@@ -71,6 +124,21 @@ async def create_emergency(emergency: EmergencyCreate, db: AsyncSession = Depend
     mobility_factor = MOBILITY_FACTORS.get(mobility_level, 1.0)
     
     estimated_radius = avg_speed * time_missing * mobility_factor * TERRAIN_FACTOR
+    
+    # Walking reach around obstacles is tighter than the straight-line circle;
+    # only worth computing when the caller did not set a radius
+    if emergency.search_radius is None and emergency.last_known_location and "lat" in emergency.last_known_location:
+        from search_area import load_search_context
+        from isochrone import compute_isochrone
+        
+        context = await load_search_context(db, Emergency(
+            patient_id=emergency.patient_id,
+            last_known_location=emergency.last_known_location,
+        ))
+        if context["origin"] is not None:
+            # Grid search is CPU-bound; keep it off the event loop
+            estimated_radius = (await asyncio.to_thread(compute_isochrone, context))["search_radius"]
+    
     estimated_radius = max(estimated_radius, 100)  # Minimum 100m
     estimated_radius = min(estimated_radius, 5000)  # Maximum 5km
     
@@ -82,13 +150,15 @@ async def create_emergency(emergency: EmergencyCreate, db: AsyncSession = Depend
         patient_id=emergency.patient_id,
         last_known_location=emergency.last_known_location,
         search_radius=search_radius,
-        timeline=[{
-            "time": datetime.utcnow().isoformat(),
-            "event": f"Emergency activated. Estimated search radius: {int(estimated_radius)}m",
-            "type": "system"
-        }]
     )
     db.add(db_emergency)
+    await append_event(db, db_emergency.id,
+                       f"Emergency activated. Estimated search radius: {int(estimated_radius)}m",
+                       type="system")
+    await record_incident(db, emergency.patient_id)
+    
+    # Queue contact notifications in the same transaction (sent by the dispatcher)
+    db_emergency.responders_notified = await notify_emergency(db, db_emergency)
     
     # Update patient status to emergency
     result = await db.execute(select(Patient).where(Patient.id == emergency.patient_id))
@@ -126,14 +196,12 @@ async def resolve_emergency(
     emergency.status = resolution_type
     emergency.resolved_at = datetime.utcnow()
     
-    # Add to timeline
-    if not emergency.timeline:
-        emergency.timeline = []
-    emergency.timeline.append({
-        "time": datetime.utcnow().isoformat(),
-        "event": f"Emergency {resolution_type}",
-        "type": "system"
-    })
+    from search_area import invalidate_search
+    from isochrone import invalidate_isochrone
+    invalidate_search(emergency_id)
+    invalidate_isochrone(emergency_id)
+    
+    await append_event(db, emergency_id, f"Emergency {resolution_type}", type="system")
     
     # Update patient status
     patient_result = await db.execute(select(Patient).where(Patient.id == emergency.patient_id))
@@ -160,14 +228,7 @@ async def update_search_radius(
     
     emergency.search_radius = radius
     
-    # Add to timeline
-    if not emergency.timeline:
-        emergency.timeline = []
-    emergency.timeline.append({
-        "time": datetime.utcnow().isoformat(),
-        "event": f"Search radius updated to {radius}m",
-        "type": "update"
-    })
+    await append_event(db, emergency_id, f"Search radius updated to {radius}m", type="update")
     
     await db.commit()
     return {"message": "Search radius updated successfully"}
@@ -179,7 +240,10 @@ async def clear_all_emergencies(
 ):
     """Clear all emergencies or emergencies for a specific patient"""
     if patient_id:
-        # Delete emergencies for specific patient
+        # Delete emergencies (and their timelines) for specific patient
+        await db.execute(delete(EmergencyEvent).where(EmergencyEvent.emergency_id.in_(
+            select(Emergency.id).where(Emergency.patient_id == patient_id)
+        )))
         await db.execute(delete(Emergency).where(Emergency.patient_id == patient_id))
         
         # Reset patient status
@@ -189,6 +253,7 @@ async def clear_all_emergencies(
             patient.status = "safe"
     else:
         # Delete all emergencies
+        await db.execute(delete(EmergencyEvent))
         await db.execute(delete(Emergency))
         
         # Reset all patients' status
@@ -198,5 +263,44 @@ async def clear_all_emergencies(
             if patient.status == "emergency":
                 patient.status = "safe"
     
+    mark_reset(db, "emergencies")
     await db.commit()
     return {"message": "Emergencies cleared successfully"}
+
+@router.get("/{emergency_id}/timeline", response_model=List[TimelineEventResponse])
+async def get_timeline(
+    emergency_id: str,
+    response: Response,
+    since: str = None,
+    limit: int = Query(500, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get timeline events in time order. Pass the X-Next-Cursor header of the
+    previous response as `since` to receive only events added after it.
+    """
+    after = decode_cursor(since) if since else None
+    events = await get_events(db, emergency_id, after, limit)
+    
+    if events:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(events[-1].time, events[-1].id)
+    elif since:
+        response.headers[NEXT_CURSOR_HEADER] = since
+    return events
+
+@router.post("/{emergency_id}/timeline", response_model=TimelineEventResponse)
+async def add_timeline_event(
+    emergency_id: str,
+    event: TimelineEventCreate,
+    db: AsyncSession = Depends(get_db)
+):
+    """Append a responder update or sighting to the timeline"""
+    result = await db.execute(select(Emergency.id).where(Emergency.id == emergency_id))
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Emergency not found")
+    
+    row = await append_event(db, emergency_id, event.event, type=event.type,
+                             author=event.author, location=event.location)
+    await db.commit()
+    await db.refresh(row)
+    return row
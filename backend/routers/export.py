@@ -0,0 +1,59 @@
+from fastapi import APIRouter, Depends, HTTPException, Path, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from typing import Optional
+from database import get_db, Patient
+from datetime import datetime
+
+from export import stream_export, MEDIA_TYPES
+from pagination import naive_utc
+
+router = APIRouter()
+
+
+def _month_range(month: str):
+    try:
+        start = datetime.strptime(month, "%Y-%m")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="month must be YYYY-MM")
+    end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    return start, end
+
+
+@router.get("/{patient_id}/{kind}")
+async def export_patient_data(
+    patient_id: str,
+    kind: str = Path(..., pattern="^(locations|vitals|alerts)$"),
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    month: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    gzip: bool = False,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Stream a patient's locations, vitals or alerts as CSV or NDJSON.
+    Use `month=YYYY-MM` for a calendar month (UTC) or `since`/`until` for any range.
+    """
+    result = await db.execute(select(Patient.id).where(Patient.id == patient_id))
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Patient not found")
+
+    if month:
+        since, until = _month_range(month)
+    else:
+        since = naive_utc(since) if since else None
+        until = naive_utc(until) if until else None
+
+    filename = f"{patient_id}-{kind}-{month or 'all'}.{format}"
+    media_type = MEDIA_TYPES[format]
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+
+    return StreamingResponse(
+        stream_export(kind, patient_id, format, since, until, compress=gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
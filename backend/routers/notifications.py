@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, desc
+from database import get_db, Notification
+
+router = APIRouter()
+
+@router.get("/")
+async def get_notifications(
+    status: str = None,
+    patient_id: str = None,
+    limit: int = 100,
+    db: AsyncSession = Depends(get_db)
+):
+    """Get outbox deliveries, newest first"""
+    query = select(Notification).order_by(desc(Notification.id)).limit(min(limit, 1000))
+    if status:
+        query = query.where(Notification.status == status)
+    if patient_id:
+        query = query.where(Notification.patient_id == patient_id)
+    
+    result = await db.execute(query)
+    return result.scalars().all()
+
+@router.get("/stats")
+async def get_notification_stats():
+    """Get delivery counters and enqueue-to-delivery latency per channel"""
+    from notifications import get_stats
+    return get_stats()
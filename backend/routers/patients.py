@@ -1,26 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from typing import List
 from database import get_db, Patient
 from schemas import PatientCreate, PatientResponse
+from patient_serializer import serialize_patient, invalidate_patient, FastJSONResponse
+from change_tracker import not_modified, etag
 import uuid
 
 router = APIRouter()
 
-@router.get("/")
-async def get_patients(db: AsyncSession = Depends(get_db)):
-    """Get all patients"""
+@router.get("/", response_class=FastJSONResponse)
+async def get_patients(request: Request, db: AsyncSession = Depends(get_db)):
+    """Get all patients (ETag / If-None-Match supported)"""
     from database import Location
     from sqlalchemy import desc
     
+    cached = not_modified(request, "patients")
+    if cached:
+        return cached
+    tag = etag("patients")
+    
     result = await db.execute(select(Patient))
     patients = result.scalars().all()
     
     # Convert to frontend format and add current_position
     patient_list = []
     for p in patients:
-        patient_dict = PatientResponse.model_validate(p).dict()
+        patient_dict = serialize_patient(p)
         
         # Get latest location for this patient
         location_result = await db.execute(
@@ -39,9 +46,9 @@ async def get_patients(db: AsyncSession = Depends(get_db)):
         
         patient_list.append(patient_dict)
     
-    return patient_list
+    return FastJSONResponse(patient_list, headers={"ETag": tag})
 
-@router.get("/{patient_id}")
+@router.get("/{patient_id}", response_class=FastJSONResponse)
 async def get_patient(patient_id: str, db: AsyncSession = Depends(get_db)):
     """Get a specific patient by ID"""
     from database import Location
@@ -54,7 +61,7 @@ async def get_patient(patient_id: str, db: AsyncSession = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Patient not found")
     
     # Convert to frontend format
-    patient_dict = PatientResponse.model_validate(patient).dict()
+    patient_dict = serialize_patient(patient)
     
     # Get latest location
     location_result = await db.execute(
@@ -71,7 +78,7 @@ async def get_patient(patient_id: str, db: AsyncSession = Depends(get_db)):
             'lng': latest_location.longitude
         }
     
-    return patient_dict
+    return FastJSONResponse(patient_dict)
 
 @router.post("/", response_model=PatientResponse)
 async def create_patient(patient: PatientCreate, db: AsyncSession = Depends(get_db)):
@@ -103,6 +110,10 @@ async def update_patient(
     
     await db.commit()
     await db.refresh(db_patient)
+    
+    from notifications import invalidate_contacts
+    invalidate_contacts(patient_id)
+    invalidate_patient(patient_id)
     return db_patient
 
 @router.delete("/{patient_id}")
@@ -116,6 +127,7 @@ async def delete_patient(patient_id: str, db: AsyncSession = Depends(get_db)):
     
     await db.delete(db_patient)
     await db.commit()
+    invalidate_patient(patient_id)
     return {"message": "Patient deleted successfully"}
 
 @router.put("/{patient_id}/reset-status")
@@ -3,7 +3,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from typing import List
 from database import get_db, Report
-from schemas import ReportCreate, ReportResponse
+from schemas import ReportCreate, ReportResponse, ReportRequest, ReportJobResponse
 from datetime import datetime
 import uuid
 
@@ -16,6 +16,30 @@ async def get_reports(db: AsyncSession = Depends(get_db)):
     reports = result.scalars().all()
     return reports
 
+@router.post("/generate", response_model=ReportJobResponse, status_code=202)
+async def generate_report(request: ReportRequest):
+    """
+    Start a summary report job built from daily rollups.
+    Poll GET /jobs/{job_id}; the finished report is stored as a normal report.
+    """
+    from report_engine import submit_report
+    
+    if request.start_date > request.end_date:
+        raise HTTPException(status_code=400, detail="start_date must not be after end_date")
+    
+    return submit_report(request.start_date, request.end_date, request.patient_id,
+                         request.title, request.generated_by)
+
+@router.get("/jobs/{job_id}", response_model=ReportJobResponse)
+async def get_report_job(job_id: str):
+    """Get the status of a report job"""
+    from report_engine import get_job
+    
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    return job
+
 @router.get("/{report_id}", response_model=ReportResponse)
 async def get_report(report_id: str, db: AsyncSession = Depends(get_db)):
     """Get a specific report"""
@@ -50,4 +74,7 @@ async def delete_report(report_id: str, db: AsyncSession = Depends(get_db)):
     
     await db.delete(report)
     await db.commit()
+    
+    from report_engine import invalidate_reports
+    invalidate_reports(report_id=report_id)
     return {"message": "Report deleted successfully"}
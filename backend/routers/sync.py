@@ -0,0 +1,88 @@
+from fastapi import APIRouter, Depends, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
+from database import get_db, Patient, Alert, Emergency, Location
+from schemas import AlertResponse, EmergencyResponse
+
+from change_tracker import COLLECTIONS, changes_since, current_version, etag, not_modified
+from patient_serializer import serialize_patient, FastJSONResponse
+
+router = APIRouter()
+
+
+async def _latest_positions(db: AsyncSession, patient_ids) -> dict:
+    """Latest fix per patient in one grouped query."""
+    latest = (
+        select(Location.patient_id, func.max(Location.timestamp).label("timestamp"))
+        .group_by(Location.patient_id)
+    )
+    if patient_ids is not None:
+        latest = latest.where(Location.patient_id.in_(patient_ids))
+    latest = latest.subquery()
+    result = await db.execute(
+        select(Location.patient_id, Location.latitude, Location.longitude)
+        .join(latest, (Location.patient_id == latest.c.patient_id)
+              & (Location.timestamp == latest.c.timestamp))
+    )
+    return {row.patient_id: {"lat": row.latitude, "lng": row.longitude} for row in result.all()}
+
+
+async def _patients(db: AsyncSession, ids):
+    query = select(Patient)
+    if ids is not None:
+        query = query.where(Patient.id.in_(ids))
+    patients = (await db.execute(query)).scalars().all()
+    positions = await _latest_positions(db, ids)
+    payloads = []
+    for p in patients:
+        payload = serialize_patient(p)
+        if p.id in positions:
+            payload["current_position"] = positions[p.id]
+        payloads.append(payload)
+    return payloads
+
+
+async def _alerts(db: AsyncSession, ids):
+    # A full sync sends the open alerts; deltas include resolved ones so clients can drop them
+    query = select(Alert).where(Alert.resolved == False) if ids is None else select(Alert).where(Alert.id.in_(ids))
+    alerts = (await db.execute(query.order_by(Alert.timestamp.desc()))).scalars().all()
+    return [AlertResponse.model_validate(a).model_dump(mode="json") for a in alerts]
+
+
+async def _emergencies(db: AsyncSession, ids):
+    query = select(Emergency).where(Emergency.status == "active") if ids is None else select(Emergency).where(Emergency.id.in_(ids))
+    emergencies = (await db.execute(query)).scalars().all()
+    return [EmergencyResponse.model_validate(e).model_dump(mode="json") for e in emergencies]
+
+
+LOADERS = {"patients": _patients, "alerts": _alerts, "emergencies": _emergencies}
+
+
+@router.get("/")
+async def sync(request: Request, since_version: int = 0, db: AsyncSession = Depends(get_db)):
+    """
+    Changes to patients, alerts and emergencies since `since_version`.
+    Pass back the returned `version` on the next poll. A collection marked
+    in `full` is a complete snapshot (first sync, or the version is too old)
+    and replaces the client's copy. Supports ETag / If-None-Match (304).
+    """
+    cached = not_modified(request)
+    if cached:
+        return cached
+
+    # Read the version before the data: anything committed meanwhile is resent next time
+    version = current_version()
+    tag = etag()
+
+    body = {"version": version, "full": []}
+    for collection in COLLECTIONS:
+        changes = changes_since(collection, since_version)
+        if changes is None:
+            body["full"].append(collection)
+            changed, deleted = None, []
+        else:
+            changed, deleted = changes
+        body[collection] = await LOADERS[collection](db, changed) if changed is None or changed else []
+        body[f"deleted_{collection}"] = deleted
+
+    return FastJSONResponse(body, headers={"ETag": tag})
@@ -1,93 +1,280 @@
-from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, desc
-from typing import List
-from database import get_db, Location, Zone, Patient, Alert
-from schemas import LocationCreate, LocationResponse, ZoneCreate, ZoneResponse
-from datetime import datetime
+from typing import List, Optional
+from database import get_db, Location, LocationHistory, Zone, Patient, Alert, Device
+from schemas import (
+    LocationCreate, LocationResponse, LocationHistoryResponse, LocationBatchResponse,
+    ZoneCreate, ZoneResponse, DeviceCreate, DeviceResponse, DeviceRegistered, DeviceFix,
+)
+from pydantic import ValidationError
+from datetime import datetime, timedelta
+from types import SimpleNamespace
 import uuid
 import json
 
+from pagination import keyset_page, finish_page, naive_utc, NEXT_CURSOR_HEADER
+from compact import negotiate, columnar, compact_response, encode
+
 # Import algorithm modules
-from risk_engine import compute_risk_score
-from state_machine import transition_state, state_to_alert_level
-from baseline import get_baseline
-from anomaly import detect_anomaly
-from geo_utils import get_zone_status
-from config import DANGER_ZONE_PROXIMITY, ZONE_DEFAULTS
+from state_machine import state_to_alert_level
+from baseline import get_baseline, get_walk_histogram, record_walk
+from anomaly import get_trajectory_tracker
+from rollups import record_fix
+from alert_aggregator import raise_alert
+from config import (
+    ZONE_DEFAULTS,
+    TRAJECTORY_DEFAULT_HOURS,
+    TRAJECTORY_DEFAULT_TOLERANCE,
+    TRAJECTORY_MAX_POINTS,
+    DEVICE_WS_BATCH_SIZE,
+    DEVICE_WS_BATCH_INTERVAL,
+    DEVICE_WS_MAX_FIXES_PER_FRAME,
+    LOCATION_RETENTION_DAYS,
+)
 
 router = APIRouter()
 
+LOCATION_FIELDS = ["id", "timestamp", "latitude", "longitude", "accuracy", "speed", "heading"]
+
 # WebSocket connection manager for real-time tracking
 class ConnectionManager:
     def __init__(self):
         self.active_connections: List[WebSocket] = []
+        self.encodings: dict = {}  # websocket -> "json" or "msgpack"
 
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket, encoding: str = "json"):
         await websocket.accept()
         self.active_connections.append(websocket)
+        self.encodings[websocket] = encoding
 
     def disconnect(self, websocket: WebSocket):
         if websocket in self.active_connections:
             self.active_connections.remove(websocket)
+        self.encodings.pop(websocket, None)
 
     async def broadcast(self, message: dict):
+        # Encode once per wire format, not once per connection
+        frames = {}
         for connection in self.active_connections:
+            encoding = self.encodings.get(connection, "json")
             try:
-                await connection.send_json(message)
+                if encoding == "msgpack":
+                    if encoding not in frames:
+                        frames[encoding] = encode(message, "msgpack")
+                    await connection.send_bytes(frames[encoding])
+                else:
+                    await connection.send_json(message)
             except:
                 pass
 
 manager = ConnectionManager()
 
 @router.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    """WebSocket endpoint for real-time location updates"""
-    await manager.connect(websocket)
+async def websocket_endpoint(websocket: WebSocket, encoding: str = None):
+    """
+    WebSocket endpoint for real-time location updates.
+    Send updates as MessagePack binary frames with ?encoding=msgpack (or an
+    Accept: application/msgpack handshake header) when msgpack is installed.
+    """
+    fmt = negotiate(f"application/{encoding}" if encoding else websocket.headers.get("accept"))
+    await manager.connect(websocket, "msgpack" if fmt == "msgpack" else "json")
     try:
         while True:
-            data = await websocket.receive_text()
-            await manager.broadcast({"type": "location_update", "data": data})
+            # Receive-only for dashboards; trackers use /devices/ws
+            await websocket.receive_text()
     except WebSocketDisconnect:
         manager.disconnect(websocket)
 
 @router.get("/locations/{patient_id}", response_model=List[LocationResponse])
 async def get_patient_locations(
     patient_id: str,
+    request: Request,
+    response: Response,
     limit: int = 100,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_db)
 ):
-    """Get location history for a patient"""
-    result = await db.execute(
-        select(Location)
-        .where(Location.patient_id == patient_id)
-        .order_by(desc(Location.timestamp))
-        .limit(limit)
-    )
-    locations = result.scalars().all()
-    return locations
+    """
+    Get location history for a patient, newest first (next page cursor in X-Next-Cursor).
+    Accept: application/vnd.safewander.columnar+json or application/msgpack
+    returns column arrays instead of one object per fix.
+    """
+    query = select(Location).where(Location.patient_id == patient_id)
+    result = await db.execute(keyset_page(query, Location, limit, cursor, since, until))
+    rows = finish_page(result.scalars().all(), limit, response)
+    
+    fmt = negotiate(request.headers.get("accept"))
+    if fmt == "json":
+        response.headers["Vary"] = "Accept"
+        return rows
+    cursor_header = {NEXT_CURSOR_HEADER: response.headers[NEXT_CURSOR_HEADER]} \
+        if NEXT_CURSOR_HEADER in response.headers else {}
+    return compact_response(columnar(rows, LOCATION_FIELDS, patient_id=patient_id), fmt, cursor_header)
 
-@router.post("/locations", response_model=LocationResponse)
-async def create_location(location: LocationCreate, db: AsyncSession = Depends(get_db)):
+@router.get("/history/{patient_id}", response_model=List[LocationHistoryResponse])
+async def get_patient_history(
+    patient_id: str,
+    response: Response,
+    limit: int = 1000,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Get compacted (per-minute) location history older than the retention window"""
+    query = select(LocationHistory).where(LocationHistory.patient_id == patient_id)
+    result = await db.execute(keyset_page(query, LocationHistory, limit, cursor, since, until))
+    return finish_page(result.scalars().all(), limit, response)
+
+@router.get("/trajectory/{patient_id}")
+async def get_patient_trajectory(
+    patient_id: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    tolerance: float = Query(TRAJECTORY_DEFAULT_TOLERANCE, ge=0),
+    max_points: Optional[int] = Query(None, ge=2, le=TRAJECTORY_MAX_POINTS),
+    format: str = Query("json", pattern="^(json|geojson|polyline)$"),
+    db: AsyncSession = Depends(get_db)
+):
     """
-    Record a new location for a patient.
-    Integrates: risk scoring, FSM state transitions, anomaly detection.
+    Get a patient's path for a time range, simplified for map rendering.
+    Defaults to the last TRAJECTORY_DEFAULT_HOURS hours; output is capped at
+    TRAJECTORY_MAX_POINTS points even when the tolerance would keep more.
+    """
+    from trajectory import get_trajectory
+    
+    until = naive_utc(until) if until else datetime.utcnow()
+    since = naive_utc(since) if since else until - timedelta(hours=TRAJECTORY_DEFAULT_HOURS)
+    if since >= until:
+        raise HTTPException(status_code=400, detail="since must be before until")
+    
+    return await get_trajectory(db, patient_id, since, until, tolerance,
+                                max_points or TRAJECTORY_MAX_POINTS, format)
+
+@router.get("/retention")
+async def get_retention_stats():
+    """Get location retention / compaction metrics"""
+    from retention import retention_stats
+    return retention_stats
+
+@router.get("/ingest")
+async def get_ingest_stats():
+    """Get duplicate suppression and event-time (lateness) metrics since startup"""
+    from ingest_dedup import dedup_stats
+    from event_time import event_time_metrics
+    return {"dedup": dedup_stats, "event_time": event_time_metrics()}
+
+@router.post("/retention/run")
+async def run_retention(retention_days: float = Query(LOCATION_RETENTION_DAYS, ge=1)):
+    """Run a location compaction pass now (keeps at least one day at full resolution)"""
+    from retention import run_retention_pass
+    
+    return await run_retention_pass(retention_days)
+
+async def _ingest_fix(db: AsyncSession, location: LocationCreate, timestamp: datetime = None,
+                      device_id: int = None, seq: int = None):
     """
-    db_location = Location(**location.model_dump())
+    Run one fix through the ingest pipeline: store it, then risk scoring,
+    FSM state transitions and anomaly detection. Does not commit.
+    
+    Args:
+        location: The fix (any object with LocationCreate's position attributes)
+        timestamp: Device fix time; defaults to receipt time
+        device_id, seq: Dedup key, stored with the row
+    
+    Returns:
+        (Location row, location_update message to broadcast after commit or None)
+    """
+    db_location = Location(
+        patient_id=location.patient_id,
+        latitude=location.latitude,
+        longitude=location.longitude,
+        accuracy=location.accuracy,
+        speed=location.speed,
+        heading=location.heading,
+        device_id=device_id,
+        seq=seq,
+    )
+    if timestamp is not None:
+        db_location.timestamp = timestamp
     db.add(db_location)
     
+    return db_location, await _evaluate_fix(db, location, timestamp)
+
+def _location_message(patient_id: str, lat: float, lng: float, event_time: datetime, evaluation: dict) -> dict:
+    """WebSocket location_update payload with enhanced data"""
+    return {
+        "type": "location_update",
+        "patient_id": patient_id,
+        "location": {
+            "lat": lat,
+            "lng": lng,
+            "timestamp": event_time.isoformat()
+        },
+        "risk_score": evaluation["risk_score"],
+        "wandering_score": evaluation["wandering_score"],
+        "fsm_state": evaluation["new_state"],
+        "zone_status": evaluation["zone_status"]["current_zone_name"]
+    }
+
+async def _raise_state_alert(db: AsyncSession, patient_id: str, lat: float, lng: float,
+                             event_time: datetime, evaluation: dict):
+    # Create alert for state change (repeats within the dedup window are coalesced)
+    if evaluation["alert_message"]:
+        new_state = evaluation["new_state"]
+        await raise_alert(
+            db,
+            patient_id=patient_id,
+            type="geofence",
+            level=state_to_alert_level(new_state),
+            message=evaluation["alert_message"],
+            description=f"State changed to {new_state.upper()}. Risk score: {evaluation['risk_score']}",
+            location={"lat": lat, "lng": lng},
+            timestamp=event_time,
+        )
+
+def _transition(evaluation: dict):
+    """(previous, new) FSM state when the evaluation raised an alert, else None."""
+    if evaluation["alert_message"]:
+        return evaluation["previous_state"], evaluation["new_state"]
+    return None
+
+async def _evaluate_fix(db: AsyncSession, location, timestamp: datetime = None):
+    """
+    Risk scoring, FSM state transitions and anomaly detection for a stored
+    fix, in event time. Fixes older than the patient's newest evaluated fix
+    replay the recent window (see event_time); much older ones are not
+    evaluated.
+    
+    A replay recomputes the FSM state and raises alerts only for transitions
+    the original pass did not raise. It does not retract alerts whose
+    transition the late fix made obsolete, nor replay the trajectory
+    tracker, daily rollups or walk learning, which keep arrival order.
+    
+    Returns:
+        location_update message to broadcast after commit, or None
+    """
+    from event_time import get_clock, observe, event_time_stats
+    from risk_pipeline import evaluate_fix, snapshot, restore
+    
+    received = datetime.utcnow()
+    event_time = min(timestamp, received) if timestamp else received  # no clocks ahead of ours
+    
     # Get patient
     result = await db.execute(select(Patient).where(Patient.id == location.patient_id))
     patient = result.scalar_one_or_none()
     
     if not patient:
-        await db.commit()
-        await db.refresh(db_location)
-        return db_location
+        return None
     
-    # Update patient's last seen and location
-    patient.last_seen = datetime.utcnow()
-    patient.location = f"{location.latitude},{location.longitude}"
+    clock = get_clock(patient.id)
+    kind = clock.classify(event_time)
+    observe(kind, clock.watermark, event_time, received)
+    if kind == "too_late":
+        return None
     
     # Get patient zones
     zone_result = await db.execute(
@@ -107,99 +294,279 @@ async def create_location(location: LocationCreate, db: AsyncSession = Depends(g
         for z in zones
     ]
     
-    # Calculate time outside safe zone
-    time_outside_safe = 0
-    if patient.last_safe_zone_exit:
-        time_outside_safe = int((datetime.utcnow() - patient.last_safe_zone_exit).total_seconds())
-    
-    # Get baseline and check for anomaly
     baseline = await get_baseline(db, location.patient_id)
-    current_speed = location.speed or 0.8
-    has_anomaly = detect_anomaly(current_speed, time_outside_safe, baseline)
-    
-    # Check zone status
-    zone_status = get_zone_status(location.latitude, location.longitude, zones_data)
-    near_danger = zone_status["nearest_danger_dist"] < DANGER_ZONE_PROXIMITY
-    
-    # Compute risk score
-    risk_score = compute_risk_score(
-        lat=location.latitude,
-        lon=location.longitude,
-        zones=zones_data,
-        gps_signal="good",
-        time_outside_safe=time_outside_safe,
-        no_response_time=0,
-        current_hour=datetime.now().hour,
-        has_anomaly=has_anomaly
-    )
+    # Usual walk time lookup (cached histogram, O(1))
+    walk_histogram = await get_walk_histogram(db, location.patient_id, baseline["updated_at"])
     
-    # FSM state transition
-    current_state = patient.fsm_state or "safe"
-    state_entered_at = patient.state_entered_at or datetime.utcnow()
-    
-    new_state, alert_message = transition_state(
-        current_state=current_state,
-        risk_score=risk_score,
-        state_entered_at=state_entered_at,
-        near_danger=near_danger
-    )
-    
-    # Update patient with new risk data
-    patient.risk_score = risk_score
+    entry = {
+        "time": event_time,
+        "lat": location.latitude,
+        "lon": location.longitude,
+        "speed": location.speed,
+        "heading": location.heading,
+    }
     
-    if new_state != current_state:
-        patient.fsm_state = new_state
-        patient.state_entered_at = datetime.utcnow()
+    if kind == "in_order":
+        # Update patient's last seen and location
+        if not patient.last_seen or event_time > patient.last_seen:
+            patient.last_seen = event_time
+        patient.location = f"{location.latitude},{location.longitude}"
         
-        # Update legacy status for backward compatibility
-        if new_state == "emergency":
-            patient.status = "emergency"
-        elif new_state in ["urgent", "warning"]:
-            patient.status = "warning"
-        else:
-            patient.status = "safe"
+        entry["before"] = snapshot(patient)
+        # Streaming trajectory features (O(1) per fix) only advance in order
+        evaluation = evaluate_fix(
+            patient, location.latitude, location.longitude, event_time, zones_data, baseline,
+            walk_histogram, location.speed, location.heading,
+            tracker=get_trajectory_tracker(location.patient_id),
+        )
+        entry["wandering_score"] = evaluation["wandering_score"]
+        entry["transition"] = _transition(evaluation)
+        clock.record(entry)
+        
+        await _raise_state_alert(db, location.patient_id, location.latitude, location.longitude,
+                                 event_time, evaluation)
+        
+        # Daily rollups: time in state / outside safe zone since the previous fix
+        await record_fix(db, location.patient_id, event_time,
+                         not evaluation["zone_status"]["in_safe"], evaluation["new_state"])
         
-        # Create alert for state change
-        if alert_message:
-            alert_level = state_to_alert_level(new_state)
-            db_alert = Alert(
-                id=str(uuid.uuid4()),
-                patient_id=location.patient_id,
-                type="geofence",
-                level=alert_level,
-                message=alert_message,
-                description=f"State changed to {new_state.upper()}. Risk score: {risk_score}",
-                location={"lat": location.latitude, "lng": location.longitude},
-                timestamp=datetime.utcnow()
-            )
-            db.add(db_alert)
-            patient.active_alerts = (patient.active_alerts or 0) + 1
-    
-    # Track safe zone exit/entry
-    if not zone_status["in_safe"] and not patient.last_safe_zone_exit:
-        patient.last_safe_zone_exit = datetime.utcnow()
-    elif zone_status["in_safe"]:
-        patient.last_safe_zone_exit = None
+        if evaluation["trip_started_at"]:
+            # Trip completed - learn when this patient usually walks
+            await record_walk(db, location.patient_id, evaluation["trip_started_at"])
+        
+        return _location_message(location.patient_id, location.latitude, location.longitude,
+                                 event_time, evaluation)
+    
+    # Late fix: rewind to the state before the first later fix and re-evaluate in event-time order
+    replay = clock.insert_late(entry)
+    restore(patient, replay[1]["before"])
+    entry["wandering_score"] = replay[1]["wandering_score"]
+    # Transitions already alerted in this window; matches (even at a
+    # different fix) are not raised again
+    raised = [fix["transition"] for fix in replay[1:] if fix.get("transition")]
+    for fix in replay:
+        fix["before"] = snapshot(patient)
+        evaluation = evaluate_fix(
+            patient, fix["lat"], fix["lon"], fix["time"], zones_data, baseline,
+            walk_histogram, fix["speed"], fix["heading"], wandering_score=fix["wandering_score"],
+        )
+        fix["transition"] = _transition(evaluation)
+        if fix["transition"] in raised:
+            raised.remove(fix["transition"])
+        elif fix["transition"]:
+            await _raise_state_alert(db, location.patient_id, fix["lat"], fix["lon"], fix["time"], evaluation)
+    event_time_stats["reevaluated"] += len(replay)
+    
+    newest = replay[-1]
+    return _location_message(location.patient_id, newest["lat"], newest["lon"], newest["time"], evaluation)
+
+async def _store_fix(db: AsyncSession, location, timestamp: datetime = None,
+                     device_id: int = None, seq: int = None):
+    """
+    Deduplicate a fix by (patient, device, seq), then ingest it. Fixes with
+    a seq below the device's newest one are stored with a conflict-ignoring
+    insert and evaluated in event time when they carry a device timestamp.
+    Does not commit.
+    
+    Returns:
+        (status "new" / "late" / "duplicate", Location row for new fixes,
+         location_update message or None)
+    """
+    from ingest_dedup import admit, insert_late, source_key
+    
+    if seq is None:
+        db_location, message = await _ingest_fix(db, location, timestamp)
+        return "new", db_location, message
+    
+    _, device_id = source_key(location.patient_id, device_id)
+    status = await admit(db, location.patient_id, device_id, seq)
+    if status == "new":
+        db_location, message = await _ingest_fix(db, location, timestamp, device_id, seq)
+        return status, db_location, message
+    
+    if status == "late":
+        stored = await insert_late(db, {
+            "patient_id": location.patient_id,
+            "latitude": location.latitude,
+            "longitude": location.longitude,
+            "accuracy": location.accuracy,
+            "speed": location.speed,
+            "heading": location.heading,
+            "timestamp": timestamp or datetime.utcnow(),
+            "device_id": device_id,
+            "seq": seq,
+        })
+        if not stored:
+            return "duplicate", None, None
+        if timestamp is not None:
+            # Placed in event time: may replay the recent window
+            return status, None, await _evaluate_fix(db, location, timestamp)
+    return status, None, None
+
+async def _ingest_batch(db: AsyncSession, fixes):
+    """
+    Run device fixes through the ingest pipeline. Does not commit.
+    
+    Args:
+        fixes: (Device, fix dict with LocationCreate fields minus patient_id,
+            plus timestamp and optional seq) pairs in device-time order;
+            without seq the fix timestamp is the dedup key
+    
+    Returns:
+        ({"new", "late", "duplicate"} counts, newest location_update message per patient)
+    """
+    from ingest_dedup import timestamp_seq
+    
+    counts = {"new": 0, "late": 0, "duplicate": 0}
+    latest = {}
+    now = datetime.utcnow()
+    for device, fix in fixes:
+        fix = dict(fix)
+        timestamp = fix.pop("timestamp", None)
+        seq = fix.pop("seq", None)
+        if seq is None and timestamp is not None:
+            seq = timestamp_seq(timestamp)
+        status, _, message = await _store_fix(
+            db, SimpleNamespace(patient_id=device.patient_id, **fix), timestamp, device.id, seq
+        )
+        device.last_seen_at = now
+        counts[status] += 1
+        if message:
+            latest[device.patient_id] = message
+    return counts, latest
+
+@router.post("/locations", response_model=LocationResponse)
+async def create_location(location: LocationCreate, db: AsyncSession = Depends(get_db)):
+    """
+    Record a new location for a patient.
+    Integrates: risk scoring, FSM state transitions, anomaly detection.
+    Retries carrying the same `seq` (or device `timestamp`) are stored once
+    and return the stored fix. Fixes older than the newest one from the
+    same device are stored and, when they carry a `timestamp` within
+    LATE_REPLAY_WINDOW, re-evaluated in event time (which may change the
+    patient's state); older ones are kept as history only.
+    """
+    from ingest_dedup import timestamp_seq
+    
+    timestamp = naive_utc(location.timestamp) if location.timestamp else None
+    seq = location.seq
+    if seq is None and timestamp is not None:
+        seq = timestamp_seq(timestamp)
+    
+    status, db_location, message = await _store_fix(db, location, timestamp, location.device_id, seq)
     
     await db.commit()
-    await db.refresh(db_location)
+    # Late fixes can change the state through a replay, so broadcast first
+    if message:
+        await manager.broadcast(message)
     
-    # Broadcast to WebSocket clients with enhanced data
-    await manager.broadcast({
-        "type": "location_update",
-        "patient_id": location.patient_id,
-        "location": {
-            "lat": location.latitude,
-            "lng": location.longitude,
-            "timestamp": datetime.utcnow().isoformat()
-        },
-        "risk_score": risk_score,
-        "fsm_state": new_state,
-        "zone_status": zone_status["current_zone_name"]
-    })
+    if db_location is None:
+        result = await db.execute(
+            select(Location)
+            .where(Location.patient_id == location.patient_id)
+            .where(Location.device_id == (location.device_id or 0))
+            .where(Location.seq == seq)
+        )
+        return result.scalar_one()
+    await db.refresh(db_location)
     
     return db_location
 
+@router.post("/locations/binary", response_model=LocationBatchResponse)
+async def create_locations_binary(request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Record a batch of fixes sent as packed binary records
+    (Content-Type: application/vnd.safewander.fix, format in binary_fixes.py).
+    Fixes run through the same pipeline as POST /locations in device-time
+    order and are committed together; only each patient's newest fix is
+    broadcast.
+    """
+    from binary_fixes import decode_fixes, iter_fixes, FixFormatError
+    
+    try:
+        columns = decode_fixes(await request.body())
+    except FixFormatError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid fix payload: {e}")
+    
+    received = len(columns["valid"])
+    device_ids = {int(d) for d in set(columns["device_id"][columns["valid"]].tolist())}
+    result = await db.execute(select(Device).where(Device.id.in_(device_ids)))
+    devices = {d.id: d for d in result.scalars().all()}
+    
+    fixes = [(devices[fix.pop("device_id")], fix) for fix in iter_fixes(columns)
+             if fix["device_id"] in devices]
+    counts, latest = await _ingest_batch(db, fixes)
+    
+    await db.commit()
+    
+    for message in latest.values():
+        await manager.broadcast(message)
+    
+    return {
+        "received": received,
+        "accepted": counts["new"] + counts["late"],
+        "late": counts["late"],
+        "duplicates": counts["duplicate"],
+        "rejected": received - len(fixes),
+    }
+
+@router.get("/devices", response_model=List[DeviceResponse])
+async def get_devices(patient_id: str = None, db: AsyncSession = Depends(get_db)):
+    """Get registered trackers, optionally for one patient"""
+    query = select(Device)
+    if patient_id:
+        query = query.where(Device.patient_id == patient_id)
+    result = await db.execute(query.order_by(Device.id))
+    return result.scalars().all()
+
+@router.post("/devices", response_model=DeviceRegistered)
+async def register_device(device: DeviceCreate, db: AsyncSession = Depends(get_db)):
+    """
+    Register a tracker; its id is the device_id in binary fix records.
+    The returned token authenticates /devices/ws and is not shown again.
+    """
+    from device_auth import issue_token
+    
+    result = await db.execute(select(Patient.id).where(Patient.id == device.patient_id))
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Patient not found")
+    
+    db_device = Device(**device.model_dump())
+    token = issue_token(db_device)
+    db.add(db_device)
+    await db.commit()
+    await db.refresh(db_device)
+    return DeviceRegistered(**DeviceResponse.model_validate(db_device).model_dump(), token=token)
+
+@router.post("/devices/{device_id}/token", response_model=DeviceRegistered)
+async def rotate_device_token(device_id: int, db: AsyncSession = Depends(get_db)):
+    """Issue a new channel token for a tracker; the old one stops working"""
+    from device_auth import issue_token
+    
+    result = await db.execute(select(Device).where(Device.id == device_id))
+    device = result.scalar_one_or_none()
+    
+    if not device:
+        raise HTTPException(status_code=404, detail="Device not found")
+    
+    token = issue_token(device)
+    await db.commit()
+    await db.refresh(device)
+    return DeviceRegistered(**DeviceResponse.model_validate(device).model_dump(), token=token)
+
+@router.delete("/devices/{device_id}")
+async def delete_device(device_id: int, db: AsyncSession = Depends(get_db)):
+    """Unregister a tracker; its uploads are rejected afterwards"""
+    result = await db.execute(select(Device).where(Device.id == device_id))
+    device = result.scalar_one_or_none()
+    
+    if not device:
+        raise HTTPException(status_code=404, detail="Device not found")
+    
+    await db.delete(device)
+    await db.commit()
+    return {"message": "Device deleted successfully"}
+
 @router.get("/zones", response_model=List[ZoneResponse])
 async def get_zones(patient_id: str = None, db: AsyncSession = Depends(get_db)):
     """Get all zones or zones for a specific patient"""
@@ -276,6 +643,148 @@ async def delete_zone(zone_id: str, db: AsyncSession = Depends(get_db)):
     await db.commit()
     return {"message": "Zone deleted successfully"}
 
+def _parse_text_frame(data: str):
+    """
+    Fixes in a JSON frame: one fix object, a list, or {"fixes": [...]}.
+    
+    Returns:
+        (seq, validated fix dict or None) pairs; None marks a rejected fix
+    """
+    payload = json.loads(data)
+    if isinstance(payload, dict) and "fixes" in payload:
+        payload = payload["fixes"]
+    if isinstance(payload, dict):
+        payload = [payload]
+    if not isinstance(payload, list):
+        raise ValueError("expected a fix object or a list of fixes")
+    if len(payload) > DEVICE_WS_MAX_FIXES_PER_FRAME:
+        raise ValueError(f"more than {DEVICE_WS_MAX_FIXES_PER_FRAME} fixes in one frame")
+    
+    fixes = []
+    for item in payload:
+        try:
+            fix = DeviceFix.model_validate(item)
+        except ValidationError:
+            seq = item.get("seq") if isinstance(item, dict) else None
+            if isinstance(seq, int):
+                fixes.append((seq, None))
+            continue
+        values = fix.model_dump()
+        values["timestamp"] = naive_utc(fix.timestamp) if fix.timestamp else None
+        fixes.append((fix.seq, values))
+    return fixes
+
+def _parse_binary_frame(data: bytes, device_id: int):
+    """(seq, fix) pairs for a binary frame; records for other devices are rejected."""
+    from binary_fixes import decode_frame, iter_fixes
+    
+    seq, columns = decode_frame(data)
+    if len(columns["valid"]) > DEVICE_WS_MAX_FIXES_PER_FRAME:
+        raise ValueError(f"more than {DEVICE_WS_MAX_FIXES_PER_FRAME} fixes in one frame")
+    fixes = [(seq, fix) for fix in iter_fixes(columns) if fix.pop("device_id") == device_id]
+    fixes += [(seq, None)] * (len(columns["valid"]) - len(fixes))
+    return fixes
+
+@router.websocket("/devices/ws")
+async def device_channel(websocket: WebSocket, device_id: int = None, token: str = None):
+    """
+    Long-lived ingest channel for one tracker.
+    Authenticate with ?device_id=&token= (or X-Device-Id and
+    Authorization: Bearer headers). Each frame carries fixes with sequence
+    numbers: JSON text ({"seq", "latitude", "longitude", ...}, a list, or
+    {"fixes": [...]}) or a binary frame (binary_fixes.decode_frame).
+    Fixes are committed in batches of up to DEVICE_WS_BATCH_SIZE (or after
+    DEVICE_WS_BATCH_INTERVAL seconds) and acknowledged with
+    {"type": "ack", "seq": highest committed seq, "accepted", "duplicates",
+    "rejected": [seqs]}; the device can drop everything up to `seq`.
+    Uncommitted fixes are discarded on disconnect, so unacked fixes should be
+    resent; resends are deduplicated by seq (binary records by their epoch).
+    """
+    import asyncio
+    from database import async_session_maker
+    from device_auth import authenticate_device
+    
+    if device_id is None:
+        device_id = websocket.headers.get("x-device-id")
+    if token is None:
+        scheme, _, credentials = websocket.headers.get("authorization", "").partition(" ")
+        token = credentials if scheme.lower() == "bearer" else None
+    
+    async with async_session_maker() as db:
+        device = await authenticate_device(db, device_id, token)
+    if device is None:
+        await websocket.close(code=1008)  # policy violation
+        return
+    device_id = device.id
+    await websocket.accept()
+    
+    frames = asyncio.Queue()
+    
+    async def read_frames():
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                frames.put_nowait(message)
+        finally:
+            frames.put_nowait(None)
+    
+    async def flush(pending):
+        async with async_session_maker() as db:
+            result = await db.execute(select(Device).where(Device.id == device_id))
+            current = result.scalar_one_or_none()
+            if current is None:
+                return False  # unregistered while connected
+            counts, latest = await _ingest_batch(db, [(current, fix) for _, fix in pending if fix is not None])
+            await db.commit()
+        for message in latest.values():
+            await manager.broadcast(message)
+        await websocket.send_json({
+            "type": "ack",
+            "seq": max(seq for seq, _ in pending),
+            "accepted": counts["new"] + counts["late"],
+            "duplicates": counts["duplicate"],
+            "rejected": sorted({seq for seq, fix in pending if fix is None}),
+        })
+        return True
+    
+    loop = asyncio.get_running_loop()
+    reader = asyncio.create_task(read_frames())
+    pending = []
+    deadline = None
+    try:
+        while True:
+            timeout = None if deadline is None else max(deadline - loop.time(), 0)
+            try:
+                message = await asyncio.wait_for(frames.get(), timeout)
+            except asyncio.TimeoutError:
+                message = False  # batch interval elapsed
+            
+            if message is None:
+                break  # disconnected; unacked fixes will be resent
+            if message:
+                try:
+                    if message.get("bytes") is not None:
+                        pending += _parse_binary_frame(message["bytes"], device_id)
+                    else:
+                        pending += _parse_text_frame(message.get("text") or "")
+                except ValueError as e:  # also FixFormatError, JSONDecodeError
+                    await websocket.send_json({"type": "error", "detail": str(e)})
+                    continue
+                if pending and deadline is None:
+                    deadline = loop.time() + DEVICE_WS_BATCH_INTERVAL
+            
+            if pending and (message is False or len(pending) >= DEVICE_WS_BATCH_SIZE):
+                if not await flush(pending):
+                    await websocket.close(code=1008)
+                    break
+                pending, deadline = [], None
+    except WebSocketDisconnect:
+        pass
+    finally:
+        reader.cancel()
+
 @router.get("/risk/{patient_id}")
 async def get_patient_risk(patient_id: str, db: AsyncSession = Depends(get_db)):
     """Get current risk score and FSM state for a patient"""
@@ -290,5 +799,6 @@ async def get_patient_risk(patient_id: str, db: AsyncSession = Depends(get_db)):
         "risk_score": patient.risk_score or 0,
         "fsm_state": patient.fsm_state or "safe",
         "state_entered_at": patient.state_entered_at.isoformat() if patient.state_entered_at else None,
-        "last_safe_zone_exit": patient.last_safe_zone_exit.isoformat() if patient.last_safe_zone_exit else None
+        "last_safe_zone_exit": patient.last_safe_zone_exit.isoformat() if patient.last_safe_zone_exit else None,
+        "trajectory": get_trajectory_tracker(patient_id).features()
     }
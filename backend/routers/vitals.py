@@ -0,0 +1,125 @@
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, desc
+from typing import List, Optional
+from database import get_db, Vital, Patient
+from schemas import VitalBatch, VitalBatchResponse, VitalResponse
+from datetime import datetime, timezone
+
+from pagination import keyset_page, finish_page
+from alert_aggregator import raise_alert
+
+# Import algorithm modules
+from vitals_monitor import get_patient_vitals, describe_anomaly, vital_row, METRICS
+
+router = APIRouter()
+
+
+def _to_utc(timestamp: datetime) -> datetime:
+    """Normalize device timestamps to naive UTC like the rest of the database."""
+    if timestamp is None:
+        return datetime.utcnow()
+    if timestamp.tzinfo is not None:
+        return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+@router.post("/batch", response_model=VitalBatchResponse)
+async def ingest_vitals(batch: VitalBatch, db: AsyncSession = Depends(get_db)):
+    """
+    Ingest a batch of wearable readings.
+    Readings update in-memory rolling statistics; only downsampled averages
+    (one row per VITALS_STORAGE_INTERVAL) and anomalous readings are stored.
+    """
+    readings = sorted(
+        ((r, _to_utc(r.timestamp)) for r in batch.readings),
+        key=lambda item: item[1]
+    )
+
+    patient_ids = {r.patient_id for r, _ in readings}
+    result = await db.execute(select(Patient).where(Patient.id.in_(patient_ids)))
+    patients = {p.id: p for p in result.scalars().all()}
+
+    stored = 0
+    alert_ids = []
+    broadcasts = []
+
+    for reading, timestamp in readings:
+        patient = patients.get(reading.patient_id)
+        if not patient:
+            continue
+
+        values = {metric: getattr(reading, metric) for metric in METRICS}
+        state = get_patient_vitals(reading.patient_id)
+        anomalies = state.evaluate(values, timestamp)
+
+        closed = state.downsample(values, timestamp)
+        if closed:
+            db.add(vital_row(reading.patient_id, closed[1], closed[0]))
+            stored += 1
+
+        if anomalies:
+            # Keep anomalous readings at full resolution
+            db.add(vital_row(reading.patient_id, values, timestamp))
+            stored += 1
+
+        # Per-metric cooldown (vitals_monitor) has already thinned repeats
+        for anomaly in anomalies:
+            message = describe_anomaly(anomaly)
+            db_alert = await raise_alert(
+                db,
+                patient_id=reading.patient_id,
+                type="vitals",
+                level=anomaly["level"],
+                message=message,
+                description=f"Vitals anomaly ({anomaly['reason']})",
+                timestamp=timestamp,
+                extra_data={"metric": anomaly["metric"], "value": anomaly["value"]},
+            )
+            if db_alert is None:
+                continue  # coalesced into an open alert
+            alert_ids.append(db_alert.id)
+            broadcasts.append({
+                "type": "vitals_alert",
+                "patient_id": reading.patient_id,
+                "alert_id": db_alert.id,
+                "level": anomaly["level"],
+                "metric": anomaly["metric"],
+                "value": anomaly["value"],
+                "message": message,
+            })
+
+    await db.commit()
+
+    # Same real-time channel as geofence updates
+    if broadcasts:
+        from routers.tracking import manager
+        for message in broadcasts:
+            await manager.broadcast(message)
+
+    return {"accepted": len(readings), "stored": stored, "alerts": alert_ids}
+
+
+@router.get("/{patient_id}", response_model=List[VitalResponse])
+async def get_patient_vitals_history(
+    patient_id: str,
+    response: Response,
+    limit: int = 100,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Get stored (downsampled) vitals history for a patient, newest first"""
+    query = select(Vital).where(Vital.patient_id == patient_id)
+    result = await db.execute(keyset_page(query, Vital, limit, cursor, since, until))
+    return finish_page(result.scalars().all(), limit, response)
+
+
+@router.get("/{patient_id}/stats")
+async def get_patient_vitals_stats(patient_id: str):
+    """Get current rolling statistics for a patient's vitals"""
+    stats = get_patient_vitals(patient_id).stats()
+    if not stats:
+        raise HTTPException(status_code=404, detail="No recent vitals for this patient")
+    return {"patient_id": patient_id, "metrics": stats}
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional, List, Dict, Any
 from enum import Enum
 
@@ -155,6 +155,9 @@ class LocationCreate(BaseModel):
     accuracy: Optional[float] = None
     speed: Optional[float] = None
     heading: Optional[float] = None
+    device_id: Optional[int] = None
+    seq: Optional[int] = Field(None, ge=0)  # Retries with the same seq are stored once
+    timestamp: Optional[datetime] = None  # device time; also the dedup key without seq
 
 class LocationResponse(LocationCreate):
     id: int
@@ -163,6 +166,50 @@ class LocationResponse(LocationCreate):
     class Config:
         from_attributes = True
 
+class LocationBatchResponse(BaseModel):
+    received: int
+    accepted: int  # Stored (including late fixes)
+    late: int = 0  # Older than the device's newest fix: stored as history only
+    duplicates: int = 0  # Already received (retried upload)
+    rejected: int  # Out-of-range records or unknown devices
+
+# Device schemas
+class DeviceCreate(BaseModel):
+    patient_id: str
+    name: Optional[str] = None
+
+class DeviceResponse(DeviceCreate):
+    id: int
+    created_at: datetime
+    last_seen_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class DeviceRegistered(DeviceResponse):
+    token: str  # Shown once; authenticates the device WebSocket channel
+
+class DeviceFix(BaseModel):
+    seq: int = Field(..., ge=0)  # Device sequence number, echoed in acks
+    latitude: float = Field(..., ge=-90, le=90)
+    longitude: float = Field(..., ge=-180, le=180)
+    accuracy: Optional[float] = Field(None, ge=0)
+    speed: Optional[float] = Field(None, ge=0)
+    heading: Optional[float] = Field(None, ge=0, lt=360)
+    timestamp: Optional[datetime] = None  # device time, defaults to receipt time
+
+class LocationHistoryResponse(BaseModel):
+    patient_id: str
+    timestamp: datetime
+    latitude: float
+    longitude: float
+    accuracy: Optional[float] = None
+    speed: Optional[float] = None
+    sample_count: int
+
+    class Config:
+        from_attributes = True
+
 # Zone schemas
 class ZoneCreate(BaseModel):
     patient_id: str
@@ -198,6 +245,8 @@ class AlertResponse(AlertCreate):
     acknowledged_by: Optional[str] = None
     resolved: bool
     resolved_at: Optional[datetime] = None
+    occurrences: Optional[int] = 1
+    last_seen_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
@@ -206,20 +255,34 @@ class AlertResponse(AlertCreate):
 class EmergencyCreate(BaseModel):
     patient_id: str
     last_known_location: Dict[str, float]
-    search_radius: float = 500
+    search_radius: Optional[float] = None  # estimated from walking reach when omitted
 
 class EmergencyResponse(EmergencyCreate):
     id: str
     status: str
     missing_since: datetime
     responders_notified: Optional[List[Dict[str, str]]] = None
-    timeline: Optional[List[Dict[str, Any]]] = None
+    timeline: Optional[List[Dict[str, Any]]] = None  # Legacy; see /timeline
     resolved_at: Optional[datetime] = None
     created_at: datetime
 
     class Config:
         from_attributes = True
 
+class TimelineEventCreate(BaseModel):
+    event: str
+    type: str = "update"
+    author: Optional[str] = None
+    location: Optional[Dict[str, float]] = None
+
+class TimelineEventResponse(TimelineEventCreate):
+    id: int
+    emergency_id: str
+    time: datetime
+
+    class Config:
+        from_attributes = True
+
 # Vital schemas
 class VitalCreate(BaseModel):
     patient_id: str
@@ -236,6 +299,17 @@ class VitalResponse(VitalCreate):
     class Config:
         from_attributes = True
 
+class VitalReading(VitalCreate):
+    timestamp: Optional[datetime] = None  # device time, defaults to receipt time
+
+class VitalBatch(BaseModel):
+    readings: List[VitalReading]
+
+class VitalBatchResponse(BaseModel):
+    accepted: int
+    stored: int
+    alerts: List[str]  # IDs of alerts raised by this batch
+
 # Activity schemas
 class ActivityCreate(BaseModel):
     patient_id: str
@@ -278,3 +352,22 @@ class ReportResponse(ReportCreate):
 
     class Config:
         from_attributes = True
+
+class ReportRequest(BaseModel):
+    start_date: date
+    end_date: date
+    patient_id: Optional[str] = None  # None = all patients
+    title: Optional[str] = None
+    generated_by: Optional[str] = None
+
+class ReportJobResponse(BaseModel):
+    id: str
+    status: str  # pending, running, completed, failed
+    patient_id: Optional[str] = None
+    start_date: date
+    end_date: date
+    report_id: Optional[str] = None
+    error: Optional[str] = None
+    cached: bool = False
+    created_at: datetime
+    finished_at: Optional[datetime] = None
@@ -0,0 +1,340 @@
+"""
+Probabilistic Search Area for SafeWander
+Estimates where a missing patient is likely to be, as a probability grid
+around the last known location.
+
+The grid combines, cell by cell (all vectorized NumPy):
+- distance: how far the patient could have walked in the elapsed time at
+  their baseline speed distribution and mobility level, plus some mass near
+  the last fix for patients who stopped;
+- heading: a von Mises bias towards the last known direction of travel,
+  fading as time passes;
+- history: a smoothed density of the patient's past fixes (familiar routes);
+- zones: danger zones attract, restricted zones repel, and the safe zone they
+  left is less likely (someone would have noticed).
+
+Results are cached per emergency for SEARCH_HEATMAP_TTL seconds so the map
+can poll while the search is active.
+"""
+
+import asyncio
+import math
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import (
+    MOBILITY_FACTORS,
+    TERRAIN_FACTOR,
+    SEARCH_GRID_CELL,
+    SEARCH_GRID_MAX_CELLS,
+    SEARCH_MIN_RADIUS,
+    SEARCH_MAX_RADIUS,
+    SEARCH_DISPLACEMENT_RATIO,
+    SEARCH_STAY_WEIGHT,
+    SEARCH_STAY_RADIUS,
+    SEARCH_HEADING_KAPPA,
+    SEARCH_HEADING_DECAY,
+    SEARCH_HISTORY_DAYS,
+    SEARCH_HISTORY_WEIGHT,
+    SEARCH_HISTORY_BLUR,
+    SEARCH_DANGER_ATTRACTION,
+    SEARCH_DANGER_BUFFER,
+    SEARCH_RESTRICTED_FACTOR,
+    SEARCH_SAFE_FACTOR,
+    SEARCH_HEATMAP_TTL,
+    SEARCH_HEATMAP_COVERAGE,
+    SEARCH_HEATMAP_MAX_CELLS,
+)
+
+EARTH_RADIUS = 6371000  # meters
+METERS_PER_DEGREE = math.pi / 180 * EARTH_RADIUS
+
+# emergency_id -> (monotonic time computed, result)
+_heatmaps: Dict[str, Tuple[float, Dict]] = {}
+
+# patient_id -> (monotonic time loaded, latitudes, longitudes)
+_history: Dict[str, Tuple[float, np.ndarray, np.ndarray]] = {}
+HISTORY_CACHE_SECONDS = 300
+
+
+class SearchGrid:
+    """
+    Square grid of cells centred on an origin, in local meters.
+    Row 0 is the northern edge; the origin is the centre cell.
+    """
+
+    def __init__(self, lat: float, lon: float, half_extent: float, cell_size: float):
+        self.lat = lat
+        self.lon = lon
+        self.cell = cell_size
+        self.n = 2 * int(math.ceil(half_extent / cell_size)) + 1
+        self.center = self.n // 2
+        self.m_per_deg_lon = METERS_PER_DEGREE * math.cos(math.radians(lat))
+
+        offsets = (np.arange(self.n) - self.center) * cell_size
+        self.x, self.y = np.meshgrid(offsets, offsets[::-1])
+        self.distance = np.hypot(self.x, self.y)
+        # Compass bearing of each cell from the origin (0 = north, clockwise)
+        self.bearing = np.degrees(np.arctan2(self.x, self.y)) % 360
+
+    @classmethod
+    def around(cls, lat: float, lon: float, reach: float) -> "SearchGrid":
+        """Grid covering `reach` meters (clamped), coarsened to at most SEARCH_GRID_MAX_CELLS per side."""
+        half = min(max(reach, SEARCH_MIN_RADIUS), SEARCH_MAX_RADIUS)
+        cell = max(SEARCH_GRID_CELL, 2 * half / SEARCH_GRID_MAX_CELLS)
+        return cls(lat, lon, half, cell)
+
+    def to_meters(self, lat, lon) -> Tuple[np.ndarray, np.ndarray]:
+        x = (np.asarray(lon, dtype=float) - self.lon) * self.m_per_deg_lon
+        y = (np.asarray(lat, dtype=float) - self.lat) * METERS_PER_DEGREE
+        return x, y
+
+    def to_cells(self, lat, lon) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Row/col indices for coordinates, plus a mask of those inside the grid."""
+        x, y = self.to_meters(lat, lon)
+        cols = np.rint(x / self.cell).astype(int) + self.center
+        rows = self.center - np.rint(y / self.cell).astype(int)
+        inside = (rows >= 0) & (rows < self.n) & (cols >= 0) & (cols < self.n)
+        return rows, cols, inside
+
+    def to_latlon(self, rows, cols) -> Tuple[np.ndarray, np.ndarray]:
+        x = (np.asarray(cols) - self.center) * self.cell
+        y = (self.center - np.asarray(rows)) * self.cell
+        return self.lat + y / METERS_PER_DEGREE, self.lon + x / self.m_per_deg_lon
+
+    def circle(self, lat: float, lon: float, radius: float) -> np.ndarray:
+        """Mask of cells whose centre lies within radius of a point."""
+        x, y = self.to_meters(lat, lon)
+        return np.hypot(self.x - x, self.y - y) <= radius
+
+    def bounds(self) -> Dict:
+        edge = (self.center + 0.5) * self.cell
+        return {
+            "north": self.lat + edge / METERS_PER_DEGREE,
+            "south": self.lat - edge / METERS_PER_DEGREE,
+            "east": self.lon + edge / self.m_per_deg_lon,
+            "west": self.lon - edge / self.m_per_deg_lon,
+        }
+
+    def describe(self) -> Dict:
+        return {"rows": self.n, "cols": self.n, "cell_size": round(self.cell, 2), "bounds": self.bounds()}
+
+
+def _gaussian_blur(grid: np.ndarray, sigma_cells: float) -> np.ndarray:
+    """Separable Gaussian blur as two small matrix products (K @ G @ K.T)."""
+    idx = np.arange(grid.shape[0])
+    kernel = np.exp(-0.5 * ((idx[:, None] - idx[None, :]) / sigma_cells) ** 2)
+    kernel /= kernel.sum(axis=1, keepdims=True)
+    return kernel @ grid @ kernel.T
+
+
+def history_density(grid: SearchGrid, lats: np.ndarray, lons: np.ndarray) -> Optional[np.ndarray]:
+    """Smoothed occupancy of past fixes, scaled to a maximum of 1 (None if no history in range)."""
+    if not len(lats):
+        return None
+    rows, cols, inside = grid.to_cells(lats, lons)
+    if not inside.any():
+        return None
+    counts = np.zeros((grid.n, grid.n))
+    np.add.at(counts, (rows[inside], cols[inside]), 1.0)
+    density = _gaussian_blur(counts, max(SEARCH_HISTORY_BLUR / grid.cell, 1.0))
+    return density / density.max()
+
+
+def compute_heatmap(grid: SearchGrid, elapsed: float, avg_speed: float, std_speed: float,
+                    mobility_factor: float, heading: Optional[float], zones: List[Dict],
+                    history: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Probability of the patient being in each cell (sums to 1).
+
+    Args:
+        elapsed: Seconds since the last fix
+        avg_speed, std_speed: Baseline walking speed distribution (m/s)
+        mobility_factor: MOBILITY_FACTORS value for the patient
+        heading: Compass heading at the last fix, if known
+        zones: [{"type", "lat", "lng", "radius"}]
+        history: Output of history_density, if any
+    """
+    t = max(elapsed, 60.0)
+    speed = avg_speed * mobility_factor * TERRAIN_FACTOR
+    spread = max(std_speed, 0.1) * mobility_factor * TERRAIN_FACTOR
+    d = grid.distance
+
+    # Net displacement is a fraction of the distance walked (people meander)
+    mu = speed * t * SEARCH_DISPLACEMENT_RATIO
+    sigma = max(spread * t * SEARCH_DISPLACEMENT_RATIO, 0.35 * mu, grid.cell)
+    # Ring density divided by circumference so each ring carries its share of mass
+    moving = np.exp(-0.5 * ((d - mu) / sigma) ** 2) / np.maximum(d, grid.cell / 2)
+    stayed = np.exp(-0.5 * (d / max(SEARCH_STAY_RADIUS, grid.cell)) ** 2)
+    prob = (1 - SEARCH_STAY_WEIGHT) * moving / moving.sum() + SEARCH_STAY_WEIGHT * stayed / stayed.sum()
+
+    if heading is not None:
+        kappa = SEARCH_HEADING_KAPPA * math.exp(-t / SEARCH_HEADING_DECAY)
+        prob *= np.exp(kappa * (np.cos(np.radians(grid.bearing - heading)) - 1))
+
+    if history is not None:
+        prob *= 1 + SEARCH_HISTORY_WEIGHT * history
+
+    for zone in zones:
+        if zone["type"] == "danger":
+            prob[grid.circle(zone["lat"], zone["lng"], zone["radius"] + SEARCH_DANGER_BUFFER)] *= SEARCH_DANGER_ATTRACTION
+        elif zone["type"] == "restricted":
+            prob[grid.circle(zone["lat"], zone["lng"], zone["radius"])] *= SEARCH_RESTRICTED_FACTOR
+        elif zone["type"] == "safe":
+            prob[grid.circle(zone["lat"], zone["lng"], zone["radius"])] *= SEARCH_SAFE_FACTOR
+
+    return prob / prob.sum()
+
+
+def summarize(grid: SearchGrid, prob: np.ndarray) -> Dict:
+    """Sparse cells covering SEARCH_HEATMAP_COVERAGE of the mass, hotspots and radii."""
+    flat = prob.ravel()
+    order = np.argsort(flat)[::-1]
+    cumulative = np.cumsum(flat[order])
+    keep = min(int(np.searchsorted(cumulative, SEARCH_HEATMAP_COVERAGE)) + 1, SEARCH_HEATMAP_MAX_CELLS, len(order))
+    top = order[:keep]
+    rows, cols = np.divmod(top, grid.n)
+
+    by_distance = np.argsort(grid.distance.ravel())
+    mass = np.cumsum(flat[by_distance])
+    distances = grid.distance.ravel()[by_distance]
+
+    hot = top[:10]
+    hot_lat, hot_lon = grid.to_latlon(*np.divmod(hot, grid.n))
+    return {
+        **grid.describe(),
+        "radius_50": round(float(distances[np.searchsorted(mass, 0.5)]), 1),
+        "radius_90": round(float(distances[min(np.searchsorted(mass, 0.9), len(mass) - 1)]), 1),
+        "coverage": round(float(cumulative[keep - 1]), 4),
+        "cells": np.column_stack([rows, cols, flat[top].round(6)]).tolist(),
+        "hotspots": [
+            {"lat": round(float(a), 6), "lng": round(float(o), 6), "probability": round(float(p), 5)}
+            for a, o, p in zip(hot_lat, hot_lon, flat[hot])
+        ],
+    }
+
+
+# ==================== EMERGENCY CONTEXT ====================
+
+async def _history_points(db, patient_id: str) -> Tuple[np.ndarray, np.ndarray]:
+    from trajectory import load_path
+
+    cached = _history.get(patient_id)
+    if cached and time.monotonic() - cached[0] < HISTORY_CACHE_SECONDS:
+        return cached[1], cached[2]
+    now = datetime.utcnow()
+    path = await load_path(db, patient_id, now - timedelta(days=SEARCH_HISTORY_DAYS), now)
+    _history[patient_id] = (time.monotonic(), path["latitude"], path["longitude"])
+    return path["latitude"], path["longitude"]
+
+
+async def load_search_context(db, emergency) -> Dict:
+    """
+    Everything the search models need for an emergency: origin, elapsed time,
+    speed distribution, mobility, last heading, zones and past fixes.
+    `origin` is None when neither the emergency nor any fix has a position.
+    """
+    from database import Patient, Location, Zone
+    from sqlalchemy import select, desc
+    from baseline import get_baseline
+    from geo_utils import get_heading
+
+    patient = (await db.execute(
+        select(Patient).where(Patient.id == emergency.patient_id)
+    )).scalar_one_or_none()
+    fixes = (await db.execute(
+        select(Location)
+        .where(Location.patient_id == emergency.patient_id)
+        .order_by(desc(Location.timestamp))
+        .limit(2)
+    )).scalars().all()
+
+    origin = emergency.last_known_location or {}
+    if "lat" not in origin or "lng" not in origin:
+        origin = {"lat": fixes[0].latitude, "lng": fixes[0].longitude} if fixes else None
+
+    heading = None
+    if fixes and fixes[0].heading is not None:
+        heading = fixes[0].heading
+    elif len(fixes) == 2:
+        heading = get_heading(fixes[1].latitude, fixes[1].longitude, fixes[0].latitude, fixes[0].longitude)
+
+    last_seen = (patient.last_seen if patient and patient.last_seen else emergency.missing_since)
+    elapsed = max((datetime.utcnow() - last_seen).total_seconds(), 0.0) if last_seen else 0.0
+
+    zones = (await db.execute(
+        select(Zone).where(Zone.patient_id == emergency.patient_id).where(Zone.active == True)
+    )).scalars().all()
+
+    baseline = await get_baseline(db, emergency.patient_id)
+    lats, lons = await _history_points(db, emergency.patient_id)
+    mobility_level = patient.mobility_level if patient else "medium"
+
+    return {
+        "origin": origin,
+        "elapsed": elapsed,
+        "heading": heading,
+        "avg_speed": baseline.get("avg_speed", 0.8),
+        "std_speed": baseline.get("std_speed", 0.2),
+        "mobility_level": mobility_level,
+        "mobility_factor": MOBILITY_FACTORS.get(mobility_level, 1.0),
+        "zones": [
+            {"type": z.type or "safe", "lat": z.coordinates[0]["lat"], "lng": z.coordinates[0]["lng"],
+             "radius": z.radius or 100}
+            for z in zones if z.coordinates
+        ],
+        "history_lat": lats,
+        "history_lon": lons,
+    }
+
+
+def max_reach(context: Dict) -> float:
+    """Upper walking distance (mean + 2 std speed) for the elapsed time."""
+    speed = (context["avg_speed"] + 2 * context["std_speed"]) * context["mobility_factor"] * TERRAIN_FACTOR
+    return speed * max(context["elapsed"], 60.0)
+
+
+def _heatmap_cells(context: Dict) -> Dict:
+    origin = context["origin"]
+    grid = SearchGrid.around(origin["lat"], origin["lng"], max_reach(context) * 1.1)
+    history = history_density(grid, context["history_lat"], context["history_lon"])
+    prob = compute_heatmap(grid, context["elapsed"], context["avg_speed"], context["std_speed"],
+                           context["mobility_factor"], context["heading"], context["zones"], history)
+    return summarize(grid, prob)
+
+
+async def get_search_heatmap(db, emergency) -> Optional[Dict]:
+    """
+    Probability heatmap for an emergency, recomputed at most every SEARCH_HEATMAP_TTL seconds.
+    None when there is no known location to search from.
+    """
+    cached = _heatmaps.get(emergency.id)
+    if cached and time.monotonic() - cached[0] < SEARCH_HEATMAP_TTL:
+        return cached[1]
+
+    context = await load_search_context(db, emergency)
+    origin = context["origin"]
+    if origin is None:
+        return None
+    # Grid evaluation is CPU-bound; keep it off the event loop (ingest shares it)
+    cells = await asyncio.to_thread(_heatmap_cells, context)
+
+    result = {
+        "emergency_id": emergency.id,
+        "patient_id": emergency.patient_id,
+        "computed_at": datetime.utcnow().isoformat(),
+        "origin": origin,
+        "elapsed_seconds": int(context["elapsed"]),
+        "heading": context["heading"],
+        **cells,
+    }
+    _heatmaps[emergency.id] = (time.monotonic(), result)
+    return result
+
+
+def invalidate_search(emergency_id: str) -> None:
+    """Drop cached search results (e.g. when the emergency is resolved)."""
+    _heatmaps.pop(emergency_id, None)
@@ -23,7 +23,8 @@ def transition_state(
     risk_score: int,
     state_entered_at: datetime,
     near_danger: bool = False,
-    caregiver_resolved: bool = False
+    caregiver_resolved: bool = False,
+    now: Optional[datetime] = None
 ) -> Tuple[str, Optional[str]]:
     """
     Compute FSM state transition based on risk score and conditions.
@@ -34,6 +35,7 @@ def transition_state(
         state_entered_at: When current state was entered
         near_danger: Whether patient is near danger zone
         caregiver_resolved: Whether caregiver has manually resolved
+        now: Evaluation time (event time of the fix); defaults to utcnow
     
     Returns:
         Tuple of (new_state, alert_message)
@@ -49,7 +51,7 @@ def transition_state(
     if caregiver_resolved:
         return PatientState.SAFE.value, "Caregiver resolved situation - returning to safe state"
     
-    time_in_state = (datetime.utcnow() - state_entered_at).total_seconds()
+    time_in_state = ((now or datetime.utcnow()) - state_entered_at).total_seconds()
     
     new_state = current
     alert_message = None
@@ -0,0 +1,216 @@
+"""
+Trajectory Simplification for SafeWander
+Loads a patient's path for a time range and reduces it for map rendering.
+
+The path is assembled from every tier that holds locations (archive
+partitions, compacted history, full-resolution fixes) and simplified with
+Douglas-Peucker on a local metric projection. Splits are taken largest
+deviation first, so the same pass serves both a distance tolerance and a
+point budget. Results for closed time ranges are cached in memory.
+"""
+
+import heapq
+import math
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from archive import load_range, to_epoch_us, from_epoch_us
+from config import (
+    TRAJECTORY_CACHE_SIZE,
+    TRAJECTORY_CLOSED_GRACE,
+)
+
+EARTH_RADIUS = 6371000  # meters
+
+_cache: "OrderedDict[Tuple, Dict]" = OrderedDict()
+
+
+def project(lat: np.ndarray, lon: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Equirectangular projection to meters around the path's mean latitude."""
+    scale = math.pi / 180 * EARTH_RADIUS
+    x = (lon - lon[0]) * scale * math.cos(math.radians(float(lat.mean())))
+    y = (lat - lat[0]) * scale
+    return x, y
+
+
+def _max_deviation(x: np.ndarray, y: np.ndarray, start: int, end: int) -> Tuple[float, int]:
+    """Largest point-to-segment distance between start and end (exclusive)."""
+    px, py = x[start + 1:end], y[start + 1:end]
+    ax, ay = x[start], y[start]
+    dx, dy = x[end] - ax, y[end] - ay
+    length_sq = dx * dx + dy * dy
+    if length_sq > 0:
+        t = np.clip(((px - ax) * dx + (py - ay) * dy) / length_sq, 0.0, 1.0)
+    else:
+        # Closed loop: distance to the shared endpoint
+        t = np.zeros(len(px))
+    dist = np.hypot(px - (ax + t * dx), py - (ay + t * dy))
+    i = int(dist.argmax())
+    return float(dist[i]), start + 1 + i
+
+
+def simplify(x: np.ndarray, y: np.ndarray, tolerance: float = 0.0,
+             max_points: Optional[int] = None) -> np.ndarray:
+    """
+    Douglas-Peucker simplification of a projected path.
+
+    Args:
+        x, y: Coordinates in meters
+        tolerance: Stop splitting once no point deviates more than this (meters)
+        max_points: Stop once this many points are kept (at least 2)
+
+    Returns:
+        Sorted indices of the kept points
+    """
+    n = len(x)
+    if n <= 2:
+        return np.arange(n)
+
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    kept = 2
+    budget = max(max_points, 2) if max_points else n
+
+    # Max-heap of segments by deviation; always split the worst one next
+    heap = []
+
+    def push(start: int, end: int):
+        if end - start > 1:
+            deviation, index = _max_deviation(x, y, start, end)
+            if deviation > tolerance:
+                heapq.heappush(heap, (-deviation, start, end, index))
+
+    push(0, n - 1)
+    while heap and kept < budget:
+        _, start, end, index = heapq.heappop(heap)
+        keep[index] = True
+        kept += 1
+        push(start, index)
+        push(index, end)
+
+    return np.flatnonzero(keep)
+
+
+def encode_polyline(lat: np.ndarray, lon: np.ndarray, precision: int = 5) -> str:
+    """Encode coordinates in the Google encoded polyline format."""
+    factor = 10 ** precision
+    points = np.column_stack([np.round(lat * factor), np.round(lon * factor)]).astype(np.int64)
+    deltas = np.diff(points, axis=0, prepend=[[0, 0]]).ravel()
+
+    chars = []
+    for value in deltas.tolist():
+        value = ~(value << 1) if value < 0 else value << 1
+        while value >= 0x20:
+            chars.append(chr((0x20 | (value & 0x1f)) + 63))
+            value >>= 5
+        chars.append(chr(value + 63))
+    return "".join(chars)
+
+
+async def _fetch_table(db, model, patient_id: str, since: datetime, until: datetime) -> Dict[str, np.ndarray]:
+    from sqlalchemy import select
+
+    result = await db.execute(
+        select(model.timestamp, model.latitude, model.longitude)
+        .where(model.patient_id == patient_id)
+        .where(model.timestamp >= since)
+        .where(model.timestamp < until)
+        .order_by(model.timestamp, model.id)
+    )
+    rows = result.all()
+    return {
+        "timestamp": np.array([to_epoch_us(r.timestamp) for r in rows], dtype="i8"),
+        "latitude": np.array([r.latitude for r in rows], dtype="f8"),
+        "longitude": np.array([r.longitude for r in rows], dtype="f8"),
+    }
+
+
+async def load_path(db, patient_id: str, since: datetime, until: datetime) -> Dict[str, np.ndarray]:
+    """
+    Time-ordered timestamp (epoch us), latitude and longitude arrays for
+    [since, until) across archive, compacted history and raw fixes. Each
+    tier only contributes points after the last timestamp of the one before.
+    """
+    from database import Location, LocationHistory
+
+    parts = []
+    archived = load_range("locations", patient_id, since, until)
+    if archived:
+        parts.append({name: archived[name] for name in ("timestamp", "latitude", "longitude")})
+
+    for model in (LocationHistory, Location):
+        part = await _fetch_table(db, model, patient_id, since, until)
+        if parts and len(parts[-1]["timestamp"]):
+            after = parts[-1]["timestamp"][-1]
+            mask = part["timestamp"] > after
+            part = {name: col[mask] for name, col in part.items()}
+        parts.append(part)
+
+    return {name: np.concatenate([p[name] for p in parts]) for name in ("timestamp", "latitude", "longitude")}
+
+
+def _is_closed(until: datetime) -> bool:
+    return until <= datetime.utcnow() - timedelta(seconds=TRAJECTORY_CLOSED_GRACE)
+
+
+async def get_trajectory(db, patient_id: str, since: datetime, until: datetime,
+                         tolerance: float, max_points: Optional[int], fmt: str) -> Dict:
+    """
+    Simplified path for a patient as "json", "geojson" or "polyline".
+    Ranges that ended more than TRAJECTORY_CLOSED_GRACE seconds ago are cached.
+    """
+    key = (patient_id, since, until, tolerance, max_points, fmt)
+    cached = _cache.get(key)
+    if cached is not None:
+        _cache.move_to_end(key)
+        return cached
+
+    path = await load_path(db, patient_id, since, until)
+    lat, lon, ts = path["latitude"], path["longitude"], path["timestamp"]
+
+    if len(lat):
+        x, y = project(lat, lon)
+        kept = simplify(x, y, tolerance, max_points)
+        lat, lon, ts = lat[kept], lon[kept], ts[kept]
+
+    result = _render(patient_id, since, until, len(path["timestamp"]), lat, lon, ts, fmt)
+
+    if _is_closed(until):
+        _cache[key] = result
+        if len(_cache) > TRAJECTORY_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
+
+
+def _render(patient_id: str, since: datetime, until: datetime, points_in: int,
+            lat: np.ndarray, lon: np.ndarray, ts: np.ndarray, fmt: str) -> Dict:
+    timestamps = [from_epoch_us(t).isoformat() for t in ts.tolist()]
+    summary = {
+        "patient_id": patient_id,
+        "since": since.isoformat(),
+        "until": until.isoformat(),
+        "points_in": points_in,
+        "points_out": len(timestamps),
+    }
+
+    if fmt == "geojson":
+        return {
+            "type": "Feature",
+            "geometry": {
+                "type": "LineString",
+                "coordinates": np.column_stack([lon, lat]).round(6).tolist(),
+            },
+            "properties": {**summary, "timestamps": timestamps},
+        }
+    if fmt == "polyline":
+        return {**summary, "polyline": encode_polyline(lat, lon), "timestamps": timestamps}
+    return {
+        **summary,
+        "points": [
+            {"latitude": a, "longitude": o, "timestamp": t}
+            for a, o, t in zip(lat.round(6).tolist(), lon.round(6).tolist(), timestamps)
+        ],
+    }
@@ -0,0 +1,264 @@
+"""
+Streaming Vitals Monitoring for SafeWander
+Rolling per-patient statistics, threshold / z-score detection and
+downsampling of wearable readings before they reach the database.
+
+A storage bucket is normally written when a later reading closes it. A
+background loop also writes buckets that have had no reading for
+VITALS_STORAGE_INTERVAL seconds (wearable went quiet), and all open buckets
+at shutdown, so the last minute of readings is not lost.
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from config import (
+    VITAL_LIMITS,
+    VITALS_WINDOW,
+    VITALS_MIN_SAMPLES,
+    VITALS_ZSCORE_THRESHOLD,
+    VITALS_ALERT_COOLDOWN,
+    VITALS_STORAGE_INTERVAL,
+    VITALS_FLUSH_INTERVAL,
+)
+
+METRICS = list(VITAL_LIMITS.keys())
+INTEGER_METRICS = {"heart_rate", "oxygen_level", "blood_pressure_systolic", "blood_pressure_diastolic"}
+
+METRIC_LABELS = {
+    "heart_rate": ("Heart rate", "bpm"),
+    "oxygen_level": ("SpO2", "%"),
+    "temperature": ("Temperature", "°C"),
+    "blood_pressure_systolic": ("Systolic BP", "mmHg"),
+    "blood_pressure_diastolic": ("Diastolic BP", "mmHg"),
+}
+
+
+class RollingWindow:
+    """Fixed-size window with running sum / sum of squares - O(1) per reading."""
+
+    def __init__(self, size: int = VITALS_WINDOW):
+        self._values = deque(maxlen=size)
+        self._sum = 0.0
+        self._sum_sq = 0.0
+
+    def add(self, value: float) -> None:
+        if len(self._values) == self._values.maxlen:
+            old = self._values[0]
+            self._sum -= old
+            self._sum_sq -= old * old
+        self._values.append(value)
+        self._sum += value
+        self._sum_sq += value * value
+
+    @property
+    def count(self) -> int:
+        return len(self._values)
+
+    @property
+    def mean(self) -> float:
+        return self._sum / len(self._values) if self._values else 0.0
+
+    @property
+    def std(self) -> float:
+        n = len(self._values)
+        if n < 2:
+            return 0.0
+        variance = (self._sum_sq - self._sum * self._sum / n) / (n - 1)
+        return math.sqrt(max(variance, 0.0))
+
+    def zscore(self, value: float) -> Optional[float]:
+        """Z-score of value against the window, None until enough samples."""
+        if self.count < VITALS_MIN_SAMPLES:
+            return None
+        std = self.std
+        if std <= 0:
+            return None
+        return (value - self.mean) / std
+
+
+def check_limits(metric: str, value: float) -> Optional[str]:
+    """Return "critical", "high" or None for an absolute-limit breach."""
+    limits = VITAL_LIMITS[metric]
+    if limits["critical_low"] is not None and value < limits["critical_low"]:
+        return "critical"
+    if limits["critical_high"] is not None and value > limits["critical_high"]:
+        return "critical"
+    if limits["low"] is not None and value < limits["low"]:
+        return "high"
+    if limits["high"] is not None and value > limits["high"]:
+        return "high"
+    return None
+
+
+class PatientVitals:
+    """In-memory vitals state for one patient."""
+
+    def __init__(self):
+        self.windows: Dict[str, RollingWindow] = {m: RollingWindow() for m in METRICS}
+        self.last_alert: Dict[str, datetime] = {}
+        # Open downsampling bucket: start time plus per-metric [sum, count]
+        self.bucket_start: Optional[datetime] = None
+        self.bucket: Dict[str, List[float]] = {}
+        self.bucket_touched = 0.0  # monotonic time of the last reading added to the bucket
+
+    def evaluate(self, reading: Dict, timestamp: datetime) -> List[Dict]:
+        """
+        Update rolling statistics with one reading.
+        Returns anomaly dicts ({metric, value, level, reason}) not suppressed by cooldown.
+        Z-scores are computed against the window before the reading is added.
+        """
+        anomalies = []
+        for metric in METRICS:
+            value = reading.get(metric)
+            if value is None:
+                continue
+
+            window = self.windows[metric]
+            level = check_limits(metric, value)
+            reason = "limit"
+            if level is None:
+                z = window.zscore(value)
+                if z is not None and abs(z) > VITALS_ZSCORE_THRESHOLD:
+                    level, reason = "medium", f"z={z:.1f}"
+            window.add(value)
+
+            if level and self._cooldown_elapsed(metric, timestamp):
+                self.last_alert[metric] = timestamp
+                anomalies.append({"metric": metric, "value": value, "level": level,
+                                  "reason": reason})
+        return anomalies
+
+    def _cooldown_elapsed(self, metric: str, timestamp: datetime) -> bool:
+        last = self.last_alert.get(metric)
+        return last is None or (timestamp - last).total_seconds() >= VITALS_ALERT_COOLDOWN
+
+    def downsample(self, reading: Dict, timestamp: datetime) -> Optional[Tuple[datetime, Dict]]:
+        """
+        Add a reading to the open storage bucket.
+        Returns (bucket_start, averaged values) when the reading closes the previous bucket.
+        """
+        closed = None
+        if self.bucket_start is not None and \
+                (timestamp - self.bucket_start).total_seconds() >= VITALS_STORAGE_INTERVAL:
+            closed = self.flush()
+
+        if self.bucket_start is None:
+            self.bucket_start = timestamp
+        self.bucket_touched = time.monotonic()
+        for metric in METRICS:
+            value = reading.get(metric)
+            if value is not None:
+                acc = self.bucket.setdefault(metric, [0.0, 0])
+                acc[0] += value
+                acc[1] += 1
+        return closed
+
+    def flush(self) -> Optional[Tuple[datetime, Dict]]:
+        """Close the open bucket and return its averages."""
+        if self.bucket_start is None:
+            return None
+        averages = {metric: acc[0] / acc[1] for metric, acc in self.bucket.items() if acc[1]}
+        closed = (self.bucket_start, averages)
+        self.bucket_start = None
+        self.bucket = {}
+        return closed
+
+    def is_stale(self, now: float) -> bool:
+        """Open bucket without a reading for a full storage interval."""
+        return self.bucket_start is not None and now - self.bucket_touched >= VITALS_STORAGE_INTERVAL
+
+    def stats(self) -> Dict:
+        return {
+            metric: {
+                "mean": round(window.mean, 2),
+                "std": round(window.std, 2),
+                "samples": window.count,
+            }
+            for metric, window in self.windows.items()
+            if window.count
+        }
+
+
+_patients: Dict[str, PatientVitals] = {}
+
+
+def get_patient_vitals(patient_id: str) -> PatientVitals:
+    """Get (or create) the in-memory vitals state for a patient."""
+    state = _patients.get(patient_id)
+    if state is None:
+        state = PatientVitals()
+        _patients[patient_id] = state
+    return state
+
+
+def describe_anomaly(anomaly: Dict) -> str:
+    """Human-readable alert message for a vitals anomaly."""
+    label, unit = METRIC_LABELS.get(anomaly["metric"], (anomaly["metric"], ""))
+    value = anomaly["value"]
+    if anomaly["reason"] == "limit":
+        return f"{label} out of range: {value:g}{unit}"
+    return f"{label} deviates from patient's recent baseline: {value:g}{unit} ({anomaly['reason']})"
+
+
+def vital_row(patient_id: str, values: Dict, timestamp: datetime):
+    """Vital row for averaged or raw readings (integer metrics rounded)."""
+    from database import Vital
+
+    return Vital(
+        patient_id=patient_id,
+        timestamp=timestamp,
+        **{
+            metric: (round(value) if metric in INTEGER_METRICS else round(value, 2))
+            for metric, value in values.items()
+            if value is not None
+        }
+    )
+
+
+async def flush_stale_buckets(everything: bool = False) -> int:
+    """
+    Write buckets no reading has closed (all open buckets if `everything`).
+    Returns rows written.
+    """
+    from database import async_session_maker
+
+    now = time.monotonic()
+    # Closed synchronously, so a concurrent ingest request starts a new bucket
+    closed = [
+        (patient_id, state.flush())
+        for patient_id, state in _patients.items()
+        if (everything and state.bucket_start is not None) or state.is_stale(now)
+    ]
+    if not closed:
+        return 0
+
+    async with async_session_maker() as db:
+        db.add_all([vital_row(patient_id, values, start) for patient_id, (start, values) in closed])
+        await db.commit()
+    return len(closed)
+
+
+async def run_flush_loop():
+    """Background task that writes stale buckets every VITALS_FLUSH_INTERVAL seconds."""
+    try:
+        while True:
+            await asyncio.sleep(VITALS_FLUSH_INTERVAL)
+            try:
+                await flush_stale_buckets()
+            except Exception as e:
+                print(f"[Vitals] Error: {e}")
+    finally:
+        # Shutdown (task cancelled) - write every open bucket
+        await asyncio.shield(flush_stale_buckets(everything=True))
+
+
+def start_flush_loop() -> asyncio.Task:
+    """Start the bucket flush loop as a background task."""
+    task = asyncio.create_task(run_flush_loop())
+    print(f"[Vitals] Started with {VITALS_FLUSH_INTERVAL}s bucket flush interval")
+    return task
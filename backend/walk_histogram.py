@@ -0,0 +1,89 @@
+"""
+Walk-Time Histogram for SafeWander
+Decayed 7x24 (weekday x hour) histogram of when a patient usually walks.
+
+Bins live in a flat array so recording a trip and looking up a slot are both
+O(1). Decay is applied lazily: each new trip is added with a weight that grows
+by 1/decay, which is equivalent to multiplying every older bin by decay.
+"""
+
+from array import array
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from config import WALK_HISTOGRAM_DECAY, WALK_HISTOGRAM_MIN_TRIPS, USUAL_WALK_MIN_PROBABILITY
+
+SLOTS = 7 * 24
+_RENORMALIZE_AT = 1e100
+
+
+def utc_to_local(timestamp: datetime) -> datetime:
+    """Convert a naive UTC timestamp (as stored) to naive server-local time."""
+    return timestamp.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+
+
+def slot_for(when: datetime) -> int:
+    """Histogram slot for a local datetime: weekday * 24 + hour."""
+    return when.weekday() * 24 + when.hour
+
+
+class WalkTimeHistogram:
+    """Per-patient decayed weekday x hour histogram of trip start times."""
+
+    __slots__ = ("decay", "_bins", "_total", "_increment")
+
+    def __init__(self, decay: float = WALK_HISTOGRAM_DECAY, data: Optional[bytes] = None):
+        self.decay = decay
+        self._bins = array("d", bytes(8 * SLOTS)) if data is None else array("d", data)
+        if len(self._bins) != SLOTS:
+            self._bins = array("d", bytes(8 * SLOTS))
+        self._total = sum(self._bins)
+        # Stored bins are normalized so the most recent trip has weight 1
+        self._increment = 1.0 / decay
+
+    def record(self, when: datetime) -> None:
+        """Record a trip starting at local time `when`."""
+        self._bins[slot_for(when)] += self._increment
+        self._total += self._increment
+        self._increment /= self.decay
+        if self._increment > _RENORMALIZE_AT:
+            self._rescale(1.0 / (self._increment * self.decay))
+
+    def probability(self, when: datetime) -> float:
+        """Share of (decayed) trips that started in the same weekday/hour slot."""
+        if self._total <= 0:
+            return 0.0
+        return self._bins[slot_for(when)] / self._total
+
+    @property
+    def effective_trips(self) -> float:
+        """Decayed trip count, where the most recent trip counts as 1."""
+        return self._total / (self._increment * self.decay)
+
+    def is_usual(self, when: datetime) -> bool:
+        """True once enough trips are recorded and `when` falls in a common slot."""
+        if self.effective_trips < WALK_HISTOGRAM_MIN_TRIPS:
+            return False
+        return self.probability(when) >= USUAL_WALK_MIN_PROBABILITY
+
+    def common_hours(self) -> List[int]:
+        """Hours of day (any weekday) that qualify as usual walk times."""
+        if self._total <= 0:
+            return []
+        hours = []
+        for hour in range(24):
+            weight = sum(self._bins[day * 24 + hour] for day in range(7))
+            if weight / self._total >= USUAL_WALK_MIN_PROBABILITY * 7:
+                hours.append(hour)
+        return hours
+
+    def to_bytes(self) -> bytes:
+        """Serialize with the most recent trip normalized to weight 1."""
+        self._rescale(1.0 / (self._increment * self.decay))
+        return self._bins.tobytes()
+
+    def _rescale(self, factor: float) -> None:
+        for i in range(SLOTS):
+            self._bins[i] *= factor
+        self._total *= factor
+        self._increment *= factor
@@ -0,0 +1,29 @@
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# Add backend directory to path
+backend_dir = Path(__file__).parent.parent / "backend"
+sys.path.append(str(backend_dir))
+
+from database import async_session_maker
+from archive import archive_cold_data, ARCHIVE_ROOT
+from config import ARCHIVE_AFTER_DAYS
+
+async def main(older_than_days):
+    """Move cold locations, vitals and resolved alerts from SQLite to the columnar archive"""
+    print(f"🗄️  Archiving data older than {older_than_days} days to {ARCHIVE_ROOT}...")
+
+    async with async_session_maker() as db:
+        moved = await archive_cold_data(db, older_than_days)
+
+    for table, count in moved.items():
+        print(f"  ✅ {table}: {count} rows archived")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive cold data to columnar files")
+    parser.add_argument("--days", type=float, default=ARCHIVE_AFTER_DAYS,
+                        help="Archive rows older than this many days")
+    args = parser.parse_args()
+    asyncio.run(main(args.days))
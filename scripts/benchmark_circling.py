@@ -0,0 +1,188 @@
+import argparse
+import math
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add backend directory to path
+backend_dir = Path(__file__).parent.parent / "backend"
+sys.path.append(str(backend_dir))
+
+from anomaly import GridOccupancy, is_circling_pattern
+from config import GRID_CIRCLING_PASSES, TRAJECTORY_WINDOW
+
+# Labelled synthetic trajectories for the circling detectors.
+# Each generator returns a list of (x, y) meter offsets sampled every FIX_INTERVAL seconds,
+# or (path, label) when the label depends on the sample.
+
+ORIGIN_LAT, ORIGIN_LNG = 40.7580, -73.9855
+FIX_INTERVAL = 5  # seconds
+
+
+def _walk_to(path, x, y, speed):
+    """Append points walking in a straight line from the last point to (x, y)."""
+    x0, y0 = path[-1]
+    steps = max(1, int(math.hypot(x - x0, y - y0) / (speed * FIX_INTERVAL)))
+    for i in range(1, steps + 1):
+        path.append((x0 + (x - x0) * i / steps, y0 + (y - y0) * i / steps))
+
+
+def _loop(path, cx, cy, radius, laps, speed):
+    """Append `laps` circular laps around (cx, cy) starting from the nearest point."""
+    start = math.atan2(path[-1][1] - cy, path[-1][0] - cx)
+    points_per_lap = max(8, int(2 * math.pi * radius / (speed * FIX_INTERVAL)))
+    for i in range(1, laps * points_per_lap + 1):
+        a = start + 2 * math.pi * i / points_per_lap
+        path.append((cx + radius * math.cos(a), cy + radius * math.sin(a)))
+
+
+def straight_walk(rng, speed):
+    path = [(0.0, 0.0)]
+    _walk_to(path, rng.uniform(300, 600), rng.uniform(-100, 100), speed)
+    return path
+
+
+def out_and_back(rng, speed):
+    path = [(0.0, 0.0)]
+    x, y = rng.uniform(150, 300), rng.uniform(-50, 50)
+    _walk_to(path, x, y, speed)
+    _walk_to(path, 0.0, 0.0, speed)
+    return path
+
+
+def single_errand_loop(rng, speed):
+    path = [(0.0, 0.0)]
+    d = rng.uniform(100, 200)
+    _walk_to(path, d, 0.0, speed)
+    _walk_to(path, d, d, speed)
+    _walk_to(path, 0.0, d, speed)
+    _walk_to(path, 0.0, 0.0, speed)
+    return path
+
+
+def dwell(rng, speed):
+    return [(0.0, 0.0)] * 80
+
+
+def _circling(radius, speed):
+    """Laps fast enough for GRID_CIRCLING_PASSES passes within TRAJECTORY_WINDOW."""
+    return 2 * math.pi * radius / speed * (GRID_CIRCLING_PASSES - 1) <= TRAJECTORY_WINDOW
+
+
+def loops_at_start(rng, speed):
+    path = [(0.0, 0.0)]
+    radius = rng.uniform(30, 60)
+    _loop(path, radius, 0.0, radius, 3, speed)
+    return path, _circling(radius, speed)
+
+
+def loops_elsewhere(rng, speed):
+    path = [(0.0, 0.0)]
+    _walk_to(path, rng.uniform(200, 300), rng.uniform(-50, 50), speed)
+    radius = rng.uniform(30, 60)
+    x, y = path[-1]
+    _loop(path, x + radius, y, radius, 3, speed)
+    return path, _circling(radius, speed)
+
+
+def pacing(rng, speed):
+    path = [(0.0, 0.0)]
+    _walk_to(path, rng.uniform(150, 250), 0.0, speed)
+    x, y = path[-1]
+    d = rng.uniform(80, 120)
+    for _ in range(2):
+        _walk_to(path, x + d, y, speed)
+        _walk_to(path, x, y, speed)
+    return path
+
+
+SCENARIOS = [
+    (straight_walk, False),
+    (out_and_back, False),
+    (single_errand_loop, False),
+    (dwell, False),
+    (loops_at_start, None),   # circling only when laps fit the window
+    (loops_elsewhere, None),
+    (pacing, True),
+]
+
+
+def to_fixes(path, rng, noise):
+    """Project meter offsets to lat/lng with Gaussian GPS noise."""
+    m_per_lng = 111320.0 * math.cos(math.radians(ORIGIN_LAT))
+    start = datetime(2025, 1, 1, 9, 0, 0)
+    fixes = []
+    for i, (x, y) in enumerate(path):
+        x += rng.gauss(0, noise)
+        y += rng.gauss(0, noise)
+        fixes.append({
+            "lat": ORIGIN_LAT + y / 110540.0,
+            "lng": ORIGIN_LNG + x / m_per_lng,
+            "timestamp": start + timedelta(seconds=i * FIX_INTERVAL),
+        })
+    return fixes
+
+
+def run_grid(fixes):
+    grid = GridOccupancy()
+    detected = False
+    for f in fixes:
+        grid.update(f["lat"], f["lng"], f["timestamp"])
+        detected = detected or grid.is_circling
+    return detected
+
+
+def run_list(fixes, window):
+    # What the live pipeline would have to do with the list API: rescan per fix
+    detected = False
+    for i in range(len(fixes)):
+        detected = detected or is_circling_pattern(fixes[max(0, i - window + 1):i + 1])
+    return detected
+
+
+def main(samples, noise, seed):
+    rng = random.Random(seed)
+    dataset = []
+    for generator, label in SCENARIOS:
+        for _ in range(samples):
+            speed = rng.uniform(0.5, 1.2)
+            path, circling = generator(rng, speed), label
+            if circling is None:
+                path, circling = path
+            dataset.append((generator.__name__, circling, to_fixes(path, rng, noise)))
+
+    window = 600 // FIX_INTERVAL
+    total_fixes = sum(len(fixes) for _, _, fixes in dataset)
+    print(f"🔁 {len(dataset)} labelled trajectories, {total_fixes} fixes, GPS noise {noise}m")
+
+    for name, detector in [("grid occupancy", run_grid),
+                           ("is_circling_pattern", lambda f: run_list(f, window))]:
+        counts = {"tp": 0, "fp": 0, "tn": 0, "fn": 0}
+        per_scenario = {}
+        start = time.perf_counter()
+        for scenario, label, fixes in dataset:
+            detected = detector(fixes)
+            key = ("t" if detected == label else "f") + ("p" if detected else "n")
+            counts[key] += 1
+            per_scenario.setdefault(scenario, [0, 0])
+            per_scenario[scenario][0] += detected == label
+            per_scenario[scenario][1] += 1
+        elapsed = time.perf_counter() - start
+
+        accuracy = (counts["tp"] + counts["tn"]) / len(dataset)
+        print(f"\n{name}: accuracy {accuracy:.1%}  "
+              f"TP {counts['tp']}  FP {counts['fp']}  TN {counts['tn']}  FN {counts['fn']}  "
+              f"{elapsed / total_fixes * 1e6:.1f} µs/fix")
+        for scenario, (correct, n) in per_scenario.items():
+            print(f"  {scenario:<20} {correct}/{n}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark circling detectors on labelled synthetic trajectories")
+    parser.add_argument("--samples", type=int, default=20, help="Trajectories per scenario")
+    parser.add_argument("--noise", type=float, default=4.0, help="GPS noise standard deviation (m)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    main(args.samples, args.noise, args.seed)
@@ -0,0 +1,128 @@
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add backend directory to path
+backend_dir = Path(__file__).parent.parent / "backend"
+sys.path.append(str(backend_dir))
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from database import Base, Patient
+from schemas import PatientResponse
+from patient_serializer import serialize_patient, invalidate_patient, FastJSONResponse
+from starlette.responses import JSONResponse
+
+# Per-patient cost of the /api/patients payload: the PatientResponse.dict()
+# path against the cached fast serializer, on synthetic patients loaded from
+# an in-memory database.
+
+FIRST_NAMES = ["Margaret", "Harold", "Dorothy", "Walter", "Eleanor", "Frank"]
+LAST_NAMES = ["Thompson", "Okafor", "Lindqvist", "Moreau", "Castillo"]
+
+
+def make_patients(count, rng):
+    now = datetime.utcnow()
+    patients = []
+    for i in range(count):
+        patients.append(Patient(
+            id=f"P{i:04d}",
+            name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            age=rng.randint(65, 95),
+            status=rng.choice(["safe", "monitoring", "warning", "emergency"]),
+            location=f"{40.7 + rng.random() / 10:.4f},{-73.9 - rng.random() / 10:.4f}",
+            last_seen=now - timedelta(seconds=rng.randint(0, 600)),
+            battery=rng.randint(5, 100),
+            active_alerts=rng.randint(0, 4),
+            medical_info={
+                "diagnosis": "Alzheimer's disease",
+                "medical_history": ["Hypertension", "Type 2 diabetes"],
+                "medications": ["Donepezil", "Memantine", "Metformin"],
+                "allergies": ["Penicillin"],
+            },
+            emergency_contacts=[
+                {"name": "Anna", "relationship": "Daughter", "phone": "555-0101", "email": "anna@example.com"},
+                {"name": "Tom", "relationship": "Son", "phone": "555-0102"},
+            ],
+            behavioral_patterns={"trigger_locations": ["Bus stop", "Old workplace"],
+                                 "distinguishing_features": "Walks with a cane"},
+            photo_url=None,
+            created_at=now - timedelta(days=365),
+            updated_at=now,
+            fsm_state=rng.choice(["safe", "advisory", "warning"]),
+            state_entered_at=now - timedelta(minutes=rng.randint(1, 120)),
+            risk_score=rng.randint(0, 100),
+            mobility_level="medium",
+        ))
+    return patients
+
+
+def timed(fn, load, rounds):
+    """Mean µs per patient; every round serializes freshly loaded patients like a request does."""
+    elapsed, count = 0.0, 0
+    for _ in range(rounds):
+        patients = load()
+        start = time.perf_counter()
+        fn(patients)
+        elapsed += time.perf_counter() - start
+        count += len(patients)
+    return elapsed / count * 1e6
+
+
+def baseline(patients):
+    return JSONResponse([PatientResponse.model_validate(p).dict() for p in patients]).body
+
+
+def fast(patients):
+    return FastJSONResponse([serialize_patient(p) for p in patients]).body
+
+
+def fast_cold(patients):
+    for p in patients:
+        invalidate_patient(p.id)
+    return fast(patients)
+
+
+def make_loader(count, seed):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all(make_patients(count, random.Random(seed)))
+        session.commit()
+
+    def instances():
+        with Session(engine) as session:
+            return session.execute(select(Patient).order_by(Patient.id)).scalars().all()
+
+    return instances
+
+
+def main(count, rounds, seed):
+    instances = make_loader(count, seed)
+    reference = baseline(instances())
+    runs = [
+        ("fast (cold cache)", fast_cold, instances),
+        ("fast (warm cache)", fast, instances),
+    ]
+    for name, fn, load in runs:
+        assert fn(load()) == reference, f"{name} output differs"
+
+    print(f"👤 {count} patients x {rounds} rounds (output verified byte-identical)")
+    base_us = timed(baseline, instances, rounds)
+    print(f"  {'model_validate + dict()':<24} {base_us:8.1f} µs/patient")
+    for name, fn, load in runs:
+        us = timed(fn, load, rounds)
+        print(f"  {name:<24} {us:8.1f} µs/patient  ({base_us / us:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark patient payload serialization")
+    parser.add_argument("--patients", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    main(args.patients, args.rounds, args.seed)
@@ -0,0 +1,35 @@
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# Add backend directory to path
+backend_dir = Path(__file__).parent.parent / "backend"
+sys.path.append(str(backend_dir))
+
+from baseline_rebuild import rebuild_all_baselines
+from config import BASELINE_REBUILD_WORKERS
+
+async def main(patient_ids, workers):
+    """Recompute behavioral baselines from stored location history"""
+    print("📈 Rebuilding baselines from location history...")
+
+    results = await rebuild_all_baselines(patient_ids, workers=workers)
+
+    for r in results:
+        if r["status"] == "rebuilt":
+            print(f"  ✅ {r['patient_id']}: {r['trips']} trips from {r['fixes']} fixes")
+        else:
+            print(f"  ⏭️  {r['patient_id']}: skipped ({r['reason']})")
+
+    rebuilt = sum(1 for r in results if r["status"] == "rebuilt")
+    print(f"✅ Rebuilt {rebuilt}/{len(results)} baselines")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild patient baselines from history")
+    parser.add_argument("--patient", action="append", dest="patients",
+                        help="Patient ID to rebuild (repeatable, default: all)")
+    parser.add_argument("--workers", type=int, default=BASELINE_REBUILD_WORKERS,
+                        help="Process pool size")
+    args = parser.parse_args()
+    asyncio.run(main(args.patients, args.workers))
@@ -0,0 +1,95 @@
+import argparse
+import asyncio
+import json
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add backend directory to path
+backend_dir = Path(__file__).parent.parent / "backend"
+sys.path.append(str(backend_dir))
+
+from backtest import load_scenarios, synthetic_scenarios, sweep
+from config import BACKTEST_WORKERS
+
+
+def parse_setting(text):
+    """NAME.key=value -> {"NAME": {"key": value}}"""
+    name_key, _, value = text.partition("=")
+    name, _, key = name_key.partition(".")
+    if not key or not value:
+        raise argparse.ArgumentTypeError(f"expected NAME.key=value, got {text!r}")
+    return {name: {key: json.loads(value)}}
+
+
+def merge(configurations):
+    merged = {}
+    for c in configurations:
+        for name, values in c.items():
+            merged.setdefault(name, {}).update(values)
+    return merged
+
+
+def print_summary(result):
+    s = result["summary"]
+    label = json.dumps(result["config"]) if result["config"] else "current config"
+    ttf = s["time_to_emergency_median"]
+    per_day = s["false_alarms_per_day"]
+    print(f"\n⚙️  {label}")
+    print(f"  alerts        {s['alerts']}")
+    print(f"  incidents     {s['detected']}/{s['incidents']} detected, {s['missed']} missed")
+    print(f"  to emergency  median {ttf / 60:.1f} min" if ttf is not None else "  to emergency  -")
+    print(f"  false alarms  {s['false_alarms']}" + (f" ({per_day:.2f}/day)" if per_day is not None else ""))
+    print(f"  replayed      {s['fixes']} fixes, {s['simulated_seconds'] / 3600:.1f} h "
+          f"in {s['wall_seconds']:.2f} s ({s['speedup'] or 0:,.0f}x real time)")
+
+
+def main(args):
+    """Replay location history through the risk pipeline"""
+    if args.synthetic:
+        print(f"🧪 Generating {args.synthetic} synthetic scenarios (seed {args.seed})...")
+        scenarios = synthetic_scenarios(args.synthetic, seed=args.seed)
+    else:
+        until = datetime.utcnow()
+        since = until - timedelta(days=args.days)
+        print(f"📂 Loading stored fixes from the last {args.days} days...")
+        scenarios = asyncio.run(load_scenarios(args.patients, since, until))
+    if not scenarios:
+        print("⏭️  No fixes to replay")
+        return
+
+    configurations = [merge(args.settings or [])]
+    if args.sweep:
+        configurations = [merge([configurations[0], c]) for c in json.loads(Path(args.sweep).read_text())]
+
+    print(f"▶️  Replaying {len(scenarios)} scenarios x {len(configurations)} configurations...")
+    results = sweep(scenarios, configurations, workers=args.workers)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for result in results:
+            print_summary(result)
+    print(f"\n✅ Backtest complete")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest risk weights and FSM thresholds")
+    parser.add_argument("--patient", action="append", dest="patients",
+                        help="Patient ID to replay (repeatable, default: all)")
+    parser.add_argument("--days", type=int, default=7,
+                        help="Days of stored history to replay")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="Replay N synthetic walks instead of stored fixes")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="Seed for synthetic scenarios")
+    parser.add_argument("--set", action="append", dest="settings", type=parse_setting,
+                        help="Override, e.g. FSM_THRESHOLDS.urgent_hold_time=300 (repeatable)")
+    parser.add_argument("--sweep",
+                        help="JSON file with a list of overrides, e.g. "
+                             '[{"RISK_WEIGHTS": {"night_hours": 10}}, {"RISK_WEIGHTS": {"night_hours": 20}}]')
+    parser.add_argument("--workers", type=int, default=BACKTEST_WORKERS,
+                        help="Process pool size across configurations")
+    parser.add_argument("--json", action="store_true",
+                        help="Print summaries as JSON")
+    main(parser.parse_args())